@@ -15,7 +15,9 @@ DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "leons_cupcake")
 
 def get_database_uri():
-    """Gera a URI de conexão com o banco de dados MySQL"""
+    """Gera a URI de conexão com o banco de dados MySQL (DATABASE_URL, se definida, tem prioridade)"""
+    if os.getenv("DATABASE_URL"):
+        return os.getenv("DATABASE_URL")
     if DB_PASS:
         return f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
     else:
@@ -42,12 +44,23 @@ def create_app():
                  "http://localhost"            # Capacitor Android
              ],
              "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-             "allow_headers": ["Content-Type", "Authorization"],
-             "expose_headers": ["Content-Type", "Authorization"],
+             "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"],
+             "expose_headers": ["Content-Type", "Authorization", "X-Proximo-Cursor", "Idempotent-Replayed"],
              "supports_credentials": True,
              "max_age": 3600  # Cache preflight por 1 hora
          }})
     
+    # ==================== PROXY REVERSO ====================
+    # Atrás de nginx / load balancer, request.remote_addr seria o IP do
+    # proxy, e o limite de login por IP somaria todos os clientes. PROXY_SALTOS
+    # é o número de proxies confiáveis à frente da API: só esses valores de
+    # X-Forwarded-* são aceitos. Com 0 (padrão, API exposta direto) os
+    # headers são ignorados, porque o cliente pode forjá-los.
+    proxy_saltos = int(os.getenv("PROXY_SALTOS", "0"))
+    if proxy_saltos > 0:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_saltos, x_proto=proxy_saltos)
+    
     # ==================== DATABASE CONFIGURATION ====================
     app.config["SQLALCHEMY_DATABASE_URI"] = get_database_uri()
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
@@ -116,6 +129,12 @@ def create_app():
             "codigo": "TOKEN_MISSING"
         }), 401
     
+    @jwt.token_in_blocklist_loader
+    def token_in_blocklist_callback(jwt_header, jwt_payload):
+        # Espelho em memória (filtro de Bloom + conjunto exato): sem consulta por requisição
+        from helpers.revogacao import token_revogado
+        return token_revogado(jwt_payload.get("jti"))
+    
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
         print(f"\n🔒 JWT REVOGADO")
@@ -155,6 +174,19 @@ def create_app():
             "codigo": "METHOD_NOT_ALLOWED"
         }), 405
     
+    from helpers.revogacao import RevogacaoIndisponivel
+    
+    @app.errorhandler(RevogacaoIndisponivel)
+    def revogacao_indisponivel(error):
+        # Sem a lista de tokens revogados não há como aceitar um token com segurança
+        resposta = jsonify({
+            "erro": "Serviço indisponível",
+            "mensagem": str(error),
+            "codigo": "SERVICO_INDISPONIVEL"
+        })
+        resposta.headers["Retry-After"] = str(error.retry_after)
+        return resposta, 503
+    
     @app.errorhandler(500)
     def internal_error(error):
         print(f"\n💥 ERRO INTERNO DO SERVIDOR")
@@ -234,6 +266,8 @@ def create_app():
             from routes.pedido_routes import pedido_bp
             from routes.entrega_routes import entrega_bp
             from routes.categoria_routes import categoria_bp
+            from routes.imagem_routes import imagem_bp
+            from routes.carrinho_routes import carrinho_bp
             
             app.register_blueprint(auth_bp, url_prefix="/api/auth")
             app.register_blueprint(usuario_bp, url_prefix="/api/usuarios")
@@ -241,6 +275,8 @@ def create_app():
             app.register_blueprint(pedido_bp, url_prefix="/api/pedidos")
             app.register_blueprint(entrega_bp, url_prefix="/api/entregas")
             app.register_blueprint(categoria_bp, url_prefix="/api/categorias")
+            app.register_blueprint(imagem_bp, url_prefix="/api/imagens")
+            app.register_blueprint(carrinho_bp, url_prefix="/api/carrinho")
             
             print("✅ Todos os blueprints registrados com sucesso!")
             
@@ -259,11 +295,20 @@ def create_app():
             except Exception as e:
                 db_status = f"erro: {str(e)}"
             
+            from helpers.tarefas import metricas_tarefas
+            from helpers.security import metricas_senhas
+            from helpers.revogacao import metricas_revogacao
+            from helpers.visualizacoes import metricas_visualizacoes
+            
             return jsonify({
                 "status": "ok",
                 "mensagem": "API Leon's Cupcake está funcionando! 🧁",
                 "timestamp": datetime.utcnow().isoformat(),
                 "banco_de_dados": db_status,
+                "tarefas": metricas_tarefas(),
+                "senhas": metricas_senhas(),
+                "revogacao": metricas_revogacao(),
+                "visualizacoes": metricas_visualizacoes(),
                 "versao": "1.0.0"
             }), 200
         
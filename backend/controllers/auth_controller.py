@@ -6,6 +6,12 @@ Versão com busca case-insensitive e logs detalhados
 
 from models.usuario import Usuario
 from config import db
+from helpers.principal import invalidar_principal
+from helpers.security import SenhasOcupado
+from helpers.limite_login import (
+    LoginBloqueado, verificar_tentativa, registrar_falha, registrar_sucesso, lembrar_bloqueio,
+    MAX_FALHAS_EMAIL, BLOQUEIO_MINUTOS
+)
 import re
 
 
@@ -36,7 +42,7 @@ def registrar_usuario(data: dict) -> Usuario:
         
         # ===== EXTRAÇÃO E LIMPEZA DE DADOS =====
         nome = data.get('nome', '').strip()
-        email = data.get('email', '').strip().lower()  # 🔥 NORMALIZAR
+        email = Usuario.normalizar_email(data.get('email', ''))  # 🔥 NORMALIZAR
         senha = data.get('senha', '').strip()
         cpf = data.get('cpf', '').strip() if data.get('cpf') else None
         telefone = data.get('telefone', '').strip() if data.get('telefone') else None
@@ -126,9 +132,9 @@ def registrar_usuario(data: dict) -> Usuario:
         print(f"\n🔍 Verificando se email já existe...")
         print(f"   Buscando: {email}")
         
-        # Busca case-insensitive no banco
+        # Busca case-insensitive pelo índice de email_normalizado
         existe = Usuario.query.filter(
-            db.func.lower(Usuario.email) == email
+            Usuario.email_normalizado == Usuario.normalizar_email(email)
         ).first()
         
         if existe:
@@ -211,8 +217,8 @@ def registrar_usuario(data: dict) -> Usuario:
         
         return user
         
-    except ValueError:
-        # Re-raise ValueError para manter mensagens de validação
+    except (ValueError, SenhasOcupado):
+        # Re-raise para manter mensagens de validação (e o 503 do pool cheio)
         db.session.rollback()
         print("❌ Erro de validação - Rollback realizado")
         print("="*60 + "\n")
@@ -233,17 +239,25 @@ def registrar_usuario(data: dict) -> Usuario:
         raise ValueError(f"Erro ao criar usuário: {str(e)}")
 
 
-def autenticar(email: str, senha: str):
+def autenticar(email: str, senha: str, ip: str = None):
     """
     Autentica um usuário com email e senha
     Busca é case-insensitive para o email
     
+    Falhas são contadas em memória por IP e por email (helpers/limite_login);
+    o banco só recebe bloqueado_ate quando o email cruza o limite.
+    
     Args:
         email (str): Email do usuário
         senha (str): Senha em texto plano
+        ip (str): IP de origem da requisição
     
     Returns:
         Usuario | None: Instância do usuário se autenticado, None caso contrário
+    
+    Raises:
+        LoginBloqueado: Tentativas demais para o IP ou email (antes de
+            qualquer consulta ou hash), ou usuário com bloqueio no banco
     """
     try:
         print("\n" + "="*60)
@@ -252,7 +266,7 @@ def autenticar(email: str, senha: str):
         
         # 🔥 NORMALIZAR EMAIL NA BUSCA
         email_original = email
-        email_normalizado = email.strip().lower()
+        email_normalizado = Usuario.normalizar_email(email)
         
         print(f"📧 Email recebido: '{email_original}'")
         print(f"📧 Email normalizado: '{email_normalizado}'")
@@ -263,43 +277,20 @@ def autenticar(email: str, senha: str):
             print("="*60 + "\n")
             return None
         
-        # Busca case-insensitive no banco
+        # Limite de tentativas: só memória, antes do banco e do hash
+        verificar_tentativa(ip, email_normalizado)
+        
+        # Busca case-insensitive pelo índice de email_normalizado
         print(f"\n🔍 Buscando usuário no banco...")
-        print(f"   Query: SELECT * FROM usuarios WHERE LOWER(email) = '{email_normalizado}'")
         
         user = Usuario.query.filter(
-            db.func.lower(Usuario.email) == email_normalizado
+            Usuario.email_normalizado == email_normalizado
         ).first()
         
         if not user:
             print(f"\n❌ USUÁRIO NÃO ENCONTRADO: '{email_normalizado}'")
-            
-            # Debug: verifica se existe usuário similar
-            print(f"\n🔍 Procurando emails similares...")
-            username = email_normalizado.split('@')[0]
-            similar = Usuario.query.filter(
-                Usuario.email.ilike(f"%{username}%")
-            ).all()
-            
-            if similar:
-                print(f"⚠️  Encontrados {len(similar)} emails similares:")
-                for s in similar:
-                    print(f"    - {s.email} (ID: {s.id_usuario})")
-            else:
-                print(f"⚠️  Nenhum email similar encontrado")
-            
-            # Debug: lista todos os emails do banco
-            todos = Usuario.query.with_entities(
-                Usuario.id_usuario, 
-                Usuario.email, 
-                Usuario.nome
-            ).all()
-            
-            print(f"\n📋 Todos os emails cadastrados ({len(todos)}):")
-            for u in todos:
-                print(f"    ID: {u.id_usuario} | Email: {u.email} | Nome: {u.nome}")
-            
             print("="*60 + "\n")
+            registrar_falha(ip, email_normalizado)
             return None
         
         print(f"\n✅ USUÁRIO ENCONTRADO!")
@@ -317,16 +308,35 @@ def autenticar(email: str, senha: str):
         
         print("   ✅ Usuário ativo")
         
+        # Bloqueio gravado por outro worker (ou antes de um restart)
+        espera = user.segundos_bloqueado()
+        if espera > 0:
+            print(f"\n🔒 USUÁRIO BLOQUEADO por mais {int(espera)}s")
+            lembrar_bloqueio(email_normalizado, espera)
+            raise LoginBloqueado(espera)
+        
         # Verifica senha
         print(f"\n🔐 Verificando senha...")
         senha_valida = user.check_senha(senha)
         
         if not senha_valida:
             print(f"❌ SENHA INCORRETA")
+            if registrar_falha(ip, email_normalizado):
+                # Único momento em que uma falha escreve no banco
+                print(f"🔒 Limite de falhas atingido: bloqueando por {BLOQUEIO_MINUTOS:g} min")
+                user.bloquear_login(MAX_FALHAS_EMAIL, BLOQUEIO_MINUTOS)
+                db.session.commit()
             print("="*60 + "\n")
             return None
         
         print(f"✅ Senha CORRETA")
+        registrar_sucesso(email_normalizado)
+        if user.resetar_tentativas_login():
+            db.session.commit()
+        
+        # Migra o hash para os parâmetros atuais (só aqui temos a senha em texto)
+        if user.senha_precisa_rehash():
+            _regravar_hash(user, senha)
         print(f"\n✅✅✅ AUTENTICAÇÃO BEM-SUCEDIDA ✅✅✅")
         print(f"   Usuário: {user.nome}")
         print(f"   Email: {user.email}")
@@ -334,6 +344,12 @@ def autenticar(email: str, senha: str):
         print("="*60 + "\n")
         
         return user
+    
+    except (SenhasOcupado, LoginBloqueado) as e:
+        # Não é credencial inválida: a rota responde 503 / 429
+        print(f"⚠️ {e}")
+        print("="*60 + "\n")
+        raise
         
     except Exception as e:
         print(f"\n❌❌❌ ERRO NA AUTENTICAÇÃO ❌❌❌")
@@ -348,6 +364,23 @@ def autenticar(email: str, senha: str):
         return None
 
 
+def _regravar_hash(user: Usuario, senha: str):
+    """
+    Regrava o hash com o custo atual; falhas não impedem o login
+
+    Com o pool cheio a migração fica para o próximo login.
+    """
+    try:
+        user.set_senha(senha)
+        db.session.commit()
+        print("🔁 Hash da senha atualizado para os parâmetros atuais")
+    except SenhasOcupado:
+        print("⚠️ Pool de senhas cheio: hash não atualizado")
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Não foi possível atualizar o hash: {e}")
+
+
 def obter_usuario_por_id(user_id: int):
     """
     Busca um usuário pelo ID
@@ -421,7 +454,7 @@ def obter_usuario_por_email(email: str):
         Usuario | None: Instância do usuário se encontrado, None caso contrário
     """
     try:
-        email_normalizado = email.strip().lower()
+        email_normalizado = Usuario.normalizar_email(email)
         
         if not email_normalizado:
             return None
@@ -429,7 +462,7 @@ def obter_usuario_por_email(email: str):
         print(f"🔍 Buscando usuário por email: {email_normalizado}")
         
         user = Usuario.query.filter(
-            db.func.lower(Usuario.email) == email_normalizado
+            Usuario.email_normalizado == email_normalizado
         ).first()
         
         if user:
@@ -469,9 +502,9 @@ def email_existe(email: str) -> bool:
         bool: True se existe, False caso contrário
     """
     try:
-        email_normalizado = email.strip().lower()
+        email_normalizado = Usuario.normalizar_email(email)
         usuario = Usuario.query.filter(
-            db.func.lower(Usuario.email) == email_normalizado
+            Usuario.email_normalizado == email_normalizado
         ).first()
         return usuario is not None
     except Exception:
@@ -566,6 +599,7 @@ def atualizar_ultimo_acesso(user_id: int) -> bool:
         if user and hasattr(user, 'ultimo_acesso'):
             user.ultimo_acesso = datetime.utcnow()
             db.session.commit()
+            invalidar_principal(user_id)
             return True
         return False
     except Exception as e:
@@ -0,0 +1,224 @@
+from decimal import Decimal
+from models.produto import Produto
+from helpers.carrinho import obter_armazem_carrinhos
+from helpers.cache_catalogo import versao_catalogo
+from helpers.vitrine import resumo_vitrine
+from controllers.pedido_controller import EstoqueInsuficiente, gravar_pedido
+
+MAX_ITENS_CARRINHO = 50
+MAX_QUANTIDADE_ITEM = 99
+
+# ============================================================
+#                     CARRINHO
+# ============================================================
+#
+# Formato guardado no armazém (chave = id do usuário):
+#     {"itens": [{"id_produto": 3, "quantidade": 2}, ...],
+#      "cotacao": {...} | null}
+#
+# A cotação é a precificação do carrinho (uma consulta em produtos) e
+# vale enquanto a versão do catálogo não mudar e os itens forem os mesmos.
+# Qualquer alteração de itens descarta a cotação.
+
+def _chave(id_usuario: int) -> str:
+    return f"usuario:{int(id_usuario)}"
+
+def _ler_quantidade(valor, permite_zero: bool = False) -> int:
+    try:
+        quantidade = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("quantidade deve ser um número inteiro")
+
+    minimo = 0 if permite_zero else 1
+    if quantidade < minimo or quantidade > MAX_QUANTIDADE_ITEM:
+        raise ValueError(f"quantidade deve estar entre {minimo} e {MAX_QUANTIDADE_ITEM}")
+    return quantidade
+
+def _ler_id_produto(valor) -> int:
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("id_produto deve ser um número inteiro")
+
+def _cotar(itens: list) -> dict:
+    """Precifica os itens com uma consulta (mesmo preço usado por criar_pedido)"""
+    versao = versao_catalogo()
+    ids = [item['id_produto'] for item in itens]
+    produtos = {p.id_produto: p for p in Produto.query.filter(Produto.id_produto.in_(ids)).all()} if ids else {}
+
+    linhas = []
+    problemas = []
+    subtotal = Decimal('0.00')
+
+    for item in itens:
+        produto = produtos.get(item['id_produto'])
+        if not produto or not produto.ativo:
+            problemas.append({'id_produto': item['id_produto'], 'erro': "Produto indisponível"})
+            continue
+
+        if produto.quantidade_estoque < item['quantidade']:
+            problemas.append({
+                'id_produto': produto.id_produto,
+                'erro': f"Estoque insuficiente para {produto.nome}",
+                'disponivel': produto.quantidade_estoque
+            })
+
+        preco = produto.preco_final
+        subtotal += preco * item['quantidade']
+        linhas.append({
+            'id_produto': produto.id_produto,
+            'nome': produto.nome,
+            'imagem_principal_url': produto.imagem_principal_url,
+            'quantidade': item['quantidade'],
+            'preco_unitario': float(preco),
+            'subtotal': float(preco * item['quantidade']),
+            'estoque': produto.quantidade_estoque,
+            # Uso interno: o checkout atualiza a vitrine sem reler o produto
+            'resumo': resumo_vitrine(produto)
+        })
+
+    return {
+        'versao': versao,
+        'itens': linhas,
+        'subtotal': float(subtotal),
+        'problemas': problemas
+    }
+
+def _cotacao_valida(carrinho: dict) -> dict:
+    """Devolve a cotação em cache ou uma nova (guardada para as próximas leituras)"""
+    cotacao = carrinho.get('cotacao')
+    if cotacao and cotacao.get('versao') == versao_catalogo():
+        return cotacao
+
+    cotacao = _cotar(carrinho['itens'])
+    carrinho['cotacao'] = cotacao
+    return cotacao
+
+def _publico(carrinho: dict) -> dict:
+    """Formato de resposta (sem os dados internos da cotação)"""
+    cotacao = carrinho['cotacao']
+    return {
+        'itens': [{k: v for k, v in linha.items() if k != 'resumo'} for linha in cotacao['itens']],
+        'quantidade_itens': sum(item['quantidade'] for item in carrinho['itens']),
+        'subtotal': cotacao['subtotal'],
+        'problemas': cotacao['problemas'],
+        'pode_finalizar': bool(carrinho['itens']) and not cotacao['problemas']
+    }
+
+def _salvar_cotacao(id_usuario: int, carrinho: dict):
+    """Guarda a cotação só se os itens não mudaram enquanto ela era calculada"""
+    itens, cotacao = carrinho['itens'], carrinho['cotacao']
+
+    def aplicar(atual):
+        if atual is not None and atual.get('itens') == itens:
+            atual['cotacao'] = cotacao
+        return atual
+
+    obter_armazem_carrinhos().atualizar(_chave(id_usuario), aplicar)
+
+def obter_carrinho(id_usuario: int) -> dict:
+    carrinho = obter_armazem_carrinhos().obter(_chave(id_usuario)) or {'itens': [], 'cotacao': None}
+
+    cotacao_anterior = carrinho.get('cotacao')
+    _cotacao_valida(carrinho)
+    if carrinho['itens'] and carrinho['cotacao'] is not cotacao_anterior:
+        _salvar_cotacao(id_usuario, carrinho)
+
+    return _publico(carrinho)
+
+def _alterar_itens(id_usuario: int, fn) -> dict:
+    """Aplica fn(itens) -> itens no armazém e devolve o carrinho cotado"""
+    def aplicar(atual):
+        itens = fn(list((atual or {}).get('itens', [])))
+        if len(itens) > MAX_ITENS_CARRINHO:
+            raise ValueError(f"Máximo de {MAX_ITENS_CARRINHO} produtos no carrinho")
+        return {'itens': itens, 'cotacao': None} if itens else None
+
+    carrinho = obter_armazem_carrinhos().atualizar(_chave(id_usuario), aplicar) or {'itens': [], 'cotacao': None}
+    _cotacao_valida(carrinho)
+    if carrinho['itens']:
+        _salvar_cotacao(id_usuario, carrinho)
+    return _publico(carrinho)
+
+def definir_itens_carrinho(id_usuario: int, itens) -> dict:
+    """Substitui o carrinho inteiro (ex.: enviar o carrinho do aparelho ao fazer login)"""
+    if not isinstance(itens, list):
+        raise ValueError("itens deve ser uma lista")
+
+    por_produto = {}
+    for item in itens:
+        if not isinstance(item, dict):
+            raise ValueError("Cada item precisa de id_produto e quantidade")
+        id_produto = _ler_id_produto(item.get('id_produto'))
+        quantidade = _ler_quantidade(item.get('quantidade', 1))
+        por_produto[id_produto] = min(por_produto.get(id_produto, 0) + quantidade, MAX_QUANTIDADE_ITEM)
+
+    novos = [{'id_produto': i, 'quantidade': q} for i, q in por_produto.items()]
+    return _alterar_itens(id_usuario, lambda _: novos)
+
+def adicionar_item_carrinho(id_usuario: int, id_produto, quantidade=1) -> dict:
+    id_produto = _ler_id_produto(id_produto)
+    quantidade = _ler_quantidade(quantidade)
+
+    def aplicar(itens):
+        for item in itens:
+            if item['id_produto'] == id_produto:
+                item['quantidade'] = min(item['quantidade'] + quantidade, MAX_QUANTIDADE_ITEM)
+                return itens
+        return itens + [{'id_produto': id_produto, 'quantidade': quantidade}]
+
+    return _alterar_itens(id_usuario, aplicar)
+
+def alterar_quantidade_carrinho(id_usuario: int, id_produto: int, quantidade) -> dict:
+    """Quantidade 0 remove o produto do carrinho"""
+    quantidade = _ler_quantidade(quantidade, permite_zero=True)
+
+    def aplicar(itens):
+        if quantidade == 0:
+            return [item for item in itens if item['id_produto'] != id_produto]
+        for item in itens:
+            if item['id_produto'] == id_produto:
+                item['quantidade'] = quantidade
+        return itens
+
+    return _alterar_itens(id_usuario, aplicar)
+
+def limpar_carrinho(id_usuario: int):
+    obter_armazem_carrinhos().remover(_chave(id_usuario))
+
+def finalizar_carrinho(id_usuario: int):
+    """
+    Cria o pedido a partir do carrinho, reaproveitando a cotação
+
+    Com a cotação ainda válida, o checkout não relê os produtos: grava o
+    pedido com os preços cotados e deixa o UPDATE condicional de estoque
+    decidir se há estoque. O carrinho é esvaziado depois do commit.
+
+    Raises:
+        EstoqueInsuficiente: Algum produto ficou sem estoque
+        ValueError: Carrinho vazio ou com produto indisponível
+    """
+    carrinho = obter_armazem_carrinhos().obter(_chave(id_usuario))
+    if not carrinho or not carrinho.get('itens'):
+        raise ValueError("Carrinho vazio")
+
+    cotacao = _cotacao_valida(carrinho)
+    for problema in cotacao['problemas']:
+        if 'disponivel' in problema:
+            linha = next(l for l in cotacao['itens'] if l['id_produto'] == problema['id_produto'])
+            raise EstoqueInsuficiente(problema['id_produto'], linha['nome'], problema['disponivel'])
+        raise ValueError(problema['erro'])
+
+    linhas = [(linha['id_produto'], linha['quantidade']) for linha in cotacao['itens']]
+    cotados = {
+        linha['id_produto']: {
+            'nome': linha['nome'],
+            'preco': Decimal(str(linha['preco_unitario'])),
+            'resumo': linha['resumo']
+        }
+        for linha in cotacao['itens']
+    }
+
+    pedido = gravar_pedido(id_usuario, linhas, cotados)
+    limpar_carrinho(id_usuario)
+    return pedido
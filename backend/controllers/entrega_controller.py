@@ -1,9 +1,11 @@
 from config import db
 from models.entrega import Entrega
+from helpers.streaming import percorrer_em_lotes
 
 def listar_entregas():
-    entregas = Entrega.query.order_by(Entrega.data_atribuicao.desc()).all()
-    return [e.to_dict() for e in entregas]
+    """Todas as entregas, atribuídas mais recentemente primeiro, em lotes"""
+    lotes = percorrer_em_lotes(Entrega.query, Entrega.data_atribuicao, Entrega.id_entrega, nullable=True)
+    return ([e.to_dict() for e in lote] for lote in lotes)
 
 def criar_entrega(data: dict):
     id_pedido = data.get('id_pedido')
@@ -0,0 +1,464 @@
+"""
+Importação e exportação do catálogo em lote - Leon's Cupcake
+
+Formatos aceitos: CSV (com cabeçalho) e NDJSON (um objeto JSON por linha).
+
+A importação lê o arquivo em streaming e grava em lotes: cada lote vira
+um único INSERT ... ON DUPLICATE KEY UPDATE (upsert pelo `sku`) e um
+commit. Linhas inválidas entram no relatório de erros sem interromper o
+restante do arquivo.
+
+A exportação percorre a tabela com cursor do lado do servidor, então a
+memória usada não cresce com o tamanho do catálogo. O arquivo exportado
+usa as mesmas colunas da importação.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from slugify import slugify
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import db
+from models.produto import Produto, Categoria
+from helpers.busca import obter_motor_busca
+from helpers.cache_catalogo import incrementar_versao_catalogo
+
+
+FORMATOS = ('csv', 'ndjson')
+TAMANHO_LOTE = 1000
+LINHAS_POR_BLOCO_EXPORTACAO = 500
+MAX_ERROS_RELATADOS = 500
+
+
+def _texto(limite):
+    def converter(valor):
+        texto = str(valor).strip()
+        if len(texto) > limite:
+            raise ValueError(f"máximo de {limite} caracteres")
+        return texto
+    return converter
+
+
+def _decimal(valor):
+    try:
+        numero = Decimal(str(valor).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError("deve ser um número")
+    if not numero.is_finite() or numero < 0:
+        raise ValueError("deve ser um número positivo")
+    return numero
+
+
+def _inteiro(valor):
+    try:
+        numero = int(str(valor).strip())
+    except ValueError:
+        raise ValueError("deve ser um número inteiro")
+    if numero < 0:
+        raise ValueError("não pode ser negativo")
+    return numero
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip().lower()
+    if texto in ('1', 'true', 'sim', 'yes', 's'):
+        return True
+    if texto in ('0', 'false', 'nao', 'não', 'no', 'n'):
+        return False
+    raise ValueError("deve ser verdadeiro ou falso")
+
+
+# Colunas aceitas na importação (e exportadas, na mesma ordem)
+CAMPOS = {
+    'sku': _texto(50),
+    'nome': _texto(100),
+    'slug': _texto(120),
+    'id_categoria': _inteiro,
+    'descricao': lambda v: str(v),
+    'descricao_curta': _texto(255),
+    'preco': _decimal,
+    'preco_promocional': _decimal,
+    'custo': _decimal,
+    'peso': _decimal,
+    'calorias': _inteiro,
+    'quantidade_estoque': _inteiro,
+    'estoque_minimo': _inteiro,
+    'imagem_principal_url': _texto(255),
+    'ativo': _booleano,
+    'destaque': _booleano,
+    'aceita_personalizacao': _booleano,
+    'tempo_preparo_minutos': _inteiro,
+}
+
+OBRIGATORIOS = ('sku', 'nome', 'preco')
+
+
+# ============================================================
+#                     LEITURA DO ARQUIVO
+# ============================================================
+
+def detectar_formato(formato: str = None, nome_arquivo: str = None, mimetype: str = None) -> str:
+    """
+    Descobre o formato pelo parâmetro explícito, extensão ou Content-Type
+
+    Raises:
+        ValueError: Se o formato não for suportado
+    """
+    if formato:
+        formato = formato.lower()
+    elif nome_arquivo and '.' in nome_arquivo:
+        formato = nome_arquivo.rsplit('.', 1)[1].lower()
+    elif mimetype:
+        formato = 'ndjson' if 'ndjson' in mimetype or 'jsonl' in mimetype else 'csv'
+
+    if formato == 'jsonl':
+        formato = 'ndjson'
+    if formato not in FORMATOS:
+        raise ValueError(f"formato inválido. Use: {', '.join(FORMATOS)}")
+    return formato
+
+
+def _linhas_texto(stream):
+    """Decodifica um stream binário linha a linha, sem carregá-lo inteiro"""
+    for numero, linha in enumerate(stream, start=1):
+        if isinstance(linha, bytes):
+            try:
+                linha = linha.decode('utf-8-sig' if numero == 1 else 'utf-8')
+            except UnicodeDecodeError:
+                raise ValueError(f"Linha {numero}: o arquivo deve estar em UTF-8")
+        yield linha
+
+
+def _ler_registros(stream, formato: str):
+    """Gera (número da linha, dict bruto | mensagem de erro)"""
+    if formato == 'csv':
+        leitor = csv.DictReader(_linhas_texto(stream))
+        for registro in leitor:
+            # Células vazias = "não informado": mantém o valor atual / padrão
+            yield leitor.line_num, {k.strip(): v for k, v in registro.items() if k and v not in (None, '')}
+        return
+
+    for numero, linha in enumerate(_linhas_texto(stream), start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            yield numero, "JSON inválido"
+            continue
+        if not isinstance(registro, dict):
+            yield numero, "cada linha deve ser um objeto JSON"
+            continue
+        yield numero, registro
+
+
+def _validar(registro: dict, categorias: set) -> dict:
+    """
+    Converte um registro bruto nos valores das colunas
+
+    Raises:
+        ValueError: Com a descrição do primeiro problema encontrado
+    """
+    valores = {}
+    for campo, conversor in CAMPOS.items():
+        if campo not in registro:
+            continue
+        bruto = registro[campo]
+        if bruto is None:
+            valores[campo] = None
+            continue
+        try:
+            valores[campo] = conversor(bruto)
+        except ValueError as e:
+            raise ValueError(f"{campo} {e}")
+
+    faltando = [c for c in OBRIGATORIOS if valores.get(c) in (None, '')]
+    if faltando:
+        raise ValueError(f"{', '.join(faltando)} obrigatório(s)")
+
+    if valores['preco'] <= 0:
+        raise ValueError("preco deve ser maior que zero")
+
+    promocional = valores.get('preco_promocional')
+    if promocional is not None and promocional >= valores['preco']:
+        raise ValueError("preco_promocional deve ser menor que preco")
+
+    if valores.get('id_categoria') is not None and valores['id_categoria'] not in categorias:
+        raise ValueError(f"Categoria {valores['id_categoria']} não encontrada")
+
+    if 'slug' in valores:
+        valores['slug'] = slugify(valores['slug'] or '') or None
+        if not valores['slug']:
+            del valores['slug']
+
+    return valores
+
+
+# ============================================================
+#                     GRAVAÇÃO EM LOTE
+# ============================================================
+
+def _montar_upsert(linhas: list, atualizaveis: list):
+    """Um único INSERT multi-linha que atualiza os SKUs já existentes"""
+    tabela = Produto.__table__
+    agora = datetime.utcnow()
+
+    if db.engine.dialect.name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(tabela).values(linhas)
+        novos = stmt.inserted
+        atualizacao = {c: novos[c] for c in atualizaveis}
+        atualizacao['atualizado_em'] = agora
+        return stmt.on_duplicate_key_update(atualizacao)
+
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(tabela).values(linhas)
+    atualizacao = {c: stmt.excluded[c] for c in atualizaveis}
+    atualizacao['atualizado_em'] = agora
+    return stmt.on_conflict_do_update(index_elements=['sku'], set_=atualizacao)
+
+
+class _Lote:
+    """Linhas válidas aguardando gravação, indexadas pelo SKU"""
+
+    def __init__(self):
+        self.linhas = {}
+
+    def adicionar(self, numero: int, valores: dict):
+        # SKU repetido no mesmo lote: a última ocorrência vence
+        self.linhas[valores['sku']] = (numero, valores)
+
+    def __len__(self):
+        return len(self.linhas)
+
+
+class ImportacaoProdutos:
+    """Acumula o relatório enquanto os lotes são gravados"""
+
+    def __init__(self, tamanho_lote: int = TAMANHO_LOTE):
+        self.tamanho_lote = tamanho_lote
+        self.linhas = 0
+        self.inseridos = 0
+        self.atualizados = 0
+        self.total_erros = 0
+        self.erros = []
+        self._categorias = {c for (c,) in db.session.query(Categoria.id_categoria).all()}
+
+    def registrar_erro(self, numero: int, erro: str, sku: str = None):
+        self.total_erros += 1
+        if len(self.erros) < MAX_ERROS_RELATADOS:
+            self.erros.append({'linha': numero, 'sku': sku, 'erro': erro})
+
+    def _resolver_slugs(self, lote: _Lote) -> list:
+        """
+        Define o slug de cada linha e separa as que não podem ser gravadas
+
+        No MySQL o ON DUPLICATE KEY dispara para QUALQUER chave única: um
+        slug repetido de outro produto atualizaria o produto errado. Por
+        isso SKUs existentes mantêm o slug atual (a menos que outro seja
+        informado) e SKUs novos só recebem slugs livres.
+        """
+        skus = list(lote.linhas)
+        existentes = dict(
+            db.session.query(Produto.sku, Produto.slug).filter(Produto.sku.in_(skus)).all()
+        )
+
+        candidatos = {}
+        for sku, (_, valores) in lote.linhas.items():
+            if 'slug' in valores:
+                candidatos[sku] = [valores['slug']]
+            elif sku in existentes:
+                candidatos[sku] = [existentes[sku]]
+            else:
+                base = slugify(valores['nome'])
+                candidatos[sku] = [base, slugify(f"{valores['nome']} {sku}")]
+
+        todos = {s for lista in candidatos.values() for s in lista}
+        ocupados = dict(
+            db.session.query(Produto.slug, Produto.sku).filter(Produto.slug.in_(todos)).all()
+        )
+
+        prontas = []
+        usados = set()
+        for sku, (numero, valores) in lote.linhas.items():
+            livre = next(
+                (s for s in candidatos[sku] if s and ocupados.get(s, sku) == sku and s not in usados),
+                None
+            )
+            if livre is None:
+                self.registrar_erro(numero, f"slug '{candidatos[sku][0]}' já utilizado por outro produto", sku)
+                continue
+
+            usados.add(livre)
+            prontas.append((numero, sku in existentes, dict(valores, slug=livre)))
+        return prontas
+
+    def _gravar(self, prontas: list):
+        # Agrupa por conjunto de colunas informadas: cada grupo é um INSERT
+        # multi-linha que só sobrescreve o que a linha trouxe
+        grupos = {}
+        for numero, existente, valores in prontas:
+            grupos.setdefault(frozenset(valores), []).append((numero, existente, valores))
+
+        for colunas, linhas in grupos.items():
+            atualizaveis = sorted(c for c in colunas if c != 'sku')
+            db.session.execute(_montar_upsert([v for _, _, v in linhas], atualizaveis))
+
+    def _gravar_linha_a_linha(self, prontas: list) -> list:
+        """Lote rejeitado pelo banco: regrava linha a linha para achar as culpadas"""
+        gravadas = []
+        for numero, existente, valores in prontas:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(_montar_upsert([valores], sorted(c for c in valores if c != 'sku')))
+                gravadas.append((numero, existente, valores))
+            except SQLAlchemyError as e:
+                erro = getattr(e, 'orig', e)
+                self.registrar_erro(numero, f"Rejeitado pelo banco: {erro}", valores['sku'])
+        return gravadas
+
+    def descarregar(self, lote: _Lote):
+        if not lote:
+            return
+
+        prontas = self._resolver_slugs(lote)
+        try:
+            self._gravar(prontas)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            prontas = self._gravar_linha_a_linha(prontas)
+            db.session.commit()
+
+        for _, existente, _ in prontas:
+            if existente:
+                self.atualizados += 1
+            else:
+                self.inseridos += 1
+
+        lote.linhas.clear()
+
+    def executar(self, stream, formato: str) -> dict:
+        lote = _Lote()
+
+        for numero, registro in _ler_registros(stream, formato):
+            self.linhas += 1
+            if isinstance(registro, str):
+                self.registrar_erro(numero, registro)
+                continue
+
+            try:
+                valores = _validar(registro, self._categorias)
+            except ValueError as e:
+                self.registrar_erro(numero, str(e), registro.get('sku'))
+                continue
+
+            lote.adicionar(numero, valores)
+            if len(lote) >= self.tamanho_lote:
+                self.descarregar(lote)
+
+        self.descarregar(lote)
+        return self.relatorio()
+
+    def relatorio(self) -> dict:
+        return {
+            'linhas': self.linhas,
+            'inseridos': self.inseridos,
+            'atualizados': self.atualizados,
+            'total_erros': self.total_erros,
+            'erros': self.erros
+        }
+
+
+def importar_produtos(stream, formato: str, tamanho_lote: int = TAMANHO_LOTE) -> dict:
+    """
+    Importa produtos de um arquivo CSV/NDJSON, criando ou atualizando pelo SKU
+
+    Colunas obrigatórias: sku, nome, preco. As demais (ver CAMPOS) só são
+    alteradas quando informadas. O slug é gerado a partir do nome quando
+    não vier no arquivo.
+
+    Args:
+        stream: Arquivo binário (ou iterável de linhas) aberto para leitura
+        formato (str): 'csv' ou 'ndjson'
+
+    Returns:
+        dict: Relatório com linhas lidas, inseridos, atualizados e erros por linha
+
+    Raises:
+        ValueError: Se o formato for inválido ou o arquivo não for UTF-8
+    """
+    formato = detectar_formato(formato)
+    importacao = ImportacaoProdutos(tamanho_lote)
+
+    try:
+        relatorio = importacao.executar(stream, formato)
+    finally:
+        # Lotes já commitados ficam visíveis mesmo se a leitura falhar no meio
+        if importacao.inseridos or importacao.atualizados:
+            obter_motor_busca().recarregar()
+            incrementar_versao_catalogo()
+
+    return relatorio
+
+
+# ============================================================
+#                     EXPORTAÇÃO
+# ============================================================
+
+def _valor_exportado(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def exportar_produtos(formato: str):
+    """
+    Gera o catálogo completo em blocos de texto (CSV ou NDJSON)
+
+    As linhas vêm de um cursor do lado do servidor (yield_per), então só
+    um bloco fica em memória por vez. Precisa rodar dentro do contexto da
+    aplicação (use stream_with_context na rota).
+    """
+    formato = detectar_formato(formato)
+    colunas = [getattr(Produto, c) for c in CAMPOS]
+
+    consulta = (
+        select(*colunas)
+        .order_by(Produto.id_produto)
+        .execution_options(yield_per=LINHAS_POR_BLOCO_EXPORTACAO)
+    )
+
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    if formato == 'csv':
+        escritor.writerow(CAMPOS)
+
+    try:
+        for i, linha in enumerate(db.session.execute(consulta), start=1):
+            if formato == 'csv':
+                escritor.writerow(['' if v is None else _valor_exportado(v) for v in linha])
+            else:
+                registro = {c: _valor_exportado(v) for c, v in zip(CAMPOS, linha)}
+                buffer.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+            if i % LINHAS_POR_BLOCO_EXPORTACAO == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    finally:
+        # Libera o cursor do servidor mesmo se o cliente desconectar
+        db.session.rollback()
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -1,7 +1,150 @@
+from datetime import datetime
+from sqlalchemy import case, func, insert, select, update
 from config import db
-from models.pedido import Pedido, ItemPedido
+from models.pedido import Pedido, ItemPedido, HistoricoStatusPedido, TRANSICOES_STATUS, status_de_origem
 from models.usuario import Usuario
 from models.produto import Produto
+from models.arquivo import pedidos_arquivo, itens_pedido_arquivo
+from helpers.busca import obter_motor_busca
+from helpers.idempotencia import responder_no_commit
+from helpers.cache_catalogo import incrementar_versao_catalogo, incrementar_versao_vendas
+from helpers.vitrine import atualizar_vitrine, ajustar_vitrine, resumo_vitrine
+from helpers.tarefas import apos_commit
+from helpers.arquivo_pedidos import STATUS_FINALIZADOS, fronteira_arquivo
+from helpers.paginacao import (
+    normalizar_limite,
+    codificar_cursor,
+    decodificar_cursor,
+    filtro_keyset,
+    ordenar_keyset,
+)
+
+STATUS_PEDIDO = Pedido.status.type.enums
+MAX_OPERACOES_ITENS = 100
+MAX_PEDIDOS_STATUS = 500
+
+def _atualizar_catalogo(resumos: list, disponibilidade_mudou: bool):
+    """
+    Tarefa pós-commit: ajusta os rankings da home só com estes produtos
+
+    A versão do catálogo (e com ela todo o cache de respostas) só muda se
+    algum produto esgotou ou voltou a ter estoque. Uma venda comum só muda
+    as quantidades exibidas, que podem ficar defasadas até a próxima
+    mudança (o checkout confere o estoque de verdade), e o contador de
+    vendas, que leva a venda às vitrines dos outros workers.
+    """
+    if disponibilidade_mudou:
+        versao = incrementar_versao_catalogo()
+        obter_motor_busca().avancar(versao)
+        atualizar_vitrine(versao, resumos)
+    else:
+        ajustar_vitrine(incrementar_versao_vendas(), resumos)
+
+class EstoqueInsuficiente(ValueError):
+    """O produto não tem estoque para a quantidade pedida (no momento da baixa)"""
+
+    def __init__(self, id_produto: int, nome: str, disponivel: int):
+        super().__init__(f"Estoque insuficiente para {nome}")
+        self.id_produto = id_produto
+        self.nome = nome
+        self.disponivel = disponivel
+
+def _contar_produtos(por_produto: dict, *condicoes) -> int:
+    """Quantos produtos de `por_produto` satisfazem as condições (lidos dentro da transação)"""
+    return db.session.execute(
+        select(func.count())
+        .select_from(Produto)
+        .where(Produto.id_produto.in_(sorted(por_produto)), *condicoes)
+    ).scalar()
+
+def _devolver_estoque(por_produto: dict) -> bool:
+    """
+    Devolve ao estoque (e tira das vendas) as quantidades de cada produto, em um UPDATE
+
+    Returns:
+        bool: True se algum produto estava sem estoque (voltou a aparecer disponível)
+    """
+    devolvida = case(por_produto, value=Produto.id_produto, else_=0)
+    db.session.execute(
+        update(Produto)
+        .where(Produto.id_produto.in_(sorted(por_produto)))
+        .values(
+            quantidade_estoque=Produto.quantidade_estoque + devolvida,
+            quantidade_vendida=Produto.quantidade_vendida - devolvida
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    # Linhas já travadas pelo UPDATE: estoque igual ao devolvido = estava zerado
+    return _contar_produtos(por_produto, Produto.quantidade_estoque == devolvida) > 0
+
+def _baixar_estoque(por_produto: dict) -> bool:
+    """
+    Baixa o estoque de todos os produtos de uma vez, só se houver estoque
+
+    UPDATE ... WHERE id_produto IN (...) AND quantidade_estoque >= CASE ...
+    é atômico por linha: dois checkouts simultâneos nunca leem o mesmo
+    estoque. Se alguma linha não casar (rowcount menor que o número de
+    produtos), outro pedido levou o estoque antes e a transação é desfeita.
+    O InnoDB trava as linhas na ordem da chave primária, então checkouts
+    concorrentes não entram em deadlock.
+
+    Faz o papel de um SELECT ... FOR UPDATE ordenado por id seguido da
+    baixa: os mesmos locks de linha, na mesma ordem, mas em uma ida ao
+    banco em vez de duas, e sem manter as linhas travadas enquanto o
+    Python confere as quantidades. A conferência fica no próprio WHERE.
+
+    Returns:
+        bool: True se algum produto esgotou com esta baixa
+
+    Raises:
+        EstoqueInsuficiente: Com o primeiro produto que ficou sem estoque
+    """
+    pedida = case(por_produto, value=Produto.id_produto, else_=0)
+    resultado = db.session.execute(
+        update(Produto)
+        .where(
+            Produto.id_produto.in_(sorted(por_produto)),
+            Produto.ativo.is_(True),
+            Produto.quantidade_estoque >= pedida
+        )
+        .values(
+            quantidade_estoque=Produto.quantidade_estoque - pedida,
+            quantidade_vendida=Produto.quantidade_vendida + pedida
+        ),
+        execution_options={'synchronize_session': False}
+    )
+
+    if resultado.rowcount == len(por_produto):
+        return _contar_produtos(por_produto, Produto.quantidade_estoque == 0) > 0
+
+    db.session.rollback()
+
+    # Só no caminho de falha: descobre qual produto faltou para a mensagem
+    atuais = (
+        db.session.query(Produto.id_produto, Produto.nome, Produto.quantidade_estoque, Produto.ativo)
+        .filter(Produto.id_produto.in_(sorted(por_produto)))
+        .order_by(Produto.id_produto)
+        .all()
+    )
+    for linha in atuais:
+        if not linha.ativo or linha.quantidade_estoque < por_produto[linha.id_produto]:
+            raise EstoqueInsuficiente(linha.id_produto, linha.nome, linha.quantidade_estoque if linha.ativo else 0)
+    raise EstoqueInsuficiente(atuais[0].id_produto, atuais[0].nome, atuais[0].quantidade_estoque)
+
+def _ler_itens(itens) -> list:
+    """Valida as linhas do carrinho: [(id_produto, quantidade), ...]"""
+    linhas = []
+    for it in itens:
+        try:
+            id_prod = int(it.get("id_produto"))
+            quantidade = int(it.get("quantidade", 1))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError("Cada item precisa de id_produto e quantidade inteiros")
+
+        if quantidade <= 0:
+            raise ValueError("Quantidade deve ser positiva")
+        linhas.append((id_prod, quantidade))
+    return linhas
 
 def criar_pedido(payload: dict):
     id_usuario = payload.get("id_usuario")
@@ -10,49 +153,589 @@ def criar_pedido(payload: dict):
     if not id_usuario or not itens:
         raise ValueError("id_usuario e itens são obrigatórios")
 
+    linhas = _ler_itens(itens)
+
     user = Usuario.query.get(id_usuario)
     if not user:
         raise ValueError("Usuário não encontrado")
 
-    pedido = Pedido(id_usuario=id_usuario)
-    db.session.add(pedido)
-    db.session.flush()
-
-    total = 0.0
+    # O mesmo produto pode aparecer em mais de uma linha do carrinho
+    por_produto = {}
+    for id_prod, quantidade in linhas:
+        por_produto[id_prod] = por_produto.get(id_prod, 0) + quantidade
 
-    for it in itens:
-        id_prod = it.get("id_produto")
-        quantidade = it.get("quantidade", 1)
+    # Uma consulta para o carrinho inteiro, sem travar nada: quem garante
+    # o estoque é o UPDATE condicional de gravar_pedido
+    produtos = {
+        p.id_produto: p
+        for p in Produto.query.filter(Produto.id_produto.in_(list(por_produto))).all()
+    }
 
-        produto = Produto.query.get(id_prod)
+    for id_prod, quantidade in por_produto.items():
+        produto = produtos.get(id_prod)
         if not produto:
             db.session.rollback()
             raise ValueError(f"Produto {id_prod} não encontrado")
 
-        if produto.quantidade < quantidade:
+        if not produto.verificar_estoque(quantidade):
             db.session.rollback()
-            raise ValueError(f"Estoque insuficiente para {produto.nome}")
+            raise EstoqueInsuficiente(produto.id_produto, produto.nome, produto.quantidade_estoque)
+
+    cotados = {
+        id_prod: {'nome': p.nome, 'preco': p.preco_final, 'resumo': resumo_vitrine(p)}
+        for id_prod, p in produtos.items()
+    }
+    return gravar_pedido(id_usuario, linhas, cotados)
+
+def gravar_pedido(id_usuario: int, linhas: list, cotados: dict):
+    """
+    Grava o pedido com preços já conhecidos (lidos agora ou de uma cotação)
+
+    O estoque não é conferido aqui: o UPDATE condicional de
+    _baixar_estoque é quem garante que há estoque para tudo.
+
+    Args:
+        linhas: [(id_produto, quantidade), ...]
+        cotados: {id_produto: {nome, preco, resumo}} (resumo = resumo_vitrine)
 
-        produto.quantidade -= quantidade
+    Raises:
+        EstoqueInsuficiente: Algum produto ficou sem estoque
+    """
+    por_produto = {}
+    for id_prod, quantidade in linhas:
+        por_produto[id_prod] = por_produto.get(id_prod, 0) + quantidade
 
-        item = ItemPedido(
-            id_pedido=pedido.id_pedido,
-            id_produto=id_prod,
-            quantidade=quantidade,
-            preco_unitario=produto.preco
+    # Itens montados em memória; o pedido já nasce com o total
+    total = sum(cotados[i]['preco'] * q for i, q in linhas)
+    pedido = Pedido(
+        id_usuario=id_usuario,
+        numero_pedido=Pedido.gerar_numero_pedido(),
+        subtotal=total,
+        valor_total=total
+    )
+    db.session.add(pedido)
+    db.session.flush()
+
+    linhas_itens = [
+        {
+            'id_pedido': pedido.id_pedido,
+            'id_produto': id_prod,
+            'nome_produto': cotados[id_prod]['nome'],
+            'quantidade': quantidade,
+            'preco_unitario': cotados[id_prod]['preco'],
+            'subtotal': cotados[id_prod]['preco'] * quantidade
+        }
+        for id_prod, quantidade in linhas
+    ]
+
+    resumos = []
+    for id_prod, quantidade in por_produto.items():
+        resumo = dict(cotados[id_prod]['resumo'])
+        resumo['quantidade_vendida'] += quantidade
+        resumos.append(resumo)
+
+    esgotou = _baixar_estoque(por_produto)
+
+    # Um INSERT multi-linha (executemany) para todos os itens
+    db.session.execute(insert(ItemPedido.__table__), linhas_itens)
+
+    # Fora do tempo de resposta do checkout; descartada se houver rollback
+    apos_commit(_atualizar_catalogo, resumos, esgotou)
+    # Com Idempotency-Key, a resposta vai no mesmo commit que o pedido
+    responder_no_commit(pedido.to_dict, 201)
+    db.session.commit()
+
+    return pedido
+
+def _ler_booleano(valor, padrao: bool) -> bool:
+    if valor in (None, ''):
+        return padrao
+    return str(valor).lower() in ('1', 'true', 'sim')
+
+def _itens_arquivados(ids: list, include_itens: bool):
+    """Itens (ou quantidades) de pedidos arquivados, como na consulta das tabelas quentes"""
+    if include_itens:
+        linhas = db.session.execute(
+            select(itens_pedido_arquivo)
+            .where(itens_pedido_arquivo.c.id_pedido.in_(ids))
+            .order_by(itens_pedido_arquivo.c.id_pedido, itens_pedido_arquivo.c.id_item)
+        ).all()
+        return [ItemPedido(**linha._mapping) for linha in linhas]
+
+    return (
+        db.session.query(itens_pedido_arquivo.c.id_pedido, func.sum(itens_pedido_arquivo.c.quantidade))
+        .filter(itens_pedido_arquivo.c.id_pedido.in_(ids))
+        .group_by(itens_pedido_arquivo.c.id_pedido)
+        .all()
+    )
+
+def carregar_dados_pedidos(pedidos: list, include_itens: bool = True, include_usuario: bool = False,
+                           arquivados: bool = False) -> list:
+    """
+    Serializa uma página de pedidos com um número fixo de consultas
+
+    Em vez de duas consultas por pedido (itens e quantidade_itens):
+        - com itens: uma consulta para os itens da página inteira (o
+          produto vem junto, ItemPedido.produto é lazy='joined');
+        - sem itens: um SUM(quantidade) ... GROUP BY id_pedido;
+        - com usuário: uma consulta para os donos da página.
+
+    Com `arquivados`, os pedidos são objetos transitórios montados a partir
+    de pedidos_arquivo e os itens vêm de itens_pedido_arquivo (sem o
+    resumo do produto).
+    """
+    if not pedidos:
+        return []
+
+    ids = [p.id_pedido for p in pedidos]
+    itens_por_pedido = None
+    quantidades = {}
+
+    if include_itens:
+        itens_por_pedido = {id_pedido: [] for id_pedido in ids}
+        if arquivados:
+            itens = _itens_arquivados(ids, True)
+        else:
+            itens = (
+                ItemPedido.query
+                .filter(ItemPedido.id_pedido.in_(ids))
+                .order_by(ItemPedido.id_pedido, ItemPedido.id_item)
+                .all()
+            )
+        for item in itens:
+            itens_por_pedido[item.id_pedido].append(item)
+    elif arquivados:
+        quantidades = dict(_itens_arquivados(ids, False))
+    else:
+        quantidades = dict(
+            db.session.query(ItemPedido.id_pedido, func.sum(ItemPedido.quantidade))
+            .filter(ItemPedido.id_pedido.in_(ids))
+            .group_by(ItemPedido.id_pedido)
+            .all()
         )
-        db.session.add(item)
 
-        total += float(produto.preco) * quantidade
+    usuarios = {}
+    if include_usuario:
+        usuarios = {
+            u.id_usuario: u
+            for u in Usuario.query.filter(Usuario.id_usuario.in_({p.id_usuario for p in pedidos})).all()
+        }
+
+    resultado = []
+    for p in pedidos:
+        if itens_por_pedido is not None:
+            itens = itens_por_pedido[p.id_pedido]
+            quantidade = sum(item.quantidade for item in itens)
+        else:
+            itens, quantidade = None, int(quantidades.get(p.id_pedido) or 0)
+
+        data = p.to_dict(include_itens=include_itens, itens=itens, quantidade_itens=quantidade)
+        if include_usuario and p.id_usuario in usuarios:
+            data['usuario'] = usuarios[p.id_usuario].to_dict_resumido()
+        data['arquivado'] = arquivados
+        resultado.append(data)
+
+    return resultado
+
+def _filtros_pedidos(colunas, id_usuario, status, cursor) -> list:
+    """Mesmos filtros para `pedidos` e `pedidos_arquivo` (colunas = Pedido ou pedidos_arquivo.c)"""
+    condicoes = []
+    if id_usuario is not None:
+        condicoes.append(colunas.id_usuario == id_usuario)
+    if status:
+        condicoes.append(colunas.status == status)
+    if cursor:
+        condicoes.append(filtro_keyset(colunas.data_pedido, colunas.id_pedido, cursor[0], cursor[1], descendente=True))
+    return condicoes
+
+def _precisa_arquivo(quentes: list, limite: int, status) -> bool:
+    """
+    O arquivo só entra na página se puder ter pedidos mais recentes que a
+    última linha quente buscada (ou se as tabelas quentes acabaram)
+    """
+    if status and status not in STATUS_FINALIZADOS:
+        return False
+    if len(quentes) <= limite:
+        return True
+    return quentes[limite].data_pedido <= fronteira_arquivo()
+
+def listar_pedidos(filtros=None, id_usuario: int = None, include_usuario: bool = False):
+    """
+    Pedidos mais recentes primeiro, paginados por cursor
+
+    A listagem continua no arquivo (pedidos finalizados antigos, ver
+    helpers/arquivo_pedidos.py) sem mudar o cursor: as páginas recentes
+    leem só as tabelas quentes; o arquivo é consultado quando a página
+    chega perto da data dos pedidos arquivados. Pedidos arquivados vêm
+    com "arquivado": true.
+
+    Filtros aceitos (query string):
+        status, id_usuario (só na listagem geral), itens (padrão 1),
+        limite (padrão 20, máx. 100), cursor
+
+    Args:
+        id_usuario: Restringe aos pedidos deste usuário (meus pedidos)
+        include_usuario: Inclui o resumo do dono de cada pedido
+
+    Returns:
+        tuple[list[dict], str | None]: Página de pedidos e cursor da próxima página
+    """
+    filtros = filtros or {}
+    limite = normalizar_limite(filtros.get('limite'))
+
+    if id_usuario is None and filtros.get('id_usuario') not in (None, ''):
+        try:
+            id_usuario = int(filtros.get('id_usuario'))
+        except ValueError:
+            raise ValueError("id_usuario deve ser um número inteiro")
 
-    pedido.valor_total = total
+    status = filtros.get('status') or None
+    if status and status not in STATUS_PEDIDO:
+        raise ValueError(f"status inválido. Use: {', '.join(STATUS_PEDIDO)}")
+
+    cursor = decodificar_cursor(filtros.get('cursor'))
+    posicao = None
+    if cursor:
+        try:
+            posicao = (datetime.fromisoformat(cursor['v']), int(cursor['id']))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Cursor inválido")
+
+    # (id_usuario, data_pedido) ou (data_pedido): o índice já entrega na ordem
+    # Busca uma linha a mais só para saber se existe próxima página
+    quentes = (
+        Pedido.query
+        .filter(*_filtros_pedidos(Pedido, id_usuario, status, posicao))
+        .order_by(*ordenar_keyset(Pedido.data_pedido, Pedido.id_pedido, descendente=True))
+        .limit(limite + 1)
+        .all()
+    )
+
+    arquivados = []
+    if _precisa_arquivo(quentes, limite, status):
+        colunas = pedidos_arquivo.c
+        linhas = db.session.execute(
+            select(pedidos_arquivo)
+            .where(*_filtros_pedidos(colunas, id_usuario, status, posicao))
+            .order_by(*ordenar_keyset(colunas.data_pedido, colunas.id_pedido, descendente=True))
+            .limit(limite + 1)
+        ).all()
+        # Transitórios: nunca entram na sessão
+        arquivados = [Pedido(**linha._mapping) for linha in linhas]
+
+    pagina = sorted(
+        [(p, False) for p in quentes] + [(p, True) for p in arquivados],
+        key=lambda par: (par[0].data_pedido, par[0].id_pedido),
+        reverse=True
+    )
+
+    proximo_cursor = None
+    if len(pagina) > limite:
+        pagina = pagina[:limite]
+        ultimo = pagina[-1][0]
+        proximo_cursor = codificar_cursor({'v': ultimo.data_pedido.isoformat(), 'id': ultimo.id_pedido})
+
+    include_itens = _ler_booleano(filtros.get('itens'), True)
+    dados = {}
+    for arquivado in (False, True):
+        grupo = [p for p, a in pagina if a is arquivado]
+        for p, d in zip(grupo, carregar_dados_pedidos(grupo, include_itens, include_usuario, arquivado)):
+            dados[(p.id_pedido, arquivado)] = d
+
+    return [dados[(p.id_pedido, a)] for p, a in pagina], proximo_cursor
+
+def detalhar_pedido(id_pedido: int):
+    """
+    Pedido completo (com itens), procurando também no arquivo
+
+    Returns:
+        dict | None
+    """
+    pedido = Pedido.query.get(id_pedido)
+    if pedido:
+        return pedido.to_dict()
+
+    linha = db.session.execute(
+        select(pedidos_arquivo).where(pedidos_arquivo.c.id_pedido == id_pedido)
+    ).first()
+    if not linha:
+        return None
+
+    return carregar_dados_pedidos([Pedido(**linha._mapping)], arquivados=True)[0]
+
+def _ler_operacoes(operacoes) -> list:
+    """
+    Valida o formato das operações de edição de itens
+
+    Returns:
+        list[dict]: Operações normalizadas (op, id_item | id_produto, quantidade)
+    """
+    if not isinstance(operacoes, list) or not operacoes:
+        raise ValueError("operacoes deve ser uma lista não vazia")
+    if len(operacoes) > MAX_OPERACOES_ITENS:
+        raise ValueError(f"Máximo de {MAX_OPERACOES_ITENS} operações por edição")
+
+    lidas = []
+    for i, operacao in enumerate(operacoes, start=1):
+        if not isinstance(operacao, dict):
+            raise ValueError(f"Operação {i}: formato inválido")
+
+        op = operacao.get("op")
+        if op not in ("adicionar", "quantidade", "remover"):
+            raise ValueError(f"Operação {i}: op deve ser adicionar, quantidade ou remover")
+
+        try:
+            if op == "adicionar":
+                lida = {
+                    "op": op,
+                    "id_produto": int(operacao["id_produto"]),
+                    "quantidade": int(operacao.get("quantidade", 1)),
+                    "observacoes": operacao.get("observacoes")
+                }
+            elif op == "quantidade":
+                lida = {"op": op, "id_item": int(operacao["id_item"]), "quantidade": int(operacao["quantidade"])}
+            else:
+                lida = {"op": op, "id_item": int(operacao["id_item"])}
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Operação {i}: campos obrigatórios ausentes ou não inteiros")
+
+        if lida.get("quantidade", 1) <= 0:
+            raise ValueError(f"Operação {i}: quantidade deve ser positiva")
+        lidas.append(lida)
+
+    return lidas
+
+def editar_itens_pedido(id_pedido: int, operacoes, id_usuario: int = None):
+    """
+    Aplica várias alterações de itens em um pedido de uma só vez
+
+    As operações são aplicadas em memória, na ordem recebida; o estoque
+    é ajustado pela diferença líquida por produto (uma baixa condicional
+    e uma devolução), subtotal e total são recalculados uma vez e tudo é
+    gravado em um único commit. Qualquer erro desfaz a edição inteira.
+
+    Args:
+        operacoes (list): [{op: "adicionar", id_produto, quantidade?, observacoes?},
+                           {op: "quantidade", id_item, quantidade},
+                           {op: "remover", id_item}]
+        id_usuario: Se informado, o pedido precisa ser deste usuário
+
+    Returns:
+        Pedido | None: None se o pedido não existe (ou é de outro usuário)
+
+    Raises:
+        EstoqueInsuficiente: Algum produto não tem estoque para o aumento
+        ValueError: Operação inválida ou pedido que não aceita mais edição
+    """
+    lidas = _ler_operacoes(operacoes)
+
+    pedido = Pedido.query.filter_by(id_pedido=id_pedido).with_for_update().first()
+    if not pedido or (id_usuario is not None and pedido.id_usuario != id_usuario):
+        db.session.rollback()
+        return None
+
+    if pedido.status != 'Aguardando pagamento':
+        db.session.rollback()
+        raise ValueError(f"Pedido com status '{pedido.status}' não pode ter itens alterados")
+
+    itens = {item.id_item: item for item in pedido.itens.all()}
+    antes = {}
+    for item in itens.values():
+        antes[item.id_produto] = antes.get(item.id_produto, 0) + item.quantidade
+
+    # Produtos novos no pedido: uma consulta para todos
+    ids_novos = {o["id_produto"] for o in lidas if o["op"] == "adicionar"}
+    produtos = {item.id_produto: item.produto for item in itens.values()}
+    faltando = ids_novos - set(produtos)
+    if faltando:
+        for p in Produto.query.filter(Produto.id_produto.in_(faltando)).all():
+            produtos[p.id_produto] = p
+
+    removidos = []
+    novos = []
+    for i, operacao in enumerate(lidas, start=1):
+        op = operacao["op"]
+
+        if op == "adicionar":
+            produto = produtos.get(operacao["id_produto"])
+            if not produto or not produto.ativo:
+                db.session.rollback()
+                raise ValueError(f"Operação {i}: produto {operacao['id_produto']} não encontrado")
+
+            # Produto já no pedido: soma na linha existente
+            existente = next(
+                (it for it in list(itens.values()) + novos if it.id_produto == produto.id_produto), None
+            )
+            if existente:
+                existente.quantidade += operacao["quantidade"]
+                existente.calcular_subtotal()
+            else:
+                item = ItemPedido(
+                    id_pedido=pedido.id_pedido,
+                    id_produto=produto.id_produto,
+                    nome_produto=produto.nome,
+                    quantidade=operacao["quantidade"],
+                    preco_unitario=produto.preco_final,
+                    observacoes=operacao["observacoes"]
+                )
+                item.calcular_subtotal()
+                novos.append(item)
+            continue
+
+        item = itens.get(operacao["id_item"])
+        if not item:
+            db.session.rollback()
+            raise ValueError(f"Operação {i}: item {operacao['id_item']} não encontrado no pedido")
+
+        if op == "quantidade":
+            item.quantidade = operacao["quantidade"]
+            item.calcular_subtotal()
+        else:
+            removidos.append(itens.pop(item.id_item))
+
+    finais = list(itens.values()) + novos
+    if not finais:
+        db.session.rollback()
+        raise ValueError("O pedido precisa de ao menos um item (para desistir, cancele o pedido)")
+
+    depois = {}
+    for item in finais:
+        depois[item.id_produto] = depois.get(item.id_produto, 0) + item.quantidade
+
+    diferenca = {
+        id_prod: depois.get(id_prod, 0) - antes.get(id_prod, 0)
+        for id_prod in set(antes) | set(depois)
+    }
+    baixa = {i: q for i, q in diferenca.items() if q > 0}
+    devolucao = {i: -q for i, q in diferenca.items() if q < 0}
+
+    # Capturado antes dos UPDATEs em massa, que deixam os objetos desatualizados
+    resumos = []
+    for id_prod, quantidade in diferenca.items():
+        if quantidade and id_prod in produtos:
+            resumo = resumo_vitrine(produtos[id_prod])
+            resumo['quantidade_vendida'] += quantidade
+            resumos.append(resumo)
+
+    disponibilidade_mudou = False
+    if baixa:
+        disponibilidade_mudou |= _baixar_estoque(baixa)
+    if devolucao:
+        disponibilidade_mudou |= _devolver_estoque(devolucao)
+
+    # DELETEs antes dos INSERTs, e o total só depois deles: em bancos que
+    # ainda têm trg_after_insert_item_update_total, cada INSERT re-soma os
+    # itens do pedido (o flush normal inseriria antes de apagar)
+    for item in removidos:
+        db.session.delete(item)
+    db.session.flush()
+    db.session.add_all(novos)
+    db.session.flush()
+
+    pedido.definir_valores(finais)
+    if resumos:
+        apos_commit(_atualizar_catalogo, resumos, disponibilidade_mudou)
     db.session.commit()
 
     return pedido
 
-def listar_pedidos():
-    pedidos = Pedido.query.order_by(Pedido.data_pedido.desc()).all()
-    return [p.to_dict() for p in pedidos]
+def atualizar_status_pedidos(ids, novo_status: str, observacao: str = None, alterado_por: int = None):
+    """
+    Move vários pedidos para `novo_status` de uma vez (ex.: cozinha
+    marcando "Em preparo" -> "Pronto")
+
+    Uma leitura com FOR UPDATE (status atual de todos), um UPDATE para
+    os pedidos cuja transição é permitida, um INSERT multi-linha no
+    histórico e um commit. Pedidos inexistentes ou em status que não
+    permite a transição são devolvidos em `rejeitados`, sem impedir os
+    demais. Cancelar devolve o estoque de todos os itens em um UPDATE.
+
+    Returns:
+        dict: {atualizados: [id_pedido], rejeitados: [{id_pedido, status, erro}]}
+
+    Raises:
+        ValueError: Status desconhecido ou lista de ids inválida
+    """
+    if novo_status not in TRANSICOES_STATUS:
+        raise ValueError(f"status inválido. Use: {', '.join(TRANSICOES_STATUS)}")
+
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("ids deve ser uma lista não vazia")
+    if len(ids) > MAX_PEDIDOS_STATUS:
+        raise ValueError(f"Máximo de {MAX_PEDIDOS_STATUS} pedidos por atualização")
+    try:
+        ids = sorted({int(i) for i in ids})
+    except (TypeError, ValueError):
+        raise ValueError("ids deve conter apenas números inteiros")
+
+    origens = status_de_origem(novo_status)
+
+    # Travados na ordem da chave primária: lotes concorrentes não se cruzam
+    atuais = dict(
+        db.session.query(Pedido.id_pedido, Pedido.status)
+        .filter(Pedido.id_pedido.in_(ids))
+        .order_by(Pedido.id_pedido)
+        .with_for_update()
+        .all()
+    )
+
+    validos = [i for i in ids if atuais.get(i) in origens]
+    rejeitados = [
+        {
+            'id_pedido': i,
+            'status': atuais.get(i),
+            'erro': "Pedido não encontrado" if i not in atuais
+                    else f"Pedido com status '{atuais[i]}' não pode ir para '{novo_status}'"
+        }
+        for i in ids if i not in validos
+    ]
+
+    if not validos:
+        db.session.rollback()
+        return {'atualizados': [], 'rejeitados': rejeitados}
+
+    resumos = []
+    voltou_ao_estoque = False
+    if novo_status == 'Cancelado':
+        por_produto = dict(
+            db.session.query(ItemPedido.id_produto, func.sum(ItemPedido.quantidade))
+            .filter(ItemPedido.id_pedido.in_(validos))
+            .group_by(ItemPedido.id_produto)
+            .all()
+        )
+        por_produto = {id_prod: int(q) for id_prod, q in por_produto.items()}
+        if por_produto:
+            for produto in Produto.query.filter(Produto.id_produto.in_(list(por_produto))).all():
+                resumo = resumo_vitrine(produto)
+                resumo['quantidade_vendida'] -= por_produto[produto.id_produto]
+                resumos.append(resumo)
+            voltou_ao_estoque = _devolver_estoque(por_produto)
+
+    db.session.execute(
+        update(Pedido)
+        .where(Pedido.id_pedido.in_(validos))
+        .values(status=novo_status, data_atualizacao=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+
+    agora = datetime.utcnow()
+    db.session.execute(insert(HistoricoStatusPedido.__table__), [
+        {
+            'id_pedido': i,
+            'status_anterior': atuais[i],
+            'status_novo': novo_status,
+            'observacao': observacao,
+            'alterado_por': alterado_por,
+            'data_alteracao': agora
+        }
+        for i in validos
+    ])
+
+    if resumos:
+        apos_commit(_atualizar_catalogo, resumos, voltou_ao_estoque)
+    db.session.commit()
+
+    return {'atualizados': validos, 'rejeitados': rejeitados}
 
 def buscar_pedido(id_pedido: int):
     return Pedido.query.get(id_pedido)
\ No newline at end of file
@@ -1,9 +1,156 @@
-from models.produto import Produto
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import case, update
+from models.produto import Produto, ImagemProduto
 from config import db
+from helpers.paginacao import (
+    normalizar_limite,
+    codificar_cursor,
+    decodificar_cursor,
+    filtro_keyset,
+    ordenar_keyset
+)
+from helpers.busca import obter_motor_busca
+from helpers.cache_catalogo import incrementar_versao_catalogo
+from helpers.imagens import processar_imagem
+from helpers.vitrine import listar_vitrine, atualizar_vitrine, resumo_vitrine, LIMITE_MAXIMO as LIMITE_VITRINE
+from slugify import slugify
 
-def listar_produtos():
-    produtos = Produto.query.filter_by(ativo=True).all()
-    return [p.to_dict() for p in produtos]
+# Ordenações do catálogo: (coluna, descendente, nullable, conversor do cursor)
+# Cada uma tem um índice correspondente em produtos:
+#   preco -> idx_preco | quantidade_vendida -> idx_vendidos | avaliacao_media -> idx_avaliacao
+ORDENACOES = {
+    'recentes': (None, True, False, None),
+    'preco_asc': (Produto.preco, False, False, Decimal),
+    'preco_desc': (Produto.preco, True, False, Decimal),
+    'mais_vendidos': (Produto.quantidade_vendida, True, False, int),
+    'avaliacao': (Produto.avaliacao_media, True, True, Decimal),
+}
+
+ORDENACAO_PADRAO = 'recentes'
+
+# Atualização em lote (PATCH /lote)
+CAMPOS_LOTE = ('preco', 'preco_promocional', 'quantidade_estoque', 'ativo')
+MAX_ITENS_LOTE = 1000
+
+
+def _ler_decimal(valor, campo: str):
+    if valor in (None, ''):
+        return None
+    try:
+        return Decimal(str(valor))
+    except InvalidOperation:
+        raise ValueError(f"{campo} deve ser um número")
+
+
+def _ler_booleano(valor):
+    if valor in (None, ''):
+        return None
+    return str(valor).lower() in ('1', 'true', 'sim', 'yes')
+
+
+def listar_produtos(filtros: dict = None):
+    """
+    Lista produtos ativos com filtros e paginação por cursor
+
+    Filtros aceitos (query string):
+        categoria, preco_min, preco_max, destaque, ordenacao, limite, cursor
+
+    Returns:
+        tuple[list[dict], str | None]: Página de produtos e cursor da próxima página
+    """
+    filtros = filtros or {}
+
+    ordenacao = filtros.get('ordenacao') or ORDENACAO_PADRAO
+    if ordenacao not in ORDENACOES:
+        raise ValueError(f"ordenacao inválida. Use: {', '.join(ORDENACOES)}")
+
+    coluna, descendente, nullable, conversor = ORDENACOES[ordenacao]
+    limite = normalizar_limite(filtros.get('limite'))
+
+    query = Produto.query.filter(Produto.ativo.is_(True))
+
+    categoria = filtros.get('categoria')
+    if categoria not in (None, ''):
+        try:
+            query = query.filter(Produto.id_categoria == int(categoria))
+        except ValueError:
+            raise ValueError("categoria deve ser um número inteiro")
+
+    preco_min = _ler_decimal(filtros.get('preco_min'), 'preco_min')
+    if preco_min is not None:
+        query = query.filter(Produto.preco >= preco_min)
+
+    preco_max = _ler_decimal(filtros.get('preco_max'), 'preco_max')
+    if preco_max is not None:
+        query = query.filter(Produto.preco <= preco_max)
+
+    destaque = _ler_booleano(filtros.get('destaque'))
+    if destaque is not None:
+        query = query.filter(Produto.destaque.is_(destaque))
+
+    cursor = decodificar_cursor(filtros.get('cursor'))
+    if cursor:
+        if cursor.get('o') != ordenacao or 'id' not in cursor:
+            raise ValueError("Cursor não corresponde à ordenação solicitada")
+
+        # Cursor adulterado (ex.: v="abc", v=[], id=null) é erro do cliente, não 500
+        try:
+            valor = cursor.get('v')
+            if valor is not None and conversor:
+                valor = conversor(valor)
+                if isinstance(valor, Decimal) and not valor.is_finite():
+                    raise ValueError
+            ultimo_id = int(cursor['id'])
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValueError("Cursor inválido")
+
+        query = query.filter(
+            filtro_keyset(coluna, Produto.id_produto, valor, ultimo_id, descendente, nullable)
+        )
+
+    query = query.order_by(*ordenar_keyset(coluna, Produto.id_produto, descendente))
+
+    # Busca uma linha a mais só para saber se existe próxima página
+    produtos = query.limit(limite + 1).all()
+
+    proximo_cursor = None
+    if len(produtos) > limite:
+        produtos = produtos[:limite]
+        ultimo = produtos[-1]
+        proximo_cursor = codificar_cursor({
+            'o': ordenacao,
+            'v': getattr(ultimo, coluna.key) if coluna is not None else None,
+            'id': ultimo.id_produto
+        })
+
+    return [p.to_dict() for p in produtos], proximo_cursor
+
+def buscar_produtos(termo: str, limite=None):
+    """
+    Busca produtos ativos por relevância (nome e descrição)
+
+    Returns:
+        list[dict]: Produtos na ordem de relevância
+    """
+    termo = (termo or '').strip()
+    if not termo:
+        raise ValueError("Informe o termo de busca (q)")
+
+    ids = obter_motor_busca().buscar(termo, normalizar_limite(limite))
+    if not ids:
+        return []
+
+    # Carrega a página inteira em uma consulta e reaplica a ordem do ranking
+    produtos = {p.id_produto: p for p in Produto.query.filter(Produto.id_produto.in_(ids)).all()}
+    return [produtos[i].to_dict() for i in ids if i in produtos]
+
+def listar_destaques(limite=None):
+    """Produtos em destaque da home, já ordenados (snapshot em memória)"""
+    return listar_vitrine('destaques', normalizar_limite(limite, LIMITE_VITRINE, LIMITE_VITRINE))
+
+def listar_mais_vendidos(limite=None):
+    """Produtos mais vendidos, já ordenados (snapshot em memória)"""
+    return listar_vitrine('mais_vendidos', normalizar_limite(limite, 10, LIMITE_VITRINE))
 
 def buscar_produto(id_produto: int):
     return Produto.query.get(id_produto)
@@ -11,22 +158,32 @@ def buscar_produto(id_produto: int):
 def criar_produto(data: dict):
     nome = data.get('nome')
     preco = data.get('preco')
+    sku = data.get('sku')
 
-    if not nome or preco is None:
-        raise ValueError("nome e preco são obrigatórios")
+    if not nome or preco is None or not sku:
+        raise ValueError("nome, preco e sku são obrigatórios")
 
     produto = Produto(
         nome=nome,
+        sku=sku,
+        slug=data.get('slug') or slugify(nome),
+        id_categoria=data.get('id_categoria'),
         descricao=data.get('descricao'),
+        descricao_curta=data.get('descricao_curta'),
         preco=preco,
-        quantidade=data.get('quantidade', 0),
-        imagem_url=data.get('imagem_url'),
+        preco_promocional=data.get('preco_promocional'),
+        quantidade_estoque=data.get('quantidade_estoque', 0),
+        imagem_principal_url=data.get('imagem_principal_url'),
+        destaque=data.get('destaque', False),
         ativo=data.get('ativo', True)
     )
 
     db.session.add(produto)
     db.session.commit()
 
+    versao = incrementar_versao_catalogo()
+    obter_motor_busca().indexar(produto, versao)
+    atualizar_vitrine(versao, [resumo_vitrine(produto)])
     return produto
 
 def atualizar_produto(id_produto: int, data: dict):
@@ -34,13 +191,212 @@ def atualizar_produto(id_produto: int, data: dict):
     if not produto:
         return None
 
-    for campo in ['nome','descricao','preco','quantidade','imagem_url','ativo']:
+    for campo in ['nome','descricao','descricao_curta','preco','preco_promocional','quantidade_estoque',
+                  'imagem_principal_url','id_categoria','destaque','ativo']:
         if campo in data:
             setattr(produto, campo, data[campo])
 
     db.session.commit()
+
+    versao = incrementar_versao_catalogo()
+    obter_motor_busca().indexar(produto, versao)
+    atualizar_vitrine(versao, [resumo_vitrine(produto)])
     return produto
 
+def _validar_item_lote(item, atual: dict) -> dict:
+    """Converte um item do lote nas mudanças efetivas (só campos que mudam)"""
+    mudancas = {}
+
+    if 'preco' in item:
+        preco = _ler_decimal(item['preco'], 'preco')
+        if preco is None or preco <= 0:
+            raise ValueError("preco deve ser maior que zero")
+        mudancas['preco'] = preco
+
+    if 'preco_promocional' in item:
+        promocional = _ler_decimal(item['preco_promocional'], 'preco_promocional')
+        if promocional is not None and promocional <= 0:
+            raise ValueError("preco_promocional deve ser maior que zero")
+        mudancas['preco_promocional'] = promocional
+
+    if 'quantidade_estoque' in item and 'ajuste_estoque' in item:
+        raise ValueError("informe quantidade_estoque ou ajuste_estoque, não os dois")
+
+    if 'quantidade_estoque' in item or 'ajuste_estoque' in item:
+        campo = 'quantidade_estoque' if 'quantidade_estoque' in item else 'ajuste_estoque'
+        try:
+            valor = int(item[campo])
+        except (TypeError, ValueError):
+            raise ValueError(f"{campo} deve ser um número inteiro")
+        estoque = valor if campo == 'quantidade_estoque' else atual['quantidade_estoque'] + valor
+        if estoque < 0:
+            raise ValueError("estoque não pode ficar negativo")
+        mudancas['quantidade_estoque'] = estoque
+
+    if 'ativo' in item:
+        if not isinstance(item['ativo'], bool):
+            raise ValueError("ativo deve ser true ou false")
+        mudancas['ativo'] = item['ativo']
+
+    preco = mudancas.get('preco', atual['preco'])
+    promocional = mudancas.get('preco_promocional', atual['preco_promocional'])
+    if promocional is not None and promocional >= preco:
+        raise ValueError("preco_promocional deve ser menor que preco")
+
+    return {c: v for c, v in mudancas.items() if v != atual[c]}
+
+def atualizar_produtos_em_lote(itens):
+    """
+    Aplica mudanças de preço, promoção, estoque e ativo em muitos produtos
+
+    Tudo ou nada: os itens são validados contra os valores atuais (lidos
+    com FOR UPDATE) e gravados em um único UPDATE com CASE por coluna.
+
+    Args:
+        itens (list): [{id_produto, preco?, preco_promocional?,
+                        quantidade_estoque? | ajuste_estoque?, ativo?}]
+
+    Returns:
+        dict: {atualizados, alteracoes: [{id_produto, campo: [antes, depois]}]}
+
+    Raises:
+        ValueError: Com os problemas de todos os itens inválidos
+    """
+    if not isinstance(itens, list) or not itens:
+        raise ValueError("itens deve ser uma lista não vazia")
+    if len(itens) > MAX_ITENS_LOTE:
+        raise ValueError(f"Máximo de {MAX_ITENS_LOTE} itens por lote")
+
+    ids = []
+    for i, item in enumerate(itens, start=1):
+        if not isinstance(item, dict) or not isinstance(item.get('id_produto'), int):
+            raise ValueError(f"Item {i}: id_produto é obrigatório")
+        ids.append(item['id_produto'])
+
+    if len(set(ids)) != len(ids):
+        raise ValueError("id_produto repetido no lote")
+
+    # Trava as linhas em ordem de id: dois lotes concorrentes não se bloqueiam em ciclo
+    colunas = [Produto.id_produto, *(getattr(Produto, c) for c in CAMPOS_LOTE)]
+    atuais = {
+        linha.id_produto: linha._asdict()
+        for linha in (
+            db.session.query(*colunas)
+            .filter(Produto.id_produto.in_(ids))
+            .order_by(Produto.id_produto)
+            .with_for_update()
+            .all()
+        )
+    }
+
+    erros = []
+    mudancas = {}
+    for i, item in enumerate(itens, start=1):
+        id_produto = item['id_produto']
+        if id_produto not in atuais:
+            erros.append(f"Item {i}: produto {id_produto} não encontrado")
+            continue
+        try:
+            alterado = _validar_item_lote(item, atuais[id_produto])
+        except ValueError as e:
+            erros.append(f"Item {i} (produto {id_produto}): {e}")
+            continue
+        if alterado:
+            mudancas[id_produto] = alterado
+
+    if erros:
+        db.session.rollback()
+        raise ValueError('; '.join(erros))
+
+    if not mudancas:
+        db.session.rollback()
+        return {'atualizados': 0, 'alteracoes': []}
+
+    # Uma coluna = um CASE id_produto WHEN ... THEN ... ELSE coluna END
+    valores = {}
+    for campo in CAMPOS_LOTE:
+        por_id = {i: m[campo] for i, m in mudancas.items() if campo in m}
+        if por_id:
+            coluna = getattr(Produto, campo)
+            valores[campo] = case(por_id, value=Produto.id_produto, else_=coluna)
+
+    db.session.execute(
+        update(Produto).where(Produto.id_produto.in_(list(mudancas))).values(**valores),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+
+    # Só `ativo` muda o que a busca indexa: reindexa apenas esses produtos
+    ativados = [i for i, m in mudancas.items() if 'ativo' in m]
+    reindexar = (
+        Produto.query
+        .with_entities(Produto.id_produto, Produto.nome, Produto.descricao, Produto.ativo)
+        .filter(Produto.id_produto.in_(ativados))
+        .all()
+    ) if ativados else []
+    # Sem resumo dos produtos aqui: a vitrine recarrega na próxima leitura
+    obter_motor_busca().aplicar(incrementar_versao_catalogo(), produtos=reindexar)
+
+    def _json(valor):
+        return float(valor) if isinstance(valor, Decimal) else valor
+
+    alteracoes = [
+        {'id_produto': i, **{c: [_json(atuais[i][c]), _json(v)] for c, v in m.items()}}
+        for i, m in sorted(mudancas.items())
+    ]
+    return {'atualizados': len(alteracoes), 'alteracoes': alteracoes}
+
+def definir_imagem_principal(id_produto: int, dados: bytes):
+    """
+    Processa a imagem enviada e a torna a imagem principal do produto
+
+    Raises:
+        ValueError: Se o arquivo não for uma imagem aceita
+        ImagemRecusada: Imagem grande ou lenta demais (subclasse de ValueError)
+        ImagensIndisponivel: Pool de imagens quebrado
+    """
+    produto = Produto.query.get(id_produto)
+    if not produto:
+        return None
+
+    # Só altera o produto depois do pool: nenhuma linha fica travada esperando
+    produto.imagem_principal_url = processar_imagem(dados)
+    resumo = resumo_vitrine(produto)
+    db.session.commit()
+
+    versao = incrementar_versao_catalogo()
+    obter_motor_busca().avancar(versao)
+    atualizar_vitrine(versao, [resumo])
+    return produto
+
+def adicionar_imagem_galeria(id_produto: int, dados: bytes, descricao: str = None):
+    """
+    Processa a imagem enviada e a adiciona ao fim da galeria do produto
+
+    Raises:
+        ValueError: Se o arquivo não for uma imagem aceita
+        ImagemRecusada: Imagem grande ou lenta demais (subclasse de ValueError)
+        ImagensIndisponivel: Pool de imagens quebrado
+    """
+    produto = Produto.query.get(id_produto)
+    if not produto:
+        return None
+
+    url = processar_imagem(dados)
+
+    ultima = produto.imagens.order_by(ImagemProduto.ordem.desc()).first()
+    imagem = ImagemProduto(
+        id_produto=id_produto,
+        url=url,
+        ordem=(ultima.ordem + 1) if ultima else 0,
+        descricao=descricao[:100] if descricao else None
+    )
+    db.session.add(imagem)
+    db.session.commit()
+
+    obter_motor_busca().avancar(incrementar_versao_catalogo())
+    return imagem
+
 def remover_produto(id_produto: int):
     produto = Produto.query.get(id_produto)
     if not produto:
@@ -48,4 +404,8 @@ def remover_produto(id_produto: int):
 
     db.session.delete(produto)
     db.session.commit()
-    return True
\ No newline at end of file
+
+    versao = incrementar_versao_catalogo()
+    obter_motor_busca().remover(id_produto, versao)
+    atualizar_vitrine(versao, removidos=[id_produto])
+    return True
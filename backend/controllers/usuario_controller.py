@@ -1,8 +1,15 @@
+from sqlalchemy.orm import joinedload
 from models.usuario import Usuario
 from config import db
+from helpers.streaming import percorrer_em_lotes
+from helpers.principal import invalidar_principal
 
 def listar_usuarios():
-    return [u.to_dict() for u in Usuario.query.all()]
+    """Todos os usuários em lotes (para resposta em streaming)"""
+    # O endereço vem na mesma consulta do lote, não um SELECT por usuário
+    query = Usuario.query.options(joinedload(Usuario.endereco))
+    lotes = percorrer_em_lotes(query, None, Usuario.id_usuario, descendente=False)
+    return ([u.to_dict() for u in lote] for lote in lotes)
 
 
 def buscar_usuario(id_usuario):
@@ -19,6 +26,7 @@ def atualizar_usuario(id_usuario, data):
             setattr(user, campo, valor)
 
     db.session.commit()
+    invalidar_principal(id_usuario)
     return user
 
 
@@ -28,4 +36,5 @@ def remover_usuario(id_usuario):
         return False
     db.session.delete(user)
     db.session.commit()
+    invalidar_principal(id_usuario)
     return True
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Arquivamento de pedidos antigos - Leon's Cupcake
+
+Pedidos finalizados (Entregue, Cancelado, Reembolsado) com mais de
+ARQUIVO_PEDIDOS_DIAS dias (padrão 180) são movidos, em lotes, para as
+tabelas *_arquivo junto com tudo que depende deles (itens, histórico de
+status, pagamentos, entregas, uso de cupons). As tabelas quentes ficam
+com os pedidos recentes ou ainda em andamento, e os índices que as
+listagens usam cabem no buffer pool do InnoDB.
+
+Cada lote é uma transação: INSERT ... SELECT para o arquivo e DELETE das
+tabelas quentes. Um lote interrompido não deixa pedido pela metade.
+
+Leitura: as listagens de pedido_controller só consultam o arquivo quando
+a página desce abaixo de `fronteira_arquivo()`. O que precisa do histórico
+inteiro lê as duas tabelas: o limite por usuário de sp_validar_cupom
+(uso_cupons + uso_cupons_arquivo) e a primeira numeração do ano em
+numero_pedido (pedidos + pedidos_arquivo).
+
+Uso (cron, de madrugada):
+    python manutencao.py arquivar
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, select, text
+
+from config import db
+
+
+DIAS = int(os.getenv("ARQUIVO_PEDIDOS_DIAS", "180"))
+TAMANHO_LOTE = int(os.getenv("ARQUIVO_PEDIDOS_LOTE", "500"))
+
+STATUS_FINALIZADOS = ('Entregue', 'Cancelado', 'Reembolsado')
+
+# Tabelas com id_pedido movidas junto com o pedido (antes dele: o DELETE
+# em pedidos apagaria as linhas por ON DELETE CASCADE)
+TABELAS_DEPENDENTES = (
+    'itens_pedido',
+    'historico_status_pedido',
+    'pagamentos',
+    'entregas',
+    'uso_cupons',
+)
+
+# Por quanto tempo cada worker reaproveita o MAX(data_pedido) do arquivo
+VALIDADE_FRONTEIRA = 300
+
+
+def arquivar_pedidos(dias: int = DIAS, tamanho_lote: int = TAMANHO_LOTE) -> int:
+    """
+    Move os pedidos finalizados mais antigos que `dias` para o arquivo
+
+    Returns:
+        int: Quantidade de pedidos arquivados
+    """
+    from models.pedido import Pedido
+
+    corte = datetime.utcnow() - timedelta(days=dias)
+    total = 0
+
+    while True:
+        with db.engine.begin() as conexao:
+            ids = conexao.execute(
+                select(Pedido.id_pedido)
+                .where(Pedido.status.in_(STATUS_FINALIZADOS), Pedido.data_pedido < corte)
+                .order_by(Pedido.id_pedido)
+                .limit(tamanho_lote)
+                .with_for_update()
+            ).scalars().all()
+
+            if not ids:
+                break
+
+            for tabela in TABELAS_DEPENDENTES + ('pedidos',):
+                parametros = {'ids': ids}
+                copiar = text(
+                    f"INSERT INTO {tabela}_arquivo SELECT * FROM {tabela} WHERE id_pedido IN :ids"
+                ).bindparams(bindparam('ids', expanding=True))
+                apagar = text(
+                    f"DELETE FROM {tabela} WHERE id_pedido IN :ids"
+                ).bindparams(bindparam('ids', expanding=True))
+                conexao.execute(copiar, parametros)
+                conexao.execute(apagar, parametros)
+
+        total += len(ids)
+        print(f"📦 {total} pedido(s) arquivado(s)...")
+
+    _fronteira.invalidar()
+    return total
+
+
+class FronteiraArquivo:
+    """Data mais recente que pode existir no arquivo (cache curto por worker)"""
+
+    def __init__(self, validade: float = VALIDADE_FRONTEIRA):
+        self.validade = validade
+        self._lock = threading.Lock()
+        self._valor = None
+        self._lido_em = 0.0
+
+    def invalidar(self):
+        with self._lock:
+            self._lido_em = 0.0
+
+    def atual(self) -> datetime:
+        from models.arquivo import pedidos_arquivo
+
+        with self._lock:
+            if time.monotonic() - self._lido_em > self.validade:
+                self._valor = db.session.execute(select(func.max(pedidos_arquivo.c.data_pedido))).scalar()
+                self._lido_em = time.monotonic()
+            maior = self._valor
+
+        # Um arquivamento feito depois da leitura só move pedidos anteriores ao corte atual
+        corte = datetime.utcnow() - timedelta(days=DIAS)
+        return max(maior, corte) if maior else corte
+
+
+_fronteira = FronteiraArquivo()
+
+
+def fronteira_arquivo() -> datetime:
+    """Nenhum pedido arquivado é mais recente que esta data"""
+    return _fronteira.atual()
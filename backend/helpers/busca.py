@@ -0,0 +1,291 @@
+"""
+Motor de busca de produtos - Leon's Cupcake
+
+Dois motores com a mesma interface:
+    - MotorBuscaMySQL: usa o índice FULLTEXT idx_busca (nome, descricao)
+    - MotorBuscaMemoria: índice invertido em memória, para bancos sem FULLTEXT
+
+Os dois dobram acentos ("pão de mel" encontra "pao de mel") e tratam a
+última palavra como prefixo, para funcionar como busca enquanto se digita.
+
+Uso:
+    from helpers.busca import obter_motor_busca
+    ids = obter_motor_busca().buscar("pão de mel", limite=20)
+"""
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from helpers.cache_catalogo import versao_catalogo
+
+
+# Palavras que não ajudam a diferenciar produtos
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos',
+    'com', 'sem', 'em', 'no', 'na', 'nos', 'nas', 'um', 'uma', 'para', 'por'
+}
+
+# Peso de cada campo no cálculo de relevância
+PESO_NOME = 3
+PESO_DESCRICAO = 1
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas e sem acentos: 'Pão de Mel' -> 'pao de mel'"""
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def tokenizar(texto: str) -> list:
+    """Quebra o texto em termos normalizados, sem stopwords"""
+    return [t for t in re.findall(r'[a-z0-9]+', normalizar_texto(texto)) if t not in STOPWORDS]
+
+
+# ============================================================
+#                     MOTOR MYSQL (FULLTEXT)
+# ============================================================
+
+class MotorBuscaMySQL:
+    """Busca via MATCH ... AGAINST; o InnoDB mantém o índice sozinho"""
+
+    def buscar(self, termo: str, limite: int = 20) -> list:
+        from sqlalchemy.dialects.mysql import match
+        from models.produto import Produto
+
+        termos = tokenizar(termo)
+        if not termos:
+            return []
+
+        # Modo booleano: todos os termos obrigatórios, último como prefixo
+        expressao = ' '.join(f'+{t}' for t in termos[:-1])
+        expressao = f'{expressao} +{termos[-1]}*'.strip()
+
+        relevancia = match(Produto.nome, Produto.descricao, against=expressao).in_boolean_mode()
+
+        linhas = (
+            Produto.query
+            .with_entities(Produto.id_produto)
+            .filter(Produto.ativo.is_(True), relevancia)
+            .order_by(relevancia.desc(), Produto.id_produto.desc())
+            .limit(limite)
+            .all()
+        )
+        return [linha.id_produto for linha in linhas]
+
+    def aplicar(self, versao: int = None, produtos=(), removidos=()):
+        pass
+
+    def indexar(self, produto, versao: int = None):
+        pass
+
+    def remover(self, id_produto: int, versao: int = None):
+        pass
+
+    def avancar(self, versao: int):
+        pass
+
+    def recarregar(self):
+        pass
+
+
+# ============================================================
+#                     MOTOR EM MEMÓRIA
+# ============================================================
+
+class MotorBuscaMemoria:
+    """
+    Índice invertido termo -> {id_produto: peso}
+
+    Carregado do banco e mantido incrementalmente pelo produto_controller
+    (criar, atualizar, remover) deste worker. Como a vitrine, sabe qual
+    versão do catálogo reflete: cada escrita deste worker informa a versão
+    retornada por incrementar_versao_catalogo() e o índice avança junto,
+    sem recarga. Só quando a versão salta (outro worker alterou o catálogo,
+    ou uma importação) a próxima busca recarrega o índice.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._indice = defaultdict(dict)
+        self._termos_por_produto = {}
+        self._vocabulario = []
+        self._vocabulario_sujo = False
+        self._carregado = False
+        self._versao = None
+
+    def _limpar(self):
+        self._indice = defaultdict(dict)
+        self._termos_por_produto = {}
+        self._vocabulario = []
+        self._vocabulario_sujo = False
+        self._carregado = False
+
+    def _carregar(self):
+        from models.produto import Produto
+
+        # Lida antes da consulta: uma escrita concorrente força nova recarga
+        versao = versao_catalogo()
+        self._limpar()
+
+        produtos = (
+            Produto.query
+            .with_entities(Produto.id_produto, Produto.nome, Produto.descricao)
+            .filter(Produto.ativo.is_(True))
+            .all()
+        )
+        for p in produtos:
+            self._adicionar(p.id_produto, p.nome, p.descricao)
+        self._carregado = True
+        self._versao = versao
+
+    def _garantir_atual(self):
+        versao = versao_catalogo()
+        if self._carregado and self._versao == versao:
+            return
+        with self._lock:
+            if not self._carregado or self._versao != versao:
+                self._carregar()
+
+    def _adicionar(self, id_produto: int, nome: str, descricao: str):
+        pesos = defaultdict(int)
+        for t in tokenizar(nome):
+            pesos[t] += PESO_NOME
+        for t in tokenizar(descricao):
+            pesos[t] += PESO_DESCRICAO
+
+        for termo, peso in pesos.items():
+            if termo not in self._indice:
+                self._vocabulario_sujo = True
+            self._indice[termo][id_produto] = peso
+        self._termos_por_produto[id_produto] = set(pesos)
+
+    def _retirar(self, id_produto: int):
+        for termo in self._termos_por_produto.pop(id_produto, ()):
+            postings = self._indice.get(termo)
+            if postings is None:
+                continue
+            postings.pop(id_produto, None)
+            if not postings:
+                del self._indice[termo]
+                self._vocabulario_sujo = True
+
+    def _expandir_prefixo(self, prefixo: str) -> list:
+        if self._vocabulario_sujo:
+            self._vocabulario = sorted(self._indice)
+            self._vocabulario_sujo = False
+
+        inicio = bisect_left(self._vocabulario, prefixo)
+        encontrados = []
+        for termo in self._vocabulario[inicio:]:
+            if not termo.startswith(prefixo):
+                break
+            encontrados.append(termo)
+        return encontrados
+
+    def aplicar(self, versao: int = None, produtos=(), removidos=()):
+        """
+        Aplica mudanças já commitadas
+
+        Args:
+            versao (int): Versão retornada por incrementar_versao_catalogo()
+                (None: mudança sem troca de versão)
+            produtos: Produtos (ou linhas com id_produto, nome, descricao,
+                ativo) a reindexar; inativos saem do índice
+            removidos: IDs de produtos excluídos
+        """
+        with self._lock:
+            if not self._carregado:
+                return
+
+            for produto in produtos:
+                self._retirar(produto.id_produto)
+                if produto.ativo:
+                    self._adicionar(produto.id_produto, produto.nome, produto.descricao)
+            for id_produto in removidos:
+                self._retirar(id_produto)
+
+            # Outra escrita aconteceu no meio: a versão fica, e a próxima busca recarrega
+            if versao is not None and self._versao is not None and versao == self._versao + 1:
+                self._versao = versao
+
+    def indexar(self, produto, versao: int = None):
+        """Insere ou reindexa um produto; inativos saem do índice"""
+        self.aplicar(versao, produtos=[produto])
+
+    def remover(self, id_produto: int, versao: int = None):
+        self.aplicar(versao, removidos=[id_produto])
+
+    def avancar(self, versao: int):
+        """Escrita que não muda nada da busca (estoque, imagem, categoria)"""
+        self.aplicar(versao)
+
+    def recarregar(self):
+        """Descarta o índice; a próxima busca o recarrega do banco (ex.: após importação)"""
+        with self._lock:
+            self._limpar()
+
+    def buscar(self, termo: str, limite: int = 20) -> list:
+        termos = tokenizar(termo)
+        if not termos:
+            return []
+
+        self._garantir_atual()
+
+        with self._lock:
+            total = max(len(self._termos_por_produto), 1)
+            pontuacao = None
+
+            for i, t in enumerate(termos):
+                # A última palavra pode estar incompleta (busca enquanto digita)
+                variantes = self._expandir_prefixo(t) if i == len(termos) - 1 else [t]
+
+                parcial = defaultdict(float)
+                for variante in variantes:
+                    postings = self._indice.get(variante, {})
+                    idf = math.log(1 + total / (1 + len(postings)))
+                    for id_produto, peso in postings.items():
+                        parcial[id_produto] = max(parcial[id_produto], peso * idf)
+
+                # Todos os termos são obrigatórios
+                if pontuacao is None:
+                    pontuacao = dict(parcial)
+                else:
+                    pontuacao = {
+                        id_produto: p + parcial[id_produto]
+                        for id_produto, p in pontuacao.items()
+                        if id_produto in parcial
+                    }
+
+                if not pontuacao:
+                    return []
+
+        ordenados = sorted(pontuacao.items(), key=lambda item: (-item[1], -item[0]))
+        return [id_produto for id_produto, _ in ordenados[:limite]]
+
+
+# ============================================================
+#                     SELEÇÃO DO MOTOR
+# ============================================================
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def obter_motor_busca():
+    """Retorna o motor do processo, escolhido pelo dialeto do banco"""
+    global _motor
+
+    if _motor is None:
+        with _motor_lock:
+            if _motor is None:
+                from config import db
+                if db.engine.dialect.name == 'mysql':
+                    _motor = MotorBuscaMySQL()
+                else:
+                    _motor = MotorBuscaMemoria()
+    return _motor
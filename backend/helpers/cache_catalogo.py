@@ -0,0 +1,243 @@
+"""
+Cache de respostas do catálogo - Leon's Cupcake
+
+O catálogo muda poucas vezes por dia, mas é lido o tempo todo pelo app.
+Toda escrita em produtos/categorias incrementa a "versão do catálogo";
+as respostas públicas ficam em cache até a versão mudar. Pedidos só a
+incrementam quando um produto esgota ou volta a ter estoque, então nas
+respostas em cache ficam defasados, até a próxima mudança de versão:
+    - quantidade_estoque e quantidade_vendida exibidas;
+    - a ordem de listagens por vendas (?ordenacao=mais_vendidos).
+A disponibilidade (ativo, em estoque ou não) e os preços nunca ficam. Os
+carrosséis da home (/destaques, /mais-vendidos), cuja ordem depende das
+vendas, não usam este cache: são lidos da vitrine em memória.
+
+A versão fica em um arquivo compartilhado (CATALOGO_VERSAO_ARQUIVO) para
+que todos os workers do gunicorn enxerguem a mesma invalidação sem
+consultar o banco. Ler a versão custa uma leitura de poucos bytes.
+
+O ETag é derivado apenas da versão e da URL, então um If-None-Match com
+a versão atual é respondido com 304 sem abrir conexão com o banco. O
+arquivo guarda também uma época aleatória, sorteada quando ele é criado:
+se o arquivo some (reboot, limpeza do /tmp) a contagem recomeça do zero,
+mas com outra época, e nenhum ETag ou entrada de cache antiga volta a
+valer.
+
+Uso:
+    @produto_bp.get("/")
+    @cache_catalogo
+    def get_produtos(): ...
+
+    # depois de um commit que altera o catálogo
+    incrementar_versao_catalogo()
+"""
+import hashlib
+import os
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+
+try:
+    import fcntl
+except ImportError:  # Windows (ambiente de desenvolvimento)
+    fcntl = None
+
+
+ARQUIVO_VERSAO = os.getenv(
+    "CATALOGO_VERSAO_ARQUIVO",
+    os.path.join(tempfile.gettempdir(), "leons_cupcake_catalogo.versao")
+)
+ARQUIVO_VENDAS = os.getenv("CATALOGO_VENDAS_ARQUIVO", f"{ARQUIVO_VERSAO}.vendas")
+MAX_ENTRADAS = int(os.getenv("CATALOGO_CACHE_MAX_ENTRADAS", "512"))
+
+# Headers da resposta original que também precisam sair do cache
+HEADERS_PRESERVADOS = ("X-Proximo-Cursor",)
+
+
+# ============================================================
+#                     VERSÃO DO CATÁLOGO
+# ============================================================
+
+def _ler(fd: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(fd, 64, 0)
+    os.lseek(fd, 0, os.SEEK_SET)
+    return os.read(fd, 64)
+
+
+def _escrever(fd: int, dados: bytes):
+    if hasattr(os, "pwrite"):
+        os.pwrite(fd, dados, 0)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, dados)
+    os.ftruncate(fd, len(dados))
+
+
+def _interpretar(conteudo: bytes):
+    """b"<época>:<versão>" -> (época, versão); ("", 0) se vazio ou ilegível"""
+    epoca, _, versao = conteudo.strip().decode("ascii", "replace").rpartition(":")
+    if not epoca or not versao.isdigit():
+        return "", 0
+    return epoca, int(versao)
+
+
+class VersaoCatalogo:
+    """Contador de versão (com época) compartilhado entre processos via arquivo"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._fd = None
+
+    def _descritor(self) -> int:
+        if self._fd is None:
+            with self._lock:
+                if self._fd is None:
+                    fd = os.open(self.caminho, os.O_RDWR | os.O_CREAT, 0o644)
+                    self._alterar(fd, lambda epoca, versao: (epoca, versao))
+                    self._fd = fd
+        return self._fd
+
+    @staticmethod
+    def _alterar(fd: int, fn):
+        """Lê, aplica fn(época, versão) e grava, com o arquivo travado; arquivo novo ganha época"""
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            epoca, versao = _interpretar(_ler(fd))
+            epoca, versao = fn(epoca or secrets.token_hex(8), versao)
+            _escrever(fd, f"{epoca}:{versao}".encode("ascii"))
+        finally:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        return epoca, versao
+
+    def ler(self):
+        """(época, versão): uma única leitura por requisição, sem depender de mtime"""
+        return _interpretar(_ler(self._descritor()))
+
+    def atual(self) -> int:
+        return self.ler()[1]
+
+    def incrementar(self) -> int:
+        fd = self._descritor()
+        with self._lock:
+            _, versao = self._alterar(fd, lambda epoca, versao: (epoca, versao + 1))
+        return versao
+
+
+_versao = VersaoCatalogo(ARQUIVO_VERSAO)
+# Contador só de vendas (não invalida o cache): a vitrine de cada worker
+# sabe que outro worker vendeu algo e recarrega os rankings
+_vendas = VersaoCatalogo(ARQUIVO_VENDAS)
+
+
+def versao_catalogo() -> int:
+    """Versão atual do catálogo"""
+    return _versao.atual()
+
+
+def versao_vendas() -> int:
+    """Versão atual do contador de vendas (muda a cada pedido, sem mudar a do catálogo)"""
+    return _vendas.atual()
+
+
+def incrementar_versao_vendas() -> int:
+    """Registra vendas já commitadas para as vitrines dos outros workers"""
+    return _vendas.incrementar()
+
+
+def incrementar_versao_catalogo() -> int:
+    """Invalida todas as respostas em cache do catálogo (chamar após o commit)"""
+    return _versao.incrementar()
+
+
+# ============================================================
+#                     CACHE DE RESPOSTAS
+# ============================================================
+
+class CacheRespostas:
+    """LRU limitado: chave -> ((época, versão), corpo, mimetype, headers)"""
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+
+    def obter(self, chave: str, versao):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada[0] != versao:
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada
+
+    def guardar(self, chave: str, entrada: tuple):
+        with self._lock:
+            self._entradas[chave] = entrada
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+_cache = CacheRespostas(MAX_ENTRADAS)
+
+
+def gerar_etag(epoca: str, versao: int, chave: str) -> str:
+    """ETag forte: mesma época e versão do catálogo + mesma URL = mesmo corpo"""
+    digest = hashlib.sha1(f"{epoca}\n{chave}".encode("utf-8")).hexdigest()[:16]
+    return f"c{versao}-{digest}"
+
+
+def _resposta_com_etag(corpo, status, mimetype, headers, etag):
+    resposta = make_response(corpo, status)
+    if mimetype:
+        resposta.mimetype = mimetype
+    for nome, valor in headers:
+        resposta.headers[nome] = valor
+    resposta.set_etag(etag)
+    # O cliente pode guardar, mas precisa revalidar (barato: 304)
+    resposta.headers["Cache-Control"] = "no-cache"
+    return resposta
+
+
+def cache_catalogo(fn):
+    """
+    Decorator para rotas GET públicas do catálogo
+
+    Só respostas 200 entram no cache; erros passam direto.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        versao = _versao.ler()
+        chave = request.full_path
+        etag = gerar_etag(*versao, chave)
+
+        if etag in request.if_none_match:
+            return _resposta_com_etag(b"", 304, None, (), etag)
+
+        entrada = _cache.obter(chave, versao)
+        if entrada is None:
+            resposta = make_response(fn(*args, **kwargs))
+            if resposta.status_code != 200:
+                return resposta
+
+            headers = tuple(
+                (nome, resposta.headers[nome]) for nome in HEADERS_PRESERVADOS if nome in resposta.headers
+            )
+            entrada = (versao, resposta.get_data(), resposta.mimetype, headers)
+            _cache.guardar(chave, entrada)
+
+        _, corpo, mimetype, headers = entrada
+        return _resposta_com_etag(corpo, 200, mimetype, headers, etag)
+
+    return wrapper
@@ -0,0 +1,159 @@
+"""
+Armazenamento dos carrinhos - Leon's Cupcake
+
+O carrinho não é um dado contábil: fica fora do MySQL, em um armazém
+chave -> JSON escolhido por CARRINHO_ARMAZEM:
+
+    memoria  LRU no próprio processo (padrão). Rápido, mas cada worker do
+             gunicorn tem o seu: use com um worker só ou em desenvolvimento.
+    sqlite   Arquivo local (CARRINHO_ARQUIVO) compartilhado por todos os
+             workers da máquina, com acesso atômico por carrinho.
+
+Os dois implementam a mesma interface (obter / atualizar / remover), então
+trocar por um Redis no futuro é escrever mais uma classe.
+
+Carrinhos sem acesso há CARRINHO_TTL_DIAS dias (padrão 30) são descartados.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+ARMAZEM = os.getenv("CARRINHO_ARMAZEM", "memoria")
+ARQUIVO = os.getenv(
+    "CARRINHO_ARQUIVO",
+    os.path.join(tempfile.gettempdir(), "leons_cupcake_carrinhos.sqlite3")
+)
+MAX_CARRINHOS = int(os.getenv("CARRINHO_MAX_MEMORIA", "10000"))
+TTL_SEGUNDOS = float(os.getenv("CARRINHO_TTL_DIAS", "30")) * 86400
+
+
+class ArmazemMemoria:
+    """LRU limitado: chave -> (último acesso, JSON)"""
+
+    def __init__(self, max_entradas: int = MAX_CARRINHOS, ttl: float = TTL_SEGUNDOS):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+
+    def _ler(self, chave: str):
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        if entrada[0] < time.time() - self.ttl:
+            del self._entradas[chave]
+            return None
+        self._entradas.move_to_end(chave)
+        return json.loads(entrada[1])
+
+    def obter(self, chave: str):
+        with self._lock:
+            return self._ler(chave)
+
+    def atualizar(self, chave: str, fn):
+        """Aplica fn(atual) -> novo (None apaga) sem outra escrita no meio"""
+        with self._lock:
+            novo = fn(self._ler(chave))
+            if novo is None:
+                self._entradas.pop(chave, None)
+                return None
+
+            self._entradas[chave] = (time.time(), json.dumps(novo, separators=(',', ':')))
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+            return novo
+
+    def remover(self, chave: str):
+        with self._lock:
+            self._entradas.pop(chave, None)
+
+
+class ArmazemSqlite:
+    """Chave -> JSON em um arquivo SQLite local, visível a todos os workers"""
+
+    # Limpeza de vencidos a cada N escritas deste processo
+    LIMPEZA_A_CADA = 500
+
+    def __init__(self, caminho: str = ARQUIVO, ttl: float = TTL_SEGUNDOS):
+        self.caminho = caminho
+        self.ttl = ttl
+        self._local = threading.local()
+        self._escritas = 0
+
+    def _conexao(self):
+        # Uma conexão por thread; conexões herdadas do processo pai (fork) não servem
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None or self._local.pid != os.getpid():
+            conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS carrinhos ("
+                " chave TEXT PRIMARY KEY, dados TEXT NOT NULL, acessado_em REAL NOT NULL)"
+            )
+            self._local.conexao, self._local.pid = conexao, os.getpid()
+        return conexao
+
+    def _ler(self, conexao, chave: str):
+        linha = conexao.execute(
+            "SELECT dados FROM carrinhos WHERE chave = ? AND acessado_em >= ?",
+            (chave, time.time() - self.ttl)
+        ).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def obter(self, chave: str):
+        return self._ler(self._conexao(), chave)
+
+    def atualizar(self, chave: str, fn):
+        """Aplica fn(atual) -> novo (None apaga) em uma transação IMMEDIATE"""
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            novo = fn(self._ler(conexao, chave))
+            if novo is None:
+                conexao.execute("DELETE FROM carrinhos WHERE chave = ?", (chave,))
+            else:
+                conexao.execute(
+                    "INSERT INTO carrinhos (chave, dados, acessado_em) VALUES (?, ?, ?) "
+                    "ON CONFLICT(chave) DO UPDATE SET dados = excluded.dados, acessado_em = excluded.acessado_em",
+                    (chave, json.dumps(novo, separators=(',', ':')), time.time())
+                )
+            conexao.execute("COMMIT")
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+
+        self._escritas += 1
+        if self._escritas % self.LIMPEZA_A_CADA == 0:
+            conexao.execute("DELETE FROM carrinhos WHERE acessado_em < ?", (time.time() - self.ttl,))
+        return novo
+
+    def remover(self, chave: str):
+        self._conexao().execute("DELETE FROM carrinhos WHERE chave = ?", (chave,))
+
+
+ARMAZENS = {
+    "memoria": ArmazemMemoria,
+    "sqlite": ArmazemSqlite,
+}
+
+_armazem = None
+_lock_armazem = threading.Lock()
+
+
+def obter_armazem_carrinhos():
+    """Armazém configurado em CARRINHO_ARMAZEM (criado no primeiro uso)"""
+    global _armazem
+    if _armazem is None:
+        with _lock_armazem:
+            if _armazem is None:
+                if ARMAZEM not in ARMAZENS:
+                    raise RuntimeError(f"CARRINHO_ARMAZEM inválido: {ARMAZEM}. Use: {', '.join(ARMAZENS)}")
+                _armazem = ARMAZENS[ARMAZEM]()
+    return _armazem
@@ -0,0 +1,260 @@
+"""
+Idempotency-Key para requisições de escrita - Leon's Cupcake
+
+O app refaz o POST quando a conexão cai no meio. Com o header
+Idempotency-Key (um UUID gerado por tentativa de checkout), a repetição
+devolve a resposta guardada da primeira execução em vez de criar outro
+pedido.
+
+Fluxo:
+    1. A primeira requisição insere a chave "em andamento" e executa.
+    2. Ao terminar, guarda status e corpo (erros 5xx liberam a chave
+       para que a repetição execute de novo).
+    3. Uma repetição recebe a resposta guardada, com o header
+       Idempotent-Replayed: true.
+    4. Uma repetição concorrente espera a primeira por até
+       IDEMPOTENCIA_ESPERA segundos; depois disso recebe 409.
+
+Rotas que escrevem no banco chamam responder_no_commit(): a resposta é
+gravada na mesma transação da escrita. Se o worker morrer logo depois do
+commit, a chave já está concluída e a repetição não cria outro pedido.
+
+A chave é por usuário quando a requisição traz token (a rota precisa de
+@jwt_required, ainda que optional=True); sem token, vale só a chave
+enviada, e o hash do corpo impede que ela devolva o pedido de outro.
+
+As chaves valem IDEMPOTENCIA_TTL_HORAS (padrão 24h). Chaves vencidas são
+ignoradas na leitura e apagadas por `python manutencao.py idempotencia`.
+
+Uso (abaixo de @jwt_required, para a chave ser por usuário):
+    @pedido_bp.post("/")
+    @jwt_required(optional=True)
+    @idempotente
+    def post_pedido(): ...
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import g, has_request_context, request, jsonify, make_response
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import db
+from models.idempotencia import ChaveIdempotencia
+
+
+TTL = timedelta(hours=float(os.getenv("IDEMPOTENCIA_TTL_HORAS", "24")))
+ESPERA_SEGUNDOS = float(os.getenv("IDEMPOTENCIA_ESPERA", "5"))
+# Chave "em andamento" há mais tempo que isso: o worker morreu no meio
+ABANDONO = timedelta(minutes=2)
+INTERVALO_CONSULTA = 0.1
+TAMANHO_MAXIMO_CHAVE = 255
+
+_tabela = ChaveIdempotencia.__table__
+_CHAVE_SESSAO = "idempotencia_resposta"
+
+
+def _sha256(dados) -> str:
+    if isinstance(dados, str):
+        dados = dados.encode("utf-8")
+    return hashlib.sha256(dados).hexdigest()
+
+
+def _identidade() -> str:
+    """Usuário do token, quando há um: a mesma chave de dois usuários não colide"""
+    from flask_jwt_extended import get_jwt_identity
+    try:
+        return str(get_jwt_identity() or "")
+    except RuntimeError:  # rota sem @jwt_required
+        return ""
+
+
+def _ler(chave: str):
+    with db.engine.connect() as conexao:
+        return conexao.execute(select(_tabela).where(_tabela.c.chave == chave)).first()
+
+
+def _reservar(chave: str, hash_corpo: str):
+    """
+    Tenta reservar a chave para esta requisição
+
+    Returns:
+        None se a reserva foi feita (esta requisição executa), ou o
+        registro existente (concluído ou em andamento)
+    """
+    while True:
+        agora = datetime.utcnow()
+        try:
+            with db.engine.begin() as conexao:
+                conexao.execute(insert(_tabela).values(
+                    chave=chave, hash_corpo=hash_corpo, criado_em=agora, expira_em=agora + TTL
+                ))
+            return None
+        except IntegrityError:
+            pass
+
+        registro = _ler(chave)
+        if registro is None:
+            continue  # apagada entre o INSERT e o SELECT
+
+        vencida = registro.expira_em <= agora
+        abandonada = registro.status_http is None and registro.criado_em <= agora - ABANDONO
+        if not (vencida or abandonada):
+            return registro
+
+        # Só apaga se ninguém tiver assumido a chave nesse meio tempo
+        with db.engine.begin() as conexao:
+            conexao.execute(delete(_tabela).where(
+                _tabela.c.chave == chave, _tabela.c.criado_em == registro.criado_em
+            ))
+
+
+def _concluir(chave: str, resposta):
+    with db.engine.begin() as conexao:
+        conexao.execute(update(_tabela).where(_tabela.c.chave == chave).values(
+            status_http=resposta.status_code,
+            corpo=resposta.get_data(),
+            mimetype=resposta.mimetype
+        ))
+
+
+def _liberar(chave: str):
+    with db.engine.begin() as conexao:
+        conexao.execute(delete(_tabela).where(_tabela.c.chave == chave))
+
+
+def responder_no_commit(montar, status_http: int):
+    """
+    Grava a resposta da requisição no próximo commit da sessão
+
+    Sem isso, um worker que morresse entre o commit da escrita e o
+    _concluir deixaria a chave "em andamento" e, depois de ABANDONO, a
+    repetição executaria de novo. Sem Idempotency-Key, não faz nada.
+
+    Args:
+        montar: Função sem argumentos que devolve o corpo JSON (chamada
+            logo antes do commit, dentro da transação)
+        status_http (int): Status da resposta de sucesso
+    """
+    if not has_request_context() or g.get("idempotencia_chave") is None:
+        return
+    db.session.info[_CHAVE_SESSAO] = (g.idempotencia_chave, montar, status_http)
+
+
+@event.listens_for(Session, "before_commit")
+def _gravar_resposta(session):
+    pendente = session.info.pop(_CHAVE_SESSAO, None)
+    if pendente is None:
+        return
+
+    chave, montar, status_http = pendente
+    resposta = jsonify(montar())
+    session.execute(update(_tabela).where(_tabela.c.chave == chave).values(
+        status_http=status_http,
+        corpo=resposta.get_data(),
+        mimetype=resposta.mimetype
+    ))
+    g.idempotencia_gravada = True
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_resposta(session, transacao_anterior):
+    if transacao_anterior.parent is None:
+        session.info.pop(_CHAVE_SESSAO, None)
+
+
+def _repetir(registro):
+    resposta = make_response(registro.corpo or b"", registro.status_http)
+    if registro.mimetype:
+        resposta.mimetype = registro.mimetype
+    resposta.headers["Idempotent-Replayed"] = "true"
+    return resposta
+
+
+def _aguardar(chave: str, registro):
+    """Espera a requisição original terminar (repetição concorrente)"""
+    limite = time.monotonic() + ESPERA_SEGUNDOS
+    while registro is not None and registro.status_http is None and time.monotonic() < limite:
+        time.sleep(INTERVALO_CONSULTA)
+        registro = _ler(chave)
+    return registro
+
+
+def idempotente(fn):
+    """
+    Decorator para rotas POST que não podem executar duas vezes
+
+    Sem o header Idempotency-Key a rota funciona como antes.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        chave_cliente = request.headers.get("Idempotency-Key")
+        if not chave_cliente:
+            return fn(*args, **kwargs)
+
+        if len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+            return jsonify({"erro": "Idempotency-Key muito longa"}), 400
+
+        chave = _sha256(f"{request.method} {request.path}\n{_identidade()}\n{chave_cliente}")
+        hash_corpo = _sha256(request.get_data())
+
+        registro = _reservar(chave, hash_corpo)
+        if registro is not None:
+            if registro.hash_corpo != hash_corpo:
+                return jsonify({
+                    "erro": "Idempotency-Key já utilizada com outro conteúdo",
+                    "codigo": "IDEMPOTENCY_KEY_REUTILIZADA"
+                }), 422
+
+            registro = _aguardar(chave, registro)
+            if registro is not None and registro.status_http is not None:
+                return _repetir(registro)
+
+            return jsonify({
+                "erro": "Requisição com esta Idempotency-Key ainda em andamento",
+                "codigo": "REQUISICAO_EM_ANDAMENTO"
+            }), 409
+
+        g.idempotencia_chave = chave
+        try:
+            resposta = make_response(fn(*args, **kwargs))
+        except Exception:
+            if not g.get("idempotencia_gravada"):
+                _liberar(chave)
+            raise
+        finally:
+            g.pop("idempotencia_chave", None)
+            gravada = g.pop("idempotencia_gravada", False)
+
+        if resposta.status_code < 500:
+            _concluir(chave, resposta)
+        elif not gravada:
+            _liberar(chave)
+        # 5xx depois do commit: fica a resposta gravada com a escrita
+        return resposta
+
+    return wrapper
+
+
+def limpar_chaves_vencidas(tamanho_lote: int = 1000) -> int:
+    """
+    Apaga chaves vencidas em lotes curtos (pelo índice de expira_em)
+
+    Returns:
+        int: Quantidade de chaves apagadas
+    """
+    total = 0
+    while True:
+        agora = datetime.utcnow()
+        with db.engine.begin() as conexao:
+            chaves = conexao.execute(
+                select(_tabela.c.chave).where(_tabela.c.expira_em <= agora).limit(tamanho_lote)
+            ).scalars().all()
+            if not chaves:
+                return total
+            conexao.execute(delete(_tabela).where(_tabela.c.chave.in_(chaves)))
+        total += len(chaves)
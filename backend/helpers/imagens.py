@@ -0,0 +1,280 @@
+"""
+Pipeline de imagens dos produtos - Leon's Cupcake
+
+Cada upload gera versões menores em larguras fixas (WebP e JPEG), para
+que o app baixe só o tamanho que vai exibir. O redimensionamento roda em
+um pool de processos: é trabalho de CPU e não pode segurar as threads
+do worker que atendem a API.
+
+Os arquivos são endereçados pelo conteúdo (sha256 do original):
+
+    UPLOAD_FOLDER/imagens/ab/<hash>/original
+    UPLOAD_FOLDER/imagens/ab/<hash>/320.webp
+    UPLOAD_FOLDER/imagens/ab/<hash>/320.jpg
+    ...
+
+Como o conteúdo de uma URL nunca muda, ela pode ser servida com cache
+"immutable" de um ano. O mesmo arquivo enviado duas vezes não é
+processado de novo.
+
+Erros do processamento: arquivo que não é imagem aceita, grande demais
+ou que estoura TIMEOUT_SEGUNDOS levanta ImagemRecusada (a rota responde
+422); um processo filho morto (ex.: sem memória) quebra o pool, que é
+recriado, e a requisição recebe ImagensIndisponivel (503). Em todos os
+casos a pasta do hash é apagada, para não ficar um derivado pela metade.
+
+Este módulo não importa Flask: as funções do pool rodam em processos
+filhos que só precisam do Pillow.
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_IMAGENS = os.path.join(
+    os.path.join(PASTA_BACKEND, os.getenv("UPLOAD_FOLDER", "uploads")),
+    "imagens"
+)
+PREFIXO_URL = "/api/imagens"
+
+# Larguras servidas ao app (px) e qualidade de cada formato
+LARGURAS = (160, 320, 640, 1080)
+QUALIDADE_WEBP = 80
+QUALIDADE_JPEG = 82
+EXTENSOES = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# Limites de entrada: evita "bombas de descompressão"
+MAX_PIXELS = 40_000_000
+FORMATOS_ACEITOS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+PROCESSOS = int(os.getenv("IMAGENS_PROCESSOS", max(1, (os.cpu_count() or 2) // 2)))
+TIMEOUT_SEGUNDOS = 60
+RETRY_AFTER_SEGUNDOS = 5
+
+ARQUIVO_PRONTO = "pronto"
+_RE_URL = re.compile(rf"^{re.escape(PREFIXO_URL)}/([0-9a-f]{{64}})/")
+
+
+class ImagemRecusada(ValueError):
+    """Imagem que não deve ser processada (grande ou lenta demais): a rota responde 422"""
+
+
+class ImagensIndisponivel(Exception):
+    """Pool de imagens quebrado (processo filho morto): a requisição deve receber 503"""
+
+    def __init__(self):
+        super().__init__("Processamento de imagens indisponível, tente novamente em instantes")
+        self.retry_after = RETRY_AFTER_SEGUNDOS
+
+
+# ============================================================
+#                     CAMINHOS E URLS
+# ============================================================
+
+def pasta_imagem(hash_imagem: str) -> str:
+    return os.path.join(PASTA_IMAGENS, hash_imagem[:2], hash_imagem)
+
+
+def url_derivado(hash_imagem: str, largura: int, formato: str = 'jpeg') -> str:
+    return f"{PREFIXO_URL}/{hash_imagem}/{largura}.{EXTENSOES[formato]}"
+
+
+def srcset_imagem(url: str):
+    """
+    Mapa de derivados de uma URL gerada pelo pipeline
+
+    Returns:
+        dict | None: {'webp': {'160': url, ...}, 'jpeg': {...}} ou None
+        para URLs externas/antigas, que continuam sendo servidas como estão
+    """
+    encontrado = _RE_URL.match(url or '')
+    if not encontrado:
+        return None
+
+    hash_imagem = encontrado.group(1)
+    return {
+        formato: {str(largura): url_derivado(hash_imagem, largura, formato) for largura in LARGURAS}
+        for formato in EXTENSOES
+    }
+
+
+# ============================================================
+#                     TRABALHO NO POOL
+# ============================================================
+
+def _salvar(imagem, caminho: str, **opcoes):
+    # Grava em arquivo temporário e renomeia: ninguém lê um derivado pela metade
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    imagem.save(temporario, **opcoes)
+    os.replace(temporario, caminho)
+
+
+def gerar_derivados(caminho_original: str, pasta: str) -> list:
+    """
+    Gera os derivados de uma imagem (executa no processo filho)
+
+    Larguras maiores que o original são gravadas no tamanho original
+    (sem ampliar), para que o conjunto de URLs seja sempre o mesmo.
+
+    Raises:
+        ValueError: Se o arquivo não for uma imagem aceita
+        ImagemRecusada: Se a imagem tiver mais de MAX_PIXELS pixels
+    """
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+    try:
+        with Image.open(caminho_original) as imagem:
+            if imagem.format not in FORMATOS_ACEITOS:
+                raise ValueError(f"Formato de imagem não suportado: {imagem.format}")
+            # Conferido antes de decodificar: entre MAX_PIXELS e o dobro, o
+            # Pillow só emite DecompressionBombWarning e abriria a imagem
+            if imagem.width * imagem.height > MAX_PIXELS:
+                raise ImagemRecusada(
+                    f"Imagem grande demais: {imagem.width}x{imagem.height} (máximo de {MAX_PIXELS:,} pixels)"
+                )
+            imagem.load()
+            imagem = ImageOps.exif_transpose(imagem)
+    except Image.DecompressionBombError as e:
+        raise ImagemRecusada(f"Imagem grande demais: {e}")
+    except OSError as e:
+        raise ValueError(f"Imagem inválida: {e}")
+
+    com_transparencia = imagem.mode in ('RGBA', 'LA') or 'transparency' in imagem.info
+    imagem = imagem.convert('RGBA' if com_transparencia else 'RGB')
+
+    geradas = []
+    for largura in sorted(LARGURAS, reverse=True):
+        if imagem.width > largura:
+            altura = max(1, round(imagem.height * largura / imagem.width))
+            imagem = imagem.resize((largura, altura), Image.LANCZOS)
+
+        _salvar(imagem, os.path.join(pasta, f"{largura}.webp"), format='WEBP', quality=QUALIDADE_WEBP, method=4)
+
+        # JPEG não tem transparência: fundo branco
+        if com_transparencia:
+            fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+            fundo.paste(imagem, mask=imagem.getchannel('A'))
+            jpeg = fundo
+        else:
+            jpeg = imagem
+        _salvar(jpeg, os.path.join(pasta, f"{largura}.jpg"), format='JPEG',
+                quality=QUALIDADE_JPEG, optimize=True, progressive=True)
+
+        geradas.append(largura)
+
+    with open(os.path.join(pasta, ARQUIVO_PRONTO), 'w') as marcador:
+        marcador.write(','.join(str(l) for l in sorted(geradas)))
+
+    return sorted(geradas)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obter_pool() -> ProcessPoolExecutor:
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: o worker da API tem threads (e conexões); fork as copiaria
+                _pool = ProcessPoolExecutor(
+                    max_workers=PROCESSOS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def _recriar_pool(quebrado: ProcessPoolExecutor):
+    """Descarta o pool quebrado; o próximo _obter_pool cria outro"""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not quebrado:
+            return
+        _pool = None
+    quebrado.shutdown(wait=False, cancel_futures=True)
+
+
+# ============================================================
+#                     API DO MÓDULO
+# ============================================================
+
+def processar_imagem(dados: bytes) -> str:
+    """
+    Armazena uma imagem enviada e gera seus derivados
+
+    Args:
+        dados (bytes): Conteúdo do arquivo enviado
+
+    Returns:
+        str: URL do maior derivado JPEG (compatível com quem espera uma URL única)
+
+    Raises:
+        ValueError: Se o arquivo estiver vazio ou não for uma imagem aceita
+        ImagemRecusada: Grande demais ou processamento acima de TIMEOUT_SEGUNDOS
+        ImagensIndisponivel: Pool de processos quebrado (já recriado)
+    """
+    if not dados:
+        raise ValueError("Arquivo de imagem vazio")
+
+    hash_imagem = hashlib.sha256(dados).hexdigest()
+    pasta = pasta_imagem(hash_imagem)
+    url = url_derivado(hash_imagem, max(LARGURAS))
+
+    # Mesmo conteúdo já processado: nada a fazer
+    if os.path.exists(os.path.join(pasta, ARQUIVO_PRONTO)):
+        return url
+
+    os.makedirs(pasta, exist_ok=True)
+    caminho_original = os.path.join(pasta, "original")
+    temporario = f"{caminho_original}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(dados)
+    os.replace(temporario, caminho_original)
+
+    pool = _obter_pool()
+    try:
+        futuro = pool.submit(gerar_derivados, caminho_original, pasta)
+    except (BrokenProcessPool, RuntimeError):
+        # Quebrado por outro upload (ou já desligado): nada foi enfileirado
+        shutil.rmtree(pasta, ignore_errors=True)
+        _recriar_pool(pool)
+        raise ImagensIndisponivel()
+
+    try:
+        futuro.result(timeout=TIMEOUT_SEGUNDOS)
+    except ValueError:
+        # Não era uma imagem: não deixa lixo endereçado por esse hash
+        shutil.rmtree(pasta, ignore_errors=True)
+        raise
+    except TimeoutError:
+        # O filho pode continuar gravando: sem a pasta, as gravações dele falham
+        shutil.rmtree(pasta, ignore_errors=True)
+        raise ImagemRecusada(f"Imagem demorou mais de {TIMEOUT_SEGUNDOS}s para ser processada")
+    except BrokenProcessPool:
+        shutil.rmtree(pasta, ignore_errors=True)
+        print("⚠️ Pool de imagens quebrado (processo filho encerrado); recriando")
+        _recriar_pool(pool)
+        raise ImagensIndisponivel()
+    return url
+
+
+def caminho_derivado(hash_imagem: str, arquivo: str):
+    """Caminho no disco de um derivado pronto, ou None (protege contra path traversal)"""
+    if not re.fullmatch(r"[0-9a-f]{64}", hash_imagem or ''):
+        return None
+    if not re.fullmatch(r"\d+\.(webp|jpg)", arquivo or ''):
+        return None
+
+    caminho = os.path.join(pasta_imagem(hash_imagem), arquivo)
+    return caminho if os.path.isfile(caminho) else None
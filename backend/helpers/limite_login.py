@@ -0,0 +1,185 @@
+"""
+Limite de tentativas de login - Leon's Cupcake
+
+Um ataque de credential stuffing manda milhares de logins por minuto. Se
+cada falha gravasse em `usuarios`, o ataque virava uma tempestade de
+escritas. Aqui as falhas são contadas na memória do worker, em janelas
+deslizantes:
+
+    - por IP: LOGIN_MAX_FALHAS_IP falhas (padrão 20);
+    - por email: LOGIN_MAX_FALHAS_EMAIL falhas (padrão 5);
+
+ambas dentro de LOGIN_JANELA_SEGUNDOS (padrão 300). Acima do limite,
+verificar_tentativa() levanta LoginBloqueado antes de qualquer consulta ou
+hash, e a rota responde 429 com Retry-After.
+
+O banco só é tocado quando um email cruza o limite: o controller grava
+`bloqueado_ate` (LOGIN_BLOQUEIO_MINUTOS, padrão 30) para o bloqueio valer
+nos outros workers e sobreviver a um restart. Um bloqueio lido do banco
+também é lembrado aqui, para as próximas tentativas nem consultarem.
+
+Como nos demais caches por worker, cada worker do gunicorn conta as suas
+falhas, então os dois limites efetivos são multiplicados pelo número de
+workers: por IP sempre, e por email até o bloqueio ser gravado (cada
+worker aceita as suas LOGIN_MAX_FALHAS_EMAIL falhas antes de gravar
+`bloqueado_ate`; depois disso o bloqueio persistido vale para todos). Com
+4 workers e o padrão, são até 20 tentativas por email antes do bloqueio.
+
+O IP vem de request.remote_addr: atrás de proxy reverso, configure
+PROXY_SALTOS (config.py), senão todos os clientes dividem o IP do proxy.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+JANELA_SEGUNDOS = float(os.getenv("LOGIN_JANELA_SEGUNDOS", "300"))
+MAX_FALHAS_IP = int(os.getenv("LOGIN_MAX_FALHAS_IP", "20"))
+MAX_FALHAS_EMAIL = int(os.getenv("LOGIN_MAX_FALHAS_EMAIL", "5"))
+BLOQUEIO_MINUTOS = float(os.getenv("LOGIN_BLOQUEIO_MINUTOS", "30"))
+MAX_CHAVES = int(os.getenv("LOGIN_MAX_CHAVES", "100000"))
+
+
+class LoginBloqueado(Exception):
+    """Tentativas demais para o IP ou email: a requisição deve receber 429"""
+
+    def __init__(self, espera_segundos: float):
+        super().__init__("Muitas tentativas de login. Tente novamente mais tarde")
+        self.retry_after = max(1, int(espera_segundos + 0.999))
+
+
+class JanelaDeslizante:
+    """LRU limitado: chave -> instantes das falhas dentro da janela"""
+
+    def __init__(self, limite: int, janela: float = JANELA_SEGUNDOS, max_chaves: int = MAX_CHAVES):
+        self.limite = limite
+        self.janela = janela
+        self.max_chaves = max_chaves
+        self._lock = threading.Lock()
+        self._chaves = OrderedDict()
+
+    def _podar(self, chave, agora: float):
+        falhas = self._chaves.get(chave)
+        if falhas is None:
+            return None
+        while falhas and falhas[0] <= agora - self.janela:
+            falhas.popleft()
+        if not falhas:
+            del self._chaves[chave]
+            return None
+        return falhas
+
+    def espera(self, chave, agora: float) -> float:
+        """Segundos até a chave voltar abaixo do limite (0 = liberada)"""
+        with self._lock:
+            falhas = self._podar(chave, agora)
+            if falhas is None or len(falhas) < self.limite:
+                return 0.0
+            return falhas[-self.limite] + self.janela - agora
+
+    def registrar(self, chave, agora: float) -> int:
+        """Conta uma falha e devolve o total dentro da janela"""
+        with self._lock:
+            falhas = self._podar(chave, agora)
+            if falhas is None:
+                # Só as últimas `limite` falhas importam para a espera
+                falhas = self._chaves[chave] = deque(maxlen=self.limite)
+            falhas.append(agora)
+            self._chaves.move_to_end(chave)
+            while len(self._chaves) > self.max_chaves:
+                self._chaves.popitem(last=False)
+            return len(falhas)
+
+    def limpar(self, chave):
+        with self._lock:
+            self._chaves.pop(chave, None)
+
+
+class BloqueiosConhecidos:
+    """Emails bloqueados (por limite ou lidos do banco) -> instante de liberação"""
+
+    def __init__(self, max_chaves: int = MAX_CHAVES):
+        self.max_chaves = max_chaves
+        self._lock = threading.Lock()
+        self._ate = OrderedDict()
+
+    def espera(self, chave, agora: float) -> float:
+        with self._lock:
+            ate = self._ate.get(chave)
+            if ate is None:
+                return 0.0
+            if ate <= agora:
+                del self._ate[chave]
+                return 0.0
+            return ate - agora
+
+    def bloquear(self, chave, ate: float):
+        with self._lock:
+            self._ate[chave] = ate
+            self._ate.move_to_end(chave)
+            while len(self._ate) > self.max_chaves:
+                self._ate.popitem(last=False)
+
+    def liberar(self, chave):
+        with self._lock:
+            self._ate.pop(chave, None)
+
+
+_por_ip = JanelaDeslizante(MAX_FALHAS_IP)
+_por_email = JanelaDeslizante(MAX_FALHAS_EMAIL)
+_bloqueios = BloqueiosConhecidos()
+
+
+# ============================================================
+#                     API DO MÓDULO
+# ============================================================
+
+def verificar_tentativa(ip: str, email: str):
+    """
+    Recusa a tentativa se o IP ou o email passaram do limite
+
+    Só memória: chamar antes de consultar o banco ou calcular hash.
+
+    Raises:
+        LoginBloqueado: Com o tempo de espera em retry_after
+    """
+    agora = time.monotonic()
+    espera = max(
+        _por_ip.espera(ip, agora) if ip else 0.0,
+        _por_email.espera(email, agora),
+        _bloqueios.espera(email, agora)
+    )
+    if espera > 0:
+        raise LoginBloqueado(espera)
+
+
+def registrar_falha(ip: str, email: str) -> bool:
+    """
+    Conta uma falha para o IP e o email
+
+    Returns:
+        bool: True quando esta falha fez o email cruzar o limite; o
+        chamador deve persistir o bloqueio (bloqueado_ate)
+    """
+    agora = time.monotonic()
+    if ip:
+        _por_ip.registrar(ip, agora)
+
+    falhas = _por_email.registrar(email, agora)
+    # Falhas concorrentes acima do limite não gravam o bloqueio de novo
+    if falhas >= MAX_FALHAS_EMAIL and not _bloqueios.espera(email, agora):
+        _bloqueios.bloquear(email, agora + BLOQUEIO_MINUTOS * 60)
+        return True
+    return False
+
+
+def lembrar_bloqueio(email: str, espera_segundos: float):
+    """Guarda um bloqueio lido do banco, para não consultar de novo até vencer"""
+    _bloqueios.bloquear(email, time.monotonic() + espera_segundos)
+
+
+def registrar_sucesso(email: str):
+    """Login correto: zera a janela e o bloqueio do email (a do IP continua)"""
+    _por_email.limpar(email)
+    _bloqueios.liberar(email)
@@ -0,0 +1,175 @@
+"""
+Alocação de números de pedido em blocos - Leon's Cupcake
+
+Cada worker reserva um bloco de números (PEDIDOS_BLOCO_NUMEROS, padrão
+20) na tabela contadores_pedido, em uma transação própria e curtíssima,
+e depois entrega os números do bloco em memória. O checkout só toca no
+banco quando o bloco acaba.
+
+Garantias:
+    - números únicos: dois workers nunca recebem o mesmo bloco;
+    - quase sequenciais: workers diferentes intercalam seus blocos, e os
+      números que sobram quando um worker reinicia viram lacunas.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+
+TAMANHO_BLOCO = int(os.getenv("PEDIDOS_BLOCO_NUMEROS", "20"))
+PREFIXO = "LCC"
+TENTATIVAS = 3
+
+
+def formatar_numero(ano: int, sequencia: int) -> str:
+    return f"{PREFIXO}-{ano}-{sequencia:06d}"
+
+
+def _maior_sequencia_existente(conexao, ano: int) -> int:
+    """
+    Só na primeira reserva do ano: continua de onde os pedidos já existentes
+    pararam, inclusive os arquivados (número de pedido é único no histórico todo)
+    """
+    from models.pedido import Pedido
+    from models.arquivo import pedidos_arquivo
+
+    maior = 0
+    for numero in (Pedido.numero_pedido, pedidos_arquivo.c.numero_pedido):
+        ultimo = conexao.execute(
+            select(func.max(numero)).where(numero.like(f"{PREFIXO}-{ano}-%"))
+        ).scalar()
+        if not ultimo:
+            continue
+        try:
+            maior = max(maior, int(ultimo.rsplit('-', 1)[1]))
+        except ValueError:
+            pass
+    return maior
+
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+def _conexao_contador():
+    """
+    Engine só do contador, com uma conexão por worker
+
+    A reserva acontece no meio de um checkout que já segura uma conexão do
+    pool principal. Se ela também tirasse do pool principal, N checkouts
+    simultâneos (N >= tamanho do pool) segurariam todas as conexões
+    esperando a reserva, e a reserva esperaria uma conexão livre até o
+    timeout do pool. As reservas já são serializadas pelo lock do
+    alocador, então uma conexão basta.
+    """
+    global _engine, _engine_pid
+    from sqlalchemy import create_engine
+    from config import db
+
+    with _engine_lock:
+        if _engine is None or _engine_pid != os.getpid():
+            _engine = create_engine(
+                db.engine.url, pool_size=1, max_overflow=0, pool_pre_ping=True, pool_recycle=300
+            )
+            _engine_pid = os.getpid()
+        return _engine
+
+
+def _criar_linha_do_ano(engine, tabela, ano: int):
+    """
+    Cria a linha do ano, se faltar, antes de travá-la
+
+    SELECT ... FOR UPDATE sobre uma linha inexistente faz o InnoDB travar o
+    intervalo (gap lock); dois workers nessa situação entram em deadlock ao
+    inserir. Com a linha criada à parte (INSERT IGNORE), o FOR UPDATE
+    seguinte sempre trava uma linha que existe.
+    """
+    with engine.connect() as conexao:
+        existe = conexao.execute(select(tabela.c.ano).where(tabela.c.ano == ano)).first()
+    if existe:
+        return
+
+    with engine.begin() as conexao:
+        inicial = _maior_sequencia_existente(conexao, ano) + 1
+        comando = insert(tabela).values(ano=ano, proximo=inicial)
+        if conexao.dialect.name == 'mysql':
+            comando = comando.prefix_with('IGNORE')
+        elif conexao.dialect.name == 'sqlite':
+            comando = comando.prefix_with('OR IGNORE')
+        conexao.execute(comando)
+
+
+def _erro_de_concorrencia(erro: DBAPIError) -> bool:
+    """IntegrityError (linha criada por outro) ou deadlock / lock wait timeout do MySQL"""
+    if isinstance(erro, IntegrityError):
+        return True
+    codigo = erro.orig.args[0] if erro.orig is not None and erro.orig.args else None
+    return codigo in (1205, 1213)
+
+
+def reservar_bloco(ano: int, tamanho: int = TAMANHO_BLOCO) -> int:
+    """
+    Reserva `tamanho` números do ano e devolve o primeiro
+
+    Roda em conexão própria: o bloco continua reservado mesmo que o
+    pedido que pediu o número seja desfeito (o número vira lacuna).
+    """
+    from models.pedido import ContadorPedido
+
+    tabela = ContadorPedido.__table__
+    engine = _conexao_contador()
+
+    for tentativa in range(TENTATIVAS):
+        try:
+            _criar_linha_do_ano(engine, tabela, ano)
+            with engine.begin() as conexao:
+                proximo = conexao.execute(
+                    select(tabela.c.proximo).where(tabela.c.ano == ano).with_for_update()
+                ).scalar_one()
+                conexao.execute(update(tabela).where(tabela.c.ano == ano).values(proximo=proximo + tamanho))
+            return proximo
+        except DBAPIError as e:
+            if not _erro_de_concorrencia(e) or tentativa == TENTATIVAS - 1:
+                raise
+            time.sleep(0.05 * (tentativa + 1))
+
+
+class AlocadorNumeros:
+    """Bloco de números reservado por este worker"""
+
+    def __init__(self, tamanho_bloco: int = TAMANHO_BLOCO):
+        self.tamanho_bloco = tamanho_bloco
+        self._lock = threading.Lock()
+        self._ano = None
+        self._proximo = 0
+        self._limite = 0
+        self._pid = None
+
+    def alocar(self) -> str:
+        ano = datetime.now().year
+
+        with self._lock:
+            # Bloco herdado do processo pai (fork) pertence ao pai
+            if self._pid != os.getpid() or self._ano != ano or self._proximo >= self._limite:
+                self._proximo = reservar_bloco(ano, self.tamanho_bloco)
+                self._limite = self._proximo + self.tamanho_bloco
+                self._ano = ano
+                self._pid = os.getpid()
+
+            sequencia = self._proximo
+            self._proximo += 1
+
+        return formatar_numero(ano, sequencia)
+
+
+_alocador = AlocadorNumeros()
+
+
+def alocar_numero_pedido() -> str:
+    """Próximo número de pedido deste worker (ex.: LCC-2025-000042)"""
+    return _alocador.alocar()
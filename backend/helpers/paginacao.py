@@ -0,0 +1,109 @@
+"""
+Paginação por cursor (keyset) - Leon's Cupcake
+
+Em vez de OFFSET, cada página continua a partir da última linha da página
+anterior. O cursor guarda o valor da coluna de ordenação e o id da última
+linha, então o banco desce direto pelo índice sem reler as páginas já
+enviadas.
+"""
+import base64
+import json
+
+from sqlalchemy import and_, or_
+
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+
+
+def normalizar_limite(valor, padrao: int = LIMITE_PADRAO, maximo: int = LIMITE_MAXIMO) -> int:
+    """
+    Converte o parâmetro `limite` da query string para um inteiro válido
+
+    Raises:
+        ValueError: Se o valor não for um número inteiro positivo
+    """
+    if valor in (None, ''):
+        return padrao
+
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("limite deve ser um número inteiro")
+
+    if limite <= 0:
+        raise ValueError("limite deve ser positivo")
+
+    return min(limite, maximo)
+
+
+def codificar_cursor(valores: dict) -> str:
+    """Serializa os valores da última linha em um cursor opaco (base64 url-safe)"""
+    bruto = json.dumps(valores, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: str) -> dict:
+    """
+    Lê um cursor gerado por `codificar_cursor`
+
+    Raises:
+        ValueError: Se o cursor estiver corrompido
+    """
+    if not cursor:
+        return {}
+
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        bruto = base64.urlsafe_b64decode(cursor + preenchimento)
+        valores = json.loads(bruto.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido")
+
+    if not isinstance(valores, dict):
+        raise ValueError("Cursor inválido")
+
+    return valores
+
+
+def filtro_keyset(coluna, coluna_id, valor, ultimo_id: int, descendente: bool = False, nullable: bool = False):
+    """
+    Monta o predicado "depois da última linha" para ORDER BY coluna, id
+
+    O id desempata linhas com o mesmo valor e segue a mesma direção da
+    coluna, para que o par (coluna, id) seja percorrido por um único índice.
+    No MySQL, NULL vem primeiro em ASC e por último em DESC.
+    """
+    if coluna is None:
+        return coluna_id < ultimo_id if descendente else coluna_id > ultimo_id
+
+    if descendente:
+        if valor is None:
+            return and_(coluna.is_(None), coluna_id < ultimo_id)
+
+        condicoes = [
+            coluna < valor,
+            and_(coluna == valor, coluna_id < ultimo_id)
+        ]
+        if nullable:
+            condicoes.append(coluna.is_(None))
+        return or_(*condicoes)
+
+    if valor is None:
+        return or_(coluna.isnot(None), and_(coluna.is_(None), coluna_id > ultimo_id))
+
+    return or_(
+        coluna > valor,
+        and_(coluna == valor, coluna_id > ultimo_id)
+    )
+
+
+def ordenar_keyset(coluna, coluna_id, descendente: bool = False):
+    """Retorna as cláusulas ORDER BY compatíveis com `filtro_keyset`"""
+    if coluna is None:
+        return [coluna_id.desc() if descendente else coluna_id.asc()]
+
+    if descendente:
+        return [coluna.desc(), coluna_id.desc()]
+
+    return [coluna.asc(), coluna_id.asc()]
@@ -0,0 +1,104 @@
+"""
+Cache de principais (usuário autenticado) - Leon's Cupcake
+
+Os decorators de permissão e as rotas de perfil precisavam do usuário do
+token em toda requisição: uma consulta por chamada, e um painel admin faz
+dezenas de chamadas por tela. Aqui cada worker guarda, por id de usuário,
+o tipo, o flag ativo e o perfil serializado por PRINCIPAL_TTL_SEGUNDOS
+(padrão 30).
+
+Invalidação:
+    - explícita (invalidar_principal) nas escritas de usuário deste
+      processo: atualizar_usuario, remover_usuario, atualizar_ultimo_acesso;
+    - nos demais workers, pelo TTL: uma mudança de tipo ou desativação
+      leva no máximo PRINCIPAL_TTL_SEGUNDOS para valer em todos.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+TTL_SEGUNDOS = float(os.getenv("PRINCIPAL_TTL_SEGUNDOS", "30"))
+MAX_ENTRADAS = int(os.getenv("PRINCIPAL_MAX_ENTRADAS", "10000"))
+
+
+class CachePrincipais:
+    """LRU limitado: id_usuario -> (expira_em, principal)"""
+
+    def __init__(self, ttl: float = TTL_SEGUNDOS, max_entradas: int = MAX_ENTRADAS):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+
+    def obter(self, id_usuario: int):
+        with self._lock:
+            entrada = self._entradas.get(id_usuario)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                del self._entradas[id_usuario]
+                return None
+            self._entradas.move_to_end(id_usuario)
+            return entrada[1]
+
+    def guardar(self, id_usuario: int, principal: dict):
+        with self._lock:
+            self._entradas[id_usuario] = (time.monotonic() + self.ttl, principal)
+            self._entradas.move_to_end(id_usuario)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, id_usuario: int):
+        with self._lock:
+            self._entradas.pop(id_usuario, None)
+
+
+_cache = CachePrincipais()
+
+
+def _carregar(id_usuario: int):
+    from sqlalchemy.orm import joinedload
+    from models.usuario import Usuario
+
+    user = Usuario.query.options(joinedload(Usuario.endereco)).get(id_usuario)
+    if not user:
+        return None
+
+    return {
+        'id_usuario': user.id_usuario,
+        'tipo_usuario': user.tipo_usuario,
+        'ativo': bool(user.ativo),
+        'perfil': user.to_dict()
+    }
+
+
+def obter_principal(id_usuario):
+    """
+    Tipo, ativo e perfil (to_dict) do usuário, do cache ou do banco
+
+    O dict devolvido é compartilhado: não altere.
+
+    Returns:
+        dict | None: None se o usuário não existe (não fica em cache)
+    """
+    try:
+        id_usuario = int(id_usuario)
+    except (TypeError, ValueError):
+        return None
+
+    principal = _cache.obter(id_usuario)
+    if principal is None:
+        principal = _carregar(id_usuario)
+        if principal is not None:
+            _cache.guardar(id_usuario, principal)
+    return principal
+
+
+def invalidar_principal(id_usuario):
+    """Descarta o usuário do cache deste worker (chamar após alterar o usuário)"""
+    try:
+        _cache.invalidar(int(id_usuario))
+    except (TypeError, ValueError):
+        pass
@@ -0,0 +1,279 @@
+"""
+Revogação de JWT (logout) - Leon's Cupcake
+
+O token de acesso vale 24h e, sem revogação, continuava aceito depois do
+logout. Agora o logout grava o jti em `tokens_revogados` (com a expiração
+do próprio token) e toda requisição autenticada confere o jti aqui, sem ir
+ao banco:
+
+    - cada worker mantém um filtro de Bloom (~120 KB para 100 mil jtis)
+      e o conjunto exato dos jtis revogados ainda não expirados;
+    - o filtro responde "com certeza não revogado" para quase todos os
+      tokens; só um positivo (revogado ou falso positivo, ~1%) consulta o
+      conjunto exato;
+    - a cada REVOGACAO_INTERVALO_SEGUNDOS (padrão 5) uma requisição do
+      worker lê só o que foi revogado desde a leitura anterior (índice de
+      revogado_em, com sobreposição para transações lentas);
+    - o filtro é reconstruído de hora em hora sem os tokens já expirados,
+      ou antes, se passar da capacidade (REVOGACAO_CAPACIDADE).
+
+Um logout vale na hora para o worker que o atendeu e em até
+REVOGACAO_INTERVALO_SEGUNDOS para os demais.
+
+Se a primeira carga do worker falhar (banco fora do ar), as requisições
+autenticadas recebem RevogacaoIndisponivel (503 com Retry-After), nunca
+um token sem conferência. Novas tentativas de carga esperam de 1 a 30
+segundos, crescendo a cada falha; nesse intervalo a recusa é imediata,
+sem consulta.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from config import db
+from models.token_revogado import TokenRevogado
+
+
+INTERVALO_SEGUNDOS = float(os.getenv("REVOGACAO_INTERVALO_SEGUNDOS", "5"))
+CAPACIDADE = int(os.getenv("REVOGACAO_CAPACIDADE", "100000"))
+TAXA_FALSOS = float(os.getenv("REVOGACAO_TAXA_FALSOS", "0.01"))
+RECONSTRUIR_SEGUNDOS = 3600
+# Revogações gravadas com revogado_em anterior à leitura, mas com commit
+# depois dela, ainda são vistas na leitura seguinte
+SOBREPOSICAO = timedelta(seconds=30)
+ESPERA_CARGA_INICIAL = 1.0
+ESPERA_CARGA_MAXIMA = 30.0
+
+_tabela = TokenRevogado.__table__
+
+
+class RevogacaoIndisponivel(Exception):
+    """Lista de revogação ainda não carregada neste worker: a requisição deve receber 503"""
+
+    def __init__(self, espera_segundos: float):
+        super().__init__("Serviço temporariamente indisponível, tente novamente em instantes")
+        self.retry_after = max(1, int(espera_segundos + 0.999))
+
+
+class FiltroBloom:
+    """Conjunto aproximado: falso positivo possível, falso negativo nunca"""
+
+    def __init__(self, capacidade: int, taxa_falsos: float = TAXA_FALSOS):
+        self.capacidade = max(1, capacidade)
+        self.num_bits = max(64, int(-self.capacidade * math.log(taxa_falsos) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacidade * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _posicoes(self, chave: str):
+        # Duplo hash (Kirsch-Mitzenmacher): k posições a partir de um digest
+        digest = hashlib.blake2b(chave.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def adicionar(self, chave: str):
+        for posicao in self._posicoes(chave):
+            self._bits[posicao >> 3] |= 1 << (posicao & 7)
+
+    def __contains__(self, chave: str) -> bool:
+        return all(self._bits[posicao >> 3] & (1 << (posicao & 7)) for posicao in self._posicoes(chave))
+
+
+class ListaRevogacao:
+    """Espelho dos tokens revogados neste worker (carregado no primeiro uso)"""
+
+    def __init__(self, intervalo: float = INTERVALO_SEGUNDOS, capacidade: int = CAPACIDADE):
+        self.intervalo = intervalo
+        self.capacidade = capacidade
+        self._lock = threading.Lock()
+        self._pid = None
+        self._filtro = FiltroBloom(capacidade)
+        self._exatos = {}  # jti -> expira_em
+        self._lido_ate = None
+        self._proxima_leitura = 0.0
+        self._proxima_reconstrucao = 0.0
+        self._proxima_carga = 0.0
+        self._espera_carga = 0.0
+        self._metricas = {"leituras": 0, "falhas_leitura": 0, "positivos_filtro": 0, "falsos_positivos": 0}
+
+    # -------------------- leitura do banco --------------------
+
+    def _ler(self, desde):
+        agora = datetime.utcnow()
+        consulta = select(_tabela.c.jti, _tabela.c.expira_em).where(_tabela.c.expira_em > agora)
+        if desde is not None:
+            consulta = consulta.where(_tabela.c.revogado_em >= desde)
+        with db.engine.connect() as conexao:
+            linhas = conexao.execute(consulta).all()
+        return agora, linhas
+
+    def _adicionar(self, jti: str, expira_em):
+        self._exatos[jti] = expira_em
+        self._filtro.adicionar(jti)
+
+    def _reconstruir(self):
+        """Novo filtro só com os jtis ainda válidos (troca de referência, sem pausa nas leituras)"""
+        agora = datetime.utcnow()
+        exatos = {jti: expira for jti, expira in self._exatos.items() if expira > agora}
+        filtro = FiltroBloom(max(self.capacidade, len(exatos) * 2))
+        for jti in exatos:
+            filtro.adicionar(jti)
+        self._filtro, self._exatos = filtro, exatos
+        self._proxima_reconstrucao = time.monotonic() + RECONSTRUIR_SEGUNDOS
+
+    def _atualizar(self, completa: bool):
+        inicio, linhas = self._ler(None if completa else self._lido_ate)
+        if completa:
+            self._exatos = {}
+            self._filtro = FiltroBloom(max(self.capacidade, len(linhas) * 2))
+            self._proxima_reconstrucao = time.monotonic() + RECONSTRUIR_SEGUNDOS
+
+        for linha in linhas:
+            self._adicionar(linha.jti, linha.expira_em)
+
+        self._lido_ate = inicio - SOBREPOSICAO
+        self._proxima_leitura = time.monotonic() + self.intervalo
+        self._metricas["leituras"] += 1
+
+        if len(self._exatos) > self._filtro.capacidade or time.monotonic() >= self._proxima_reconstrucao:
+            self._reconstruir()
+
+    def _recusar_se_em_espera(self):
+        espera = self._proxima_carga - time.monotonic()
+        if espera > 0:
+            raise RevogacaoIndisponivel(espera)
+
+    def _carregar(self):
+        """Primeira carga do worker; em falha, agenda a próxima e recusa (fail closed)"""
+        self._recusar_se_em_espera()
+        try:
+            self._atualizar(completa=True)
+        except Exception as e:
+            self._metricas["falhas_leitura"] += 1
+            self._espera_carga = min(max(self._espera_carga * 2, ESPERA_CARGA_INICIAL), ESPERA_CARGA_MAXIMA)
+            self._proxima_carga = time.monotonic() + self._espera_carga
+            print(f"⚠️ Falha ao carregar tokens revogados (nova tentativa em {self._espera_carga:.0f}s): {e}")
+            raise RevogacaoIndisponivel(self._espera_carga) from e
+
+        self._espera_carga = 0.0
+        self._proxima_carga = 0.0
+        self._pid = os.getpid()
+
+    def _garantir_atual(self):
+        if self._pid != os.getpid():
+            # Primeira carga do worker: as requisições esperam (sem ela, um
+            # token revogado passaria). Durante a espera entre tentativas,
+            # recusa sem nem disputar o lock
+            self._recusar_se_em_espera()
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._carregar()
+            return
+
+        if time.monotonic() < self._proxima_leitura:
+            return
+
+        # Só uma thread lê; as outras seguem com o espelho atual
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() >= self._proxima_leitura:
+                self._atualizar(completa=False)
+        except Exception as e:
+            self._metricas["falhas_leitura"] += 1
+            self._proxima_leitura = time.monotonic() + self.intervalo
+            print(f"⚠️ Falha ao atualizar tokens revogados (mantendo a lista atual): {e}")
+        finally:
+            self._lock.release()
+
+    # -------------------- API --------------------
+
+    def contem(self, jti: str) -> bool:
+        self._garantir_atual()
+        if jti not in self._filtro:
+            return False
+
+        self._metricas["positivos_filtro"] += 1
+        if jti in self._exatos:
+            return True
+        self._metricas["falsos_positivos"] += 1
+        return False
+
+    def registrar(self, jti: str, expira_em):
+        """Revogação feita por este worker: vale aqui sem esperar a próxima leitura"""
+        with self._lock:
+            self._adicionar(jti, expira_em)
+
+    def metricas(self) -> dict:
+        dados = dict(self._metricas)
+        dados["revogados"] = len(self._exatos)
+        dados["bits_filtro"] = self._filtro.num_bits
+        dados["hashes_filtro"] = self._filtro.num_hashes
+        return dados
+
+
+_lista = ListaRevogacao()
+
+
+# ============================================================
+#                     API DO MÓDULO
+# ============================================================
+
+def token_revogado(jti: str) -> bool:
+    """Confere o jti sem ir ao banco (usado em toda requisição autenticada)"""
+    return bool(jti) and _lista.contem(jti)
+
+
+def revogar_token(jti: str, exp: int, id_usuario=None):
+    """
+    Revoga o token até a sua expiração
+
+    Args:
+        jti (str): Identificador do token (claim "jti")
+        exp (int): Expiração do token (claim "exp", timestamp UTC)
+        id_usuario: Dono do token (só para consulta)
+    """
+    expira_em = datetime.utcfromtimestamp(exp)
+    try:
+        with db.engine.begin() as conexao:
+            conexao.execute(insert(_tabela).values(
+                jti=jti,
+                id_usuario=int(id_usuario) if id_usuario is not None else None,
+                revogado_em=datetime.utcnow(),
+                expira_em=expira_em
+            ))
+    except IntegrityError:
+        pass  # já revogado (logout repetido)
+
+    _lista.registrar(jti, expira_em)
+
+
+def limpar_tokens_vencidos(tamanho_lote: int = 1000) -> int:
+    """
+    Apaga revogações de tokens que já expiraram, em lotes curtos
+
+    Returns:
+        int: Quantidade de linhas apagadas
+    """
+    total = 0
+    while True:
+        agora = datetime.utcnow()
+        with db.engine.begin() as conexao:
+            jtis = conexao.execute(
+                select(_tabela.c.jti).where(_tabela.c.expira_em <= agora).limit(tamanho_lote)
+            ).scalars().all()
+            if not jtis:
+                return total
+            conexao.execute(delete(_tabela).where(_tabela.c.jti.in_(jtis)))
+        total += len(jtis)
+
+
+def metricas_revogacao() -> dict:
+    """Tamanho do espelho e contadores deste worker"""
+    return _lista.metricas()
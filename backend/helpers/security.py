@@ -1,7 +1,232 @@
+"""
+Hash de senhas - Leon's Cupcake
+
+PBKDF2 com centenas de milhares de iterações leva dezenas de milissegundos
+de CPU por chamada, segurando o GIL: alguns logins simultâneos travavam
+todas as threads do worker, inclusive as que só listavam produtos. Por
+isso geração e verificação rodam em um pool de processos dedicado,
+separado do pool de imagens:
+
+    - SENHAS_PROCESSOS processos (padrão: metade dos núcleos);
+    - no máximo SENHAS_MAX_FILA cálculos esperando além dos que já estão
+      rodando. Com o pool cheio, SenhasOcupado é levantada na hora (a rota
+      responde 503 com Retry-After) em vez de a fila crescer e todos os
+      logins estourarem o tempo;
+    - a vaga só é devolvida quando o cálculo termina: uma requisição que
+      desistiu por SENHAS_TIMEOUT (também SenhasOcupado) não libera vaga
+      para um processo que ainda está ocupado;
+    - um processo filho morto (OOM, kill) quebra o pool: ele é recriado e
+      a requisição recebe SenhasOcupado;
+    - tempo na fila e tempo de cálculo em metricas_senhas() (expostos em
+      /api/health).
+
+Parâmetros: SENHAS_ITERACOES define o custo dos hashes novos. Hashes
+gravados com outro método ou menos iterações continuam válidos, e
+precisa_rehash() diz quando regravá-los (feito no login bem-sucedido,
+único momento em que a senha em texto está disponível).
+
+Este módulo não importa Flask: as funções do pool rodam em processos
+filhos que só precisam do Werkzeug.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
 from werkzeug.security import generate_password_hash, check_password_hash
 
-def hash_password(senha):
-    return generate_password_hash(senha)
 
-def verify_password(hash_senha, senha_digitada):
-    return check_password_hash(hash_senha, senha_digitada)
\ No newline at end of file
+PROCESSOS = int(os.getenv("SENHAS_PROCESSOS", max(1, (os.cpu_count() or 2) // 2)))
+MAX_FILA = int(os.getenv("SENHAS_MAX_FILA", "32"))
+ITERACOES = int(os.getenv("SENHAS_ITERACOES", "600000"))
+TIMEOUT_SEGUNDOS = float(os.getenv("SENHAS_TIMEOUT", "10"))
+RETRY_AFTER_SEGUNDOS = 1
+
+METODO = f"pbkdf2:sha256:{ITERACOES}"
+
+
+class SenhasOcupado(Exception):
+    """Pool de senhas cheio: a requisição deve ser recusada com 503"""
+
+    def __init__(self):
+        super().__init__("Servidor ocupado, tente novamente em instantes")
+        self.retry_after = RETRY_AFTER_SEGUNDOS
+
+
+# ============================================================
+#                 FUNÇÕES DOS PROCESSOS FILHOS
+# ============================================================
+
+def _gerar(senha: str, metodo: str):
+    inicio = time.perf_counter()
+    return generate_password_hash(senha, method=metodo), time.perf_counter() - inicio
+
+
+def _verificar(hash_senha: str, senha: str):
+    inicio = time.perf_counter()
+    return check_password_hash(hash_senha, senha), time.perf_counter() - inicio
+
+
+# ============================================================
+#                     POOL E MÉTRICAS
+# ============================================================
+
+_pool = None
+_pool_lock = threading.Lock()
+# Vagas = processos rodando + fila; sem vaga, recusa na hora
+_vagas = threading.BoundedSemaphore(PROCESSOS + MAX_FILA)
+
+_metricas_lock = threading.Lock()
+_metricas = {
+    "executadas": 0,
+    "recusadas": 0,
+    "tempo_esgotado": 0,
+    "pools_recriados": 0,
+    "em_andamento": 0,
+    "tempo_fila_total": 0.0,
+    "tempo_fila_maximo": 0.0,
+    "tempo_calculo_total": 0.0,
+    "tempo_calculo_maximo": 0.0,
+}
+
+
+def _obter_pool() -> ProcessPoolExecutor:
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: o worker da API tem threads (e conexões); fork as copiaria
+                _pool = ProcessPoolExecutor(
+                    max_workers=PROCESSOS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def _recriar_pool(quebrado: ProcessPoolExecutor):
+    """Descarta o pool quebrado; o próximo _obter_pool cria outro (uma vez só, entre threads)"""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not quebrado:
+            return
+        _pool = None
+    _contar("pools_recriados")
+    quebrado.shutdown(wait=False, cancel_futures=True)
+
+
+def _contar(metrica: str, quantidade=1):
+    with _metricas_lock:
+        _metricas[metrica] += quantidade
+
+
+def _registrar_tempos(total: float, calculo: float):
+    fila = max(0.0, total - calculo)
+    with _metricas_lock:
+        _metricas["executadas"] += 1
+        _metricas["tempo_fila_total"] += fila
+        _metricas["tempo_calculo_total"] += calculo
+        _metricas["tempo_fila_maximo"] = max(_metricas["tempo_fila_maximo"], fila)
+        _metricas["tempo_calculo_maximo"] = max(_metricas["tempo_calculo_maximo"], calculo)
+
+
+def _liberar_vaga(_futuro=None):
+    _contar("em_andamento", -1)
+    _vagas.release()
+
+
+def _executar(fn, *args):
+    """
+    Roda fn no pool e devolve o resultado
+
+    Raises:
+        SenhasOcupado: Sem vaga, tempo esgotado ou pool quebrado
+    """
+    if not _vagas.acquire(blocking=False):
+        _contar("recusadas")
+        raise SenhasOcupado()
+
+    _contar("em_andamento")
+    inicio = time.perf_counter()
+    pool = _obter_pool()
+    try:
+        futuro = pool.submit(fn, *args)
+    except (BrokenProcessPool, RuntimeError):
+        # Quebrado por outra requisição (ou já desligado): nada foi enfileirado
+        _liberar_vaga()
+        _recriar_pool(pool)
+        raise SenhasOcupado()
+
+    # A vaga volta quando o cálculo termina, mesmo que ninguém espere mais por ele
+    futuro.add_done_callback(_liberar_vaga)
+    try:
+        resultado, calculo = futuro.result(timeout=TIMEOUT_SEGUNDOS)
+    except TimeoutError:
+        _contar("tempo_esgotado")
+        raise SenhasOcupado()
+    except BrokenProcessPool:
+        print("⚠️ Pool de senhas quebrado (processo filho encerrado); recriando")
+        _recriar_pool(pool)
+        raise SenhasOcupado()
+
+    _registrar_tempos(time.perf_counter() - inicio, calculo)
+    return resultado
+
+
+# ============================================================
+#                     API DO MÓDULO
+# ============================================================
+
+def hash_password(senha: str) -> str:
+    """
+    Gera o hash da senha com os parâmetros atuais (SENHAS_ITERACOES)
+
+    Raises:
+        SenhasOcupado: Pool cheio
+    """
+    return _executar(_gerar, senha, METODO)
+
+
+def verify_password(hash_senha: str, senha_digitada: str) -> bool:
+    """
+    Confere a senha com o hash gravado (qualquer método aceito pelo Werkzeug)
+
+    Raises:
+        SenhasOcupado: Pool cheio
+    """
+    if not hash_senha or not senha_digitada:
+        return False
+    return _executar(_verificar, hash_senha, senha_digitada)
+
+
+def precisa_rehash(hash_senha: str) -> bool:
+    """True se o hash foi gerado com outro método ou custo menor que o atual"""
+    if not hash_senha or '$' not in hash_senha:
+        return True
+
+    metodo = hash_senha.split('$', 1)[0]
+    if metodo == METODO:
+        return False
+
+    partes = metodo.split(':')
+    if len(partes) == 3 and partes[:2] == ['pbkdf2', 'sha256'] and partes[2].isdigit():
+        return int(partes[2]) < ITERACOES
+    return True
+
+
+def metricas_senhas() -> dict:
+    """Contadores e tempos (segundos) do pool de senhas deste worker"""
+    with _metricas_lock:
+        dados = dict(_metricas)
+
+    executadas = dados["executadas"] or 1
+    dados["tempo_fila_medio"] = round(dados["tempo_fila_total"] / executadas, 4)
+    dados["tempo_calculo_medio"] = round(dados["tempo_calculo_total"] / executadas, 4)
+    for chave in ("tempo_fila_total", "tempo_fila_maximo", "tempo_calculo_total", "tempo_calculo_maximo"):
+        dados[chave] = round(dados[chave], 4)
+    dados["processos"] = PROCESSOS
+    dados["max_fila"] = MAX_FILA
+    return dados
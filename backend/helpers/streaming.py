@@ -0,0 +1,82 @@
+"""
+Respostas JSON em streaming - Leon's Cupcake
+
+Para listagens administrativas que podem ter milhares de registros.
+Em vez de montar a lista inteira e passar para jsonify, a consulta é
+percorrida em lotes (keyset, sem OFFSET) e o array JSON é escrito aos
+poucos. O primeiro byte sai depois do primeiro lote e a memória do
+worker fica limitada a um lote, independente do tamanho da tabela.
+
+O corpo é o mesmo array JSON de antes; o cliente não muda.
+
+Uso:
+    def listar_entregas():
+        lotes = percorrer_em_lotes(Entrega.query, Entrega.data_atribuicao, Entrega.id_entrega, nullable=True)
+        return ([e.to_dict() for e in lote] for lote in lotes)
+
+    @entrega_bp.get("/")
+    def get_entregas():
+        return resposta_json_em_lotes(listar_entregas())
+"""
+from flask import Response, current_app, stream_with_context
+
+from config import db
+from helpers.paginacao import filtro_keyset, ordenar_keyset
+
+
+TAMANHO_LOTE = 200
+
+
+def percorrer_em_lotes(query, coluna, coluna_id, descendente: bool = True, nullable: bool = False,
+                       tamanho_lote: int = TAMANHO_LOTE):
+    """
+    Gera listas de até `tamanho_lote` objetos, na ordem (coluna, id)
+
+    Cada lote é uma consulta curta com LIMIT; nenhuma transação ou cursor
+    fica aberto enquanto o cliente lê a resposta. Depois de cada lote a
+    sessão é esvaziada, senão o identity map guardaria todos os objetos.
+    """
+    ultimo = None
+
+    while True:
+        consulta = query
+        if ultimo is not None:
+            consulta = consulta.filter(filtro_keyset(coluna, coluna_id, ultimo[0], ultimo[1], descendente, nullable))
+
+        lote = consulta.order_by(*ordenar_keyset(coluna, coluna_id, descendente)).limit(tamanho_lote).all()
+        if not lote:
+            return
+
+        fim = lote[-1]
+        ultimo = (getattr(fim, coluna.key) if coluna is not None else None, getattr(fim, coluna_id.key))
+
+        yield lote
+
+        # Somente leitura: nada pendente a perder
+        db.session.expunge_all()
+        db.session.rollback()
+
+        if len(lote) < tamanho_lote:
+            return
+
+
+def resposta_json_em_lotes(lotes, status: int = 200) -> Response:
+    """
+    Escreve um array JSON a partir de um gerador de listas de dicts
+
+    O status já foi enviado quando o primeiro lote sai: erros no meio do
+    streaming interrompem a resposta (o cliente recebe um JSON truncado).
+    """
+    def gerar():
+        dumps = current_app.json.dumps
+        yield '['
+        primeiro = True
+        for lote in lotes:
+            if not lote:
+                continue
+            pedaco = ','.join(dumps(item) for item in lote)
+            yield pedaco if primeiro else ',' + pedaco
+            primeiro = False
+        yield ']'
+
+    return Response(stream_with_context(gerar()), status=status, mimetype='application/json')
@@ -0,0 +1,172 @@
+"""
+Tarefas executadas depois do commit - Leon's Cupcake
+
+Efeitos colaterais de uma escrita (atualizar rankings da vitrine,
+invalidar o cache do catálogo e, no futuro, notificações e e-mails) não
+precisam atrasar a resposta. Dentro da transação, o código só registra a
+tarefa:
+
+    apos_commit(atualizar_vitrine_apos_pedido, resumos)
+    db.session.commit()
+
+Quando o commit da sessão acontece, as tarefas registradas vão para uma
+fila atendida por um pool pequeno de threads deste worker. Se a sessão
+for desfeita (rollback), as tarefas são descartadas: nada roda para uma
+escrita que não aconteceu.
+
+Regras do pool:
+    - TAREFAS_THREADS threads (padrão 2), criadas no próprio worker;
+    - fila limitada a TAREFAS_MAX_FILA: com a fila cheia, a tarefa roda
+      na thread da requisição (a própria requisição sente a pressão, em
+      vez de a memória crescer sem limite);
+    - até TAREFAS_TENTATIVAS tentativas com espera crescente;
+    - contadores em metricas_tarefas() (expostos em /api/health).
+
+As tarefas rodam dentro de um app_context da aplicação que as registrou.
+Como nos contadores de visualização, tarefas ainda na fila quando o
+worker morre sem encerrar são perdidas: use para efeitos que podem ser
+refeitos, nunca para o que precisa estar na transação.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+NUM_THREADS = int(os.getenv("TAREFAS_THREADS", "2"))
+MAX_FILA = int(os.getenv("TAREFAS_MAX_FILA", "1000"))
+TENTATIVAS = int(os.getenv("TAREFAS_TENTATIVAS", "3"))
+ESPERA_INICIAL = float(os.getenv("TAREFAS_ESPERA_INICIAL", "0.5"))
+
+_CHAVE_SESSAO = "tarefas_apos_commit"
+
+
+class ExecutorTarefas:
+    """Fila limitada + threads de trabalho, iniciadas sob demanda em cada worker"""
+
+    def __init__(self, num_threads: int = NUM_THREADS, max_fila: int = MAX_FILA,
+                 tentativas: int = TENTATIVAS, espera_inicial: float = ESPERA_INICIAL):
+        self.num_threads = num_threads
+        self.max_fila = max_fila
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self._lock = threading.Lock()
+        self._fila = None
+        self._pid = None
+        self._metricas = dict.fromkeys(
+            ("enfileiradas", "executadas", "falhas", "novas_tentativas", "no_chamador", "descartadas"), 0
+        )
+
+    def _contar(self, metrica: str, quantidade: int = 1):
+        with self._lock:
+            self._metricas[metrica] += quantidade
+
+    def _garantir_threads(self):
+        # Iniciado no próprio worker (depois do fork do gunicorn), nunca no master
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._fila = queue.Queue(maxsize=self.max_fila)
+            self._pid = os.getpid()
+            for i in range(self.num_threads):
+                threading.Thread(target=self._laco, name=f"tarefas-{i}", daemon=True).start()
+        atexit.register(self._encerrar)
+
+    def enviar(self, tarefa):
+        """Enfileira (app, fn, args, kwargs); com a fila cheia, executa aqui mesmo"""
+        self._garantir_threads()
+        try:
+            self._fila.put_nowait(tarefa)
+            self._contar("enfileiradas")
+        except queue.Full:
+            self._contar("no_chamador")
+            self._executar(tarefa)
+
+    def _laco(self):
+        fila = self._fila
+        while True:
+            tarefa = fila.get()
+            try:
+                self._executar(tarefa)
+            finally:
+                fila.task_done()
+
+    def _executar(self, tarefa):
+        app, fn, args, kwargs = tarefa
+        espera = self.espera_inicial
+
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                if app is not None:
+                    with app.app_context():
+                        fn(*args, **kwargs)
+                else:
+                    fn(*args, **kwargs)
+                self._contar("executadas")
+                return
+            except Exception as e:
+                if tentativa == self.tentativas:
+                    self._contar("falhas")
+                    print(f"❌ Tarefa {fn.__name__} falhou após {tentativa} tentativa(s): {e}")
+                    return
+                self._contar("novas_tentativas")
+                time.sleep(espera)
+                espera *= 2
+
+    def _encerrar(self, limite_segundos: float = 5.0):
+        """Dá um tempo para a fila esvaziar quando o worker é encerrado"""
+        fila = self._fila
+        fim = time.monotonic() + limite_segundos
+        while fila is not None and fila.unfinished_tasks and time.monotonic() < fim:
+            time.sleep(0.05)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            dados = dict(self._metricas)
+        dados["na_fila"] = self._fila.qsize() if self._fila is not None and self._pid == os.getpid() else 0
+        return dados
+
+
+_executor = ExecutorTarefas()
+
+
+# ============================================================
+#                     GANCHOS DA SESSÃO
+# ============================================================
+
+@event.listens_for(Session, "after_commit")
+def _despachar(session):
+    tarefas = session.info.pop(_CHAVE_SESSAO, None)
+    for tarefa in tarefas or ():
+        _executor.enviar(tarefa)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar(session, transacao_anterior):
+    # Rollback de SAVEPOINT não desfaz a transação externa
+    if transacao_anterior.parent is None:
+        tarefas = session.info.pop(_CHAVE_SESSAO, None)
+        if tarefas:
+            _executor._contar("descartadas", len(tarefas))
+
+
+def apos_commit(fn, *args, **kwargs):
+    """
+    Agenda fn(*args, **kwargs) para depois do próximo commit da sessão
+
+    Descartada se a sessão for desfeita antes do commit.
+    """
+    from flask import current_app, has_app_context
+    from config import db
+
+    app = current_app._get_current_object() if has_app_context() else None
+    db.session.info.setdefault(_CHAVE_SESSAO, []).append((app, fn, args, kwargs))
+
+
+def metricas_tarefas() -> dict:
+    """Contadores do executor deste worker"""
+    return _executor.metricas()
@@ -0,0 +1,153 @@
+"""
+Contador de visualizações de produtos (write-behind) - Leon's Cupcake
+
+Contar cada GET /api/produtos/<id> com um UPDATE colocaria um lock de
+linha justamente nos produtos mais acessados. Em vez disso, cada worker
+soma as visualizações em memória e grava tudo de uma vez:
+
+    - a cada VISUALIZACOES_INTERVALO segundos;
+    - antes, se acumular VISUALIZACOES_MAX_PENDENTES visualizações;
+    - quando o worker é encerrado (atexit).
+
+VISUALIZACOES_MAX_PENDENTES também é o teto do buffer: se o banco não
+aceitar as gravações, as visualizações que chegam com o buffer cheio são
+descartadas (e contadas em metricas_visualizacoes()), em vez de a memória
+crescer sem limite. Só produtos existentes são contados (a rota registra
+depois de responder 200/304).
+
+Se o worker morrer sem encerrar (kill -9, falta de energia), perde no
+máximo VISUALIZACOES_MAX_PENDENTES visualizações. É uma métrica de
+popularidade, não um dado contábil.
+"""
+import atexit
+import os
+import threading
+
+from sqlalchemy import case, update
+
+
+INTERVALO_SEGUNDOS = float(os.getenv("VISUALIZACOES_INTERVALO", "5"))
+MAX_PENDENTES = int(os.getenv("VISUALIZACOES_MAX_PENDENTES", "10000"))
+
+
+class BufferVisualizacoes:
+    """Soma por produto, descarregada em um único UPDATE"""
+
+    def __init__(self, intervalo: float = INTERVALO_SEGUNDOS, max_pendentes: int = MAX_PENDENTES):
+        self.intervalo = intervalo
+        self.max_pendentes = max_pendentes
+        self._lock = threading.Lock()
+        self._contagens = {}
+        self._pendentes = 0
+        self._descartadas = 0
+        self._acordar = threading.Event()
+        self._app = None
+        self._pid = None
+
+    def _iniciar(self, app):
+        # Iniciado no próprio worker (depois do fork do gunicorn), nunca no master
+        self._app = app
+        self._pid = os.getpid()
+        threading.Thread(target=self._laco, name="visualizacoes", daemon=True).start()
+        atexit.register(self._encerrar)
+
+    def registrar(self, id_produto: int, app):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._contagens, self._pendentes = {}, 0
+                self._iniciar(app)
+
+            if self._pendentes >= self.max_pendentes:
+                # Buffer cheio (gravação atrasada ou falhando): descarta
+                self._descartadas += 1
+                cheio = True
+            else:
+                self._contagens[id_produto] = self._contagens.get(id_produto, 0) + 1
+                self._pendentes += 1
+                cheio = self._pendentes >= self.max_pendentes
+
+        if cheio:
+            self._acordar.set()
+
+    def _laco(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.descarregar()
+            except Exception as e:
+                print(f"⚠️  Erro ao gravar visualizações (nova tentativa em {self.intervalo}s): {e}")
+
+    def _encerrar(self):
+        try:
+            self.descarregar()
+        except Exception as e:
+            print(f"⚠️  Visualizações perdidas no encerramento: {e}")
+
+    def _retirar(self) -> dict:
+        with self._lock:
+            contagens, self._contagens, self._pendentes = self._contagens, {}, 0
+        return contagens
+
+    def _devolver(self, contagens: dict):
+        """Falha ao gravar: devolve ao buffer sem ultrapassar o limite"""
+        with self._lock:
+            for id_produto, quantidade in contagens.items():
+                cabe = min(quantidade, self.max_pendentes - self._pendentes)
+                self._descartadas += quantidade - max(cabe, 0)
+                if cabe <= 0:
+                    continue
+                self._contagens[id_produto] = self._contagens.get(id_produto, 0) + cabe
+                self._pendentes += cabe
+
+    def descarregar(self):
+        """Grava as visualizações acumuladas (chamado pela thread e no encerramento)"""
+        contagens = self._retirar()
+        if not contagens or self._app is None:
+            return
+
+        from config import db
+        from models.produto import Produto
+
+        incremento = case(contagens, value=Produto.id_produto, else_=0)
+        comando = (
+            update(Produto.__table__)
+            .where(Produto.id_produto.in_(sorted(contagens)))
+            # atualizado_em fica como está: visualização não é alteração do produto
+            .values(visualizacoes=Produto.visualizacoes + incremento, atualizado_em=Produto.atualizado_em)
+        )
+
+        try:
+            with self._app.app_context():
+                with db.engine.begin() as conexao:
+                    conexao.execute(comando)
+        except Exception:
+            self._devolver(contagens)
+            raise
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "pendentes": self._pendentes,
+                "descartadas": self._descartadas,
+                "max_pendentes": self.max_pendentes,
+            }
+
+
+_buffer = BufferVisualizacoes()
+
+
+def registrar_visualizacao(id_produto: int):
+    """Conta uma visualização do produto (não acessa o banco)"""
+    from flask import current_app
+    _buffer.registrar(id_produto, current_app._get_current_object())
+
+
+def descarregar_visualizacoes():
+    """Força a gravação imediata (ex.: antes de gerar um relatório)"""
+    _buffer.descarregar()
+
+
+def metricas_visualizacoes() -> dict:
+    """Pendentes e descartadas (buffer cheio) deste worker"""
+    return _buffer.metricas()
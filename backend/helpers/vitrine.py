@@ -0,0 +1,247 @@
+"""
+Vitrine da home (destaques e mais vendidos) - Leon's Cupcake
+
+Substitui as views v_produtos_destaque e v_produtos_mais_vendidos, que
+ordenam a tabela de produtos inteira a cada leitura. Cada ranking guarda
+em memória os primeiros N produtos (com folga) e é atualizado
+incrementalmente quando um pedido é criado ou um produto muda. Ler a
+vitrine é O(k), independente do tamanho do catálogo.
+
+Cada worker mantém sua cópia. A cópia sabe qual versão do catálogo
+reflete: se outro worker alterou o catálogo, a versão não bate e a cópia
+é recarregada com uma consulta LIMIT pelo índice (uma vez por mudança,
+nunca por requisição).
+
+Vendas comuns não mudam a versão do catálogo, mas mudam os rankings.
+Elas incrementam um contador de vendas compartilhado (versao_vendas): o
+worker que vendeu aplica a venda na hora; os outros veem o contador
+andar e recarregam, no máximo a cada VITRINE_RECARGA_SEGUNDOS (padrão
+5), para um pico de vendas não virar uma consulta por leitura.
+"""
+import os
+import threading
+import time
+from bisect import insort
+
+from helpers.cache_catalogo import versao_catalogo, versao_vendas
+from helpers.imagens import srcset_imagem
+
+
+# Máximo de itens servidos por lista e quantos são mantidos em memória
+LIMITE_MAXIMO = 20
+CAPACIDADE = 40
+RECARGA_VENDAS_SEGUNDOS = float(os.getenv("VITRINE_RECARGA_SEGUNDOS", "5"))
+
+
+def resumo_vitrine(produto) -> dict:
+    """
+    Campos exibidos nos carrosséis (mesmos da view v_produtos_destaque)
+
+    Chame antes do commit: depois dele os atributos expiram e cada acesso
+    faria um novo SELECT.
+    """
+    return {
+        'id_produto': produto.id_produto,
+        'id_categoria': produto.id_categoria,
+        'nome': produto.nome,
+        'slug': produto.slug,
+        'descricao_curta': produto.descricao_curta,
+        'preco': float(produto.preco),
+        'preco_promocional': float(produto.preco_promocional) if produto.preco_promocional is not None else None,
+        'imagem_principal_url': produto.imagem_principal_url,
+        'imagem_srcset': srcset_imagem(produto.imagem_principal_url),
+        'avaliacao_media': float(produto.avaliacao_media) if produto.avaliacao_media is not None else None,
+        'total_avaliacoes': produto.total_avaliacoes,
+        'quantidade_vendida': produto.quantidade_vendida,
+        'ativo': bool(produto.ativo),
+        'destaque': bool(produto.destaque)
+    }
+
+
+class Ranking:
+    """
+    Os primeiros `capacidade` produtos de um critério, em ordem
+
+    Invariante: todo produto fora da lista tem chave maior que `fronteira`
+    (ou não existe produto fora, quando `completo`).
+    """
+
+    def __init__(self, filtro, chave, capacidade: int = CAPACIDADE):
+        self._filtro = filtro
+        self._chave = chave
+        self.capacidade = capacidade
+        self._itens = []
+        self._por_id = {}
+        self.completo = False
+        self._fronteira = None
+
+    def carregar(self, produtos: list):
+        self._itens = []
+        self._por_id = {}
+        for p in produtos[:self.capacidade]:
+            self._inserir(resumo_vitrine(p))
+
+        self.completo = len(produtos) <= self.capacidade
+        self._fronteira = None if self.completo else self._itens[-1][0]
+
+    def _inserir(self, entrada: dict):
+        item = (self._chave(entrada), entrada['id_produto'], entrada)
+        insort(self._itens, item)
+        self._por_id[entrada['id_produto']] = item
+
+    def _retirar(self, id_produto: int):
+        item = self._por_id.pop(id_produto, None)
+        if item is not None:
+            self._itens.remove(item)
+
+    def aplicar(self, entrada: dict):
+        self._retirar(entrada['id_produto'])
+
+        if self._filtro(entrada):
+            # Fora da fronteira pode haver produtos melhores que não conhecemos
+            if self.completo or self._chave(entrada) <= self._fronteira:
+                self._inserir(entrada)
+
+        if len(self._itens) > self.capacidade:
+            descartado = self._itens.pop()
+            del self._por_id[descartado[1]]
+            self.completo = False
+            self._fronteira = self._itens[-1][0]
+
+    def remover(self, id_produto: int):
+        self._retirar(id_produto)
+
+    @property
+    def precisa_recarregar(self) -> bool:
+        """Só falta recarregar se sobrou menos do que o máximo servido"""
+        return not self.completo and len(self._itens) < LIMITE_MAXIMO
+
+    def primeiros(self, limite: int) -> list:
+        return [item[2] for item in self._itens[:limite]]
+
+
+def _chave_destaques(entrada: dict):
+    return (-entrada['quantidade_vendida'], -(entrada['avaliacao_media'] or 0), -entrada['id_produto'])
+
+
+def _chave_mais_vendidos(entrada: dict):
+    return (-entrada['quantidade_vendida'], -entrada['id_produto'])
+
+
+class Vitrine:
+    """Rankings da home com a versão do catálogo que refletem"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._versao = None
+        self._versao_vendas = None
+        self._carregada_em = 0.0
+        self.rankings = {
+            'destaques': Ranking(lambda e: e['ativo'] and e['destaque'], _chave_destaques),
+            'mais_vendidos': Ranking(lambda e: e['ativo'], _chave_mais_vendidos),
+        }
+
+    def _recarregar(self):
+        from models.produto import Produto
+
+        # Lidas antes das consultas: uma escrita concorrente força nova recarga
+        versao = versao_catalogo()
+        vendas = versao_vendas()
+
+        # Poucos produtos em destaque: o desempate por avaliação é barato
+        destaques = (
+            Produto.query
+            .filter(Produto.destaque.is_(True), Produto.ativo.is_(True))  # idx_destaque
+            .order_by(Produto.quantidade_vendida.desc(), Produto.avaliacao_media.desc(), Produto.id_produto.desc())
+            .limit(CAPACIDADE + 1)
+            .all()
+        )
+        mais_vendidos = (
+            Produto.query
+            .filter(Produto.ativo.is_(True))  # idx_vendidos percorrido direto, sem filesort
+            .order_by(Produto.quantidade_vendida.desc(), Produto.id_produto.desc())
+            .limit(CAPACIDADE + 1)
+            .all()
+        )
+
+        self.rankings['destaques'].carregar(destaques)
+        self.rankings['mais_vendidos'].carregar(mais_vendidos)
+        self._versao = versao
+        self._versao_vendas = vendas
+        self._carregada_em = time.monotonic()
+
+    def _vendas_de_outros(self) -> bool:
+        """Outro worker vendeu e a cópia já tem idade para recarregar"""
+        return (
+            self._versao_vendas != versao_vendas()
+            and time.monotonic() - self._carregada_em >= RECARGA_VENDAS_SEGUNDOS
+        )
+
+    def listar(self, nome: str, limite: int) -> list:
+        with self._lock:
+            ranking = self.rankings[nome]
+            if self._versao != versao_catalogo() or ranking.precisa_recarregar or self._vendas_de_outros():
+                self._recarregar()
+            return ranking.primeiros(min(limite, LIMITE_MAXIMO))
+
+    def aplicar(self, versao: int, resumos=(), removidos=()):
+        """
+        Aplica mudanças já commitadas
+
+        Args:
+            versao (int): Versão retornada por incrementar_versao_catalogo()
+            resumos: resumo_vitrine() dos produtos alterados
+            removidos: IDs de produtos excluídos
+        """
+        with self._lock:
+            # Outra escrita aconteceu no meio: a próxima leitura recarrega
+            if self._versao is None or self._versao != versao - 1:
+                self._versao = None
+                return
+
+            for ranking in self.rankings.values():
+                for entrada in resumos:
+                    ranking.aplicar(entrada)
+                for id_produto in removidos:
+                    ranking.remover(id_produto)
+
+            self._versao = versao
+
+    def ajustar(self, versao_vendas: int, resumos=()):
+        """
+        Aplica vendas que não mudaram a versão do catálogo (nada esgotou)
+
+        Args:
+            versao_vendas (int): Retornada por incrementar_versao_vendas()
+            resumos: resumo_vitrine() dos produtos vendidos
+        """
+        with self._lock:
+            if self._versao is None or self._versao != versao_catalogo():
+                return  # a próxima leitura recarrega de qualquer forma
+
+            for ranking in self.rankings.values():
+                for entrada in resumos:
+                    ranking.aplicar(entrada)
+
+            # Só esta venda desde a carga: a cópia continua completa. Se o
+            # contador saltou, houve vendas de outros workers (recarga em breve)
+            if self._versao_vendas == versao_vendas - 1:
+                self._versao_vendas = versao_vendas
+
+
+_vitrine = Vitrine()
+
+
+def listar_vitrine(nome: str, limite: int = LIMITE_MAXIMO) -> list:
+    """Primeiros produtos de um ranking ('destaques' ou 'mais_vendidos')"""
+    return _vitrine.listar(nome, limite)
+
+
+def atualizar_vitrine(versao: int, resumos=(), removidos=()):
+    """Atualiza os rankings depois de um commit que mudou o catálogo"""
+    _vitrine.aplicar(versao, resumos, removidos)
+
+
+def ajustar_vitrine(versao_vendas: int, resumos=()):
+    """Atualiza os rankings deste worker depois de vendas sem mudança de versão"""
+    _vitrine.ajustar(versao_vendas, resumos)
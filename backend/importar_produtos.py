@@ -0,0 +1,81 @@
+"""
+Script para importar/exportar o catálogo de produtos em lote
+Útil para cadastrar o catálogo inicial ou sincronizar com a planilha
+
+USO:
+    python importar_produtos.py catalogo.csv                 # Importa (upsert pelo SKU)
+    python importar_produtos.py catalogo.ndjson              # Importa NDJSON
+    python importar_produtos.py --exportar produtos.csv      # Exporta o catálogo
+    python importar_produtos.py --exportar produtos.ndjson
+"""
+import sys
+import time
+from config import create_app
+from controllers.importacao_controller import importar_produtos, exportar_produtos, detectar_formato
+
+
+def importar(caminho):
+    """Importa o arquivo e exibe o relatório"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            formato = detectar_formato(nome_arquivo=caminho)
+            inicio = time.perf_counter()
+
+            with open(caminho, "rb") as arquivo:
+                relatorio = importar_produtos(arquivo, formato)
+
+            duracao = time.perf_counter() - inicio
+
+            print("\n" + "="*80)
+            print(f"📦 IMPORTAÇÃO CONCLUÍDA EM {duracao:.1f}s")
+            print("="*80)
+            print(f"\n📄 Linhas lidas: {relatorio['linhas']}")
+            print(f"✅ Inseridos: {relatorio['inseridos']}")
+            print(f"🔄 Atualizados: {relatorio['atualizados']}")
+            print(f"❌ Erros: {relatorio['total_erros']}")
+
+            for erro in relatorio['erros']:
+                sku = f" [{erro['sku']}]" if erro['sku'] else ""
+                print(f"   Linha {erro['linha']}{sku}: {erro['erro']}")
+
+            omitidos = relatorio['total_erros'] - len(relatorio['erros'])
+            if omitidos:
+                print(f"   ... e mais {omitidos} erro(s)")
+
+            print("\n" + "="*80 + "\n")
+
+        except (OSError, ValueError) as e:
+            print(f"\n❌ {e}\n")
+            sys.exit(1)
+
+
+def exportar(caminho):
+    """Grava o catálogo completo no arquivo"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            formato = detectar_formato(nome_arquivo=caminho)
+
+            with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+                for bloco in exportar_produtos(formato):
+                    arquivo.write(bloco)
+
+            print(f"\n✅ Catálogo exportado para {caminho}\n")
+
+        except (OSError, ValueError) as e:
+            print(f"\n❌ {e}\n")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] in ["-e", "--exportar"]:
+        exportar(sys.argv[2])
+
+    elif len(sys.argv) == 2 and sys.argv[1] not in ["-h", "--help", "help"]:
+        importar(sys.argv[1])
+
+    else:
+        print(__doc__)
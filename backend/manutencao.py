@@ -0,0 +1,104 @@
+"""
+Tarefas de manutenção do banco (para rodar no cron)
+
+USO:
+    python manutencao.py idempotencia     # Apaga Idempotency-Keys vencidas
+    python manutencao.py arquivar         # Move pedidos finalizados antigos para o arquivo
+    python manutencao.py tokens           # Apaga revogações de tokens já expirados
+    python manutencao.py email_normalizado  # Migração: cria usuarios.email_normalizado (uma vez)
+
+EXEMPLO DE CRON:
+    0 * * * * cd /caminho/backend && python manutencao.py idempotencia
+    30 3 * * * cd /caminho/backend && python manutencao.py arquivar
+    15 4 * * * cd /caminho/backend && python manutencao.py tokens
+"""
+import sys
+from config import create_app
+
+
+def limpar_idempotencia():
+    """Remove as chaves de idempotência vencidas"""
+    from helpers.idempotencia import limpar_chaves_vencidas
+
+    app = create_app()
+    with app.app_context():
+        total = limpar_chaves_vencidas()
+        print(f"🧹 {total} chave(s) de idempotência vencida(s) removida(s)")
+
+
+def arquivar_pedidos():
+    """Arquiva os pedidos finalizados há mais de ARQUIVO_PEDIDOS_DIAS dias"""
+    from helpers.arquivo_pedidos import arquivar_pedidos as arquivar, DIAS
+
+    app = create_app()
+    with app.app_context():
+        total = arquivar()
+        print(f"✅ {total} pedido(s) finalizado(s) há mais de {DIAS} dias arquivado(s)")
+
+
+def limpar_tokens():
+    """Remove os tokens revogados que já expiraram"""
+    from helpers.revogacao import limpar_tokens_vencidos
+
+    app = create_app()
+    with app.app_context():
+        total = limpar_tokens_vencidos()
+        print(f"🧹 {total} token(s) revogado(s) vencido(s) removido(s)")
+
+
+def migrar_email_normalizado():
+    """
+    Adiciona usuarios.email_normalizado em bancos criados antes da coluna
+
+    A coluna é gerada (LOWER(TRIM(email))) e STORED: o próprio ALTER preenche
+    as linhas existentes e o MySQL a mantém nas escritas seguintes. O ALTER
+    recria a tabela; rode fora do horário de pico. Se houver emails que só
+    diferem em maiúsculas/espaços, o índice único não pode ser criado: a
+    migração lista os conflitos e para sem alterar nada.
+    """
+    from sqlalchemy import inspect, text
+    from config import db
+
+    app = create_app()
+    with app.app_context():
+        colunas = {coluna["name"] for coluna in inspect(db.engine).get_columns("usuarios")}
+        if "email_normalizado" in colunas:
+            print("✅ usuarios.email_normalizado já existe")
+            return
+
+        with db.engine.connect() as conexao:
+            conflitos = conexao.execute(text(
+                "SELECT LOWER(TRIM(email)) AS email, COUNT(*) AS quantidade FROM usuarios "
+                "GROUP BY LOWER(TRIM(email)) HAVING COUNT(*) > 1"
+            )).all()
+
+        if conflitos:
+            print(f"❌ {len(conflitos)} email(s) duplicado(s) após normalizar; corrija antes de migrar:")
+            for conflito in conflitos:
+                print(f"    - {conflito.email} ({conflito.quantidade} usuários)")
+            sys.exit(1)
+
+        with db.engine.begin() as conexao:
+            conexao.execute(text(
+                "ALTER TABLE usuarios "
+                "ADD COLUMN email_normalizado VARCHAR(100) "
+                "GENERATED ALWAYS AS (LOWER(TRIM(email))) STORED AFTER email, "
+                "ADD UNIQUE INDEX uk_email_normalizado (email_normalizado)"
+            ))
+        print("✅ usuarios.email_normalizado criada e preenchida")
+
+
+TAREFAS = {
+    "idempotencia": limpar_idempotencia,
+    "arquivar": arquivar_pedidos,
+    "tokens": limpar_tokens,
+    "email_normalizado": migrar_email_normalizado,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in TAREFAS:
+        print(__doc__)
+        sys.exit(1)
+
+    TAREFAS[sys.argv[1]]()
@@ -1,7 +1,7 @@
 from functools import wraps
 from flask import jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
-from controllers.auth_controller import obter_usuario_por_id
+from helpers.principal import obter_principal
 
 def admin_required():
     """
@@ -24,11 +24,11 @@ def admin_required():
                     "mensagem": "Apenas administradores podem acessar este recurso"
                 }), 403
             
-            # Validação extra: verifica no banco de dados (segurança adicional)
-            user_id = get_jwt_identity()
-            user = obter_usuario_por_id(user_id)
+            # Validação extra: tipo e ativo atuais do usuário (segurança
+            # adicional), pelo cache de principais em vez de um SELECT por chamada
+            principal = obter_principal(get_jwt_identity())
             
-            if not user or user.tipo_usuario != "admin":
+            if not principal or principal["tipo_usuario"] != "admin" or not principal["ativo"]:
                 return jsonify({
                     "erro": "Acesso negado",
                     "mensagem": "Permissões insuficientes"
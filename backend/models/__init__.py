@@ -13,22 +13,31 @@ from .usuario import Usuario
 from .endereco import Endereco
 
 # Modelos de produtos
-from .produto import Produto, Categoria
+from .produto import Produto, Categoria, ImagemProduto
 
 # Modelos de pedidos
-from .pedido import Pedido
+from .pedido import Pedido, ContadorPedido, HistoricoStatusPedido
 from .item_pedido import ItemPedido
 
 # Modelos de entrega
 from .entrega import Entrega
 
+# Infraestrutura
+from .idempotencia import ChaveIdempotencia
+from .token_revogado import TokenRevogado
+
 # Lista de todos os modelos (útil para migrations e debug)
 __all__ = [
     'Usuario',
     'Endereco',
     'Produto',
     'Categoria',
+    'ImagemProduto',
     'Pedido',
+    'ContadorPedido',
+    'HistoricoStatusPedido',
     'ItemPedido',
-    'Entrega'
+    'Entrega',
+    'ChaveIdempotencia',
+    'TokenRevogado'
 ]
\ No newline at end of file
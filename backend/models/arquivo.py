@@ -0,0 +1,31 @@
+"""
+Tabelas de arquivo dos pedidos - Leon's Cupcake
+
+Pedidos finalizados antigos saem de `pedidos` / `itens_pedido` (e das
+tabelas que dependem deles) para cópias com sufixo _arquivo, criadas no
+leons_cupcake.sql com CREATE TABLE ... LIKE. Não têm modelo ORM: só são
+lidas por pedido_controller (listagens que descem até o histórico antigo)
+e escritas por helpers/arquivo_pedidos.py.
+
+As colunas são as mesmas dos modelos, então uma linha arquivada vira um
+Pedido/ItemPedido transitório (fora da sessão) só para serialização.
+"""
+from config import db
+from models.pedido import Pedido
+from models.item_pedido import ItemPedido
+
+
+def _tabela_arquivo(tabela):
+    """Mesmas colunas e índices simples, sem chaves estrangeiras"""
+    return db.Table(
+        f"{tabela.name}_arquivo",
+        db.metadata,
+        *[
+            db.Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, index=c.index)
+            for c in tabela.columns
+        ]
+    )
+
+
+pedidos_arquivo = _tabela_arquivo(Pedido.__table__)
+itens_pedido_arquivo = _tabela_arquivo(ItemPedido.__table__)
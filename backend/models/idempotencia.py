@@ -0,0 +1,34 @@
+from config import db
+from datetime import datetime
+
+
+# ============================================================
+#                     MODELO CHAVE DE IDEMPOTÊNCIA
+# ============================================================
+
+class ChaveIdempotencia(db.Model):
+    """
+    Resultado de uma requisição enviada com o header Idempotency-Key
+
+    status_http NULL = requisição ainda em andamento.
+    """
+    __tablename__ = 'chaves_idempotencia'
+
+    # sha256 de "MÉTODO rota + usuário do token (vazio sem token) + chave enviada pelo cliente"
+    chave = db.Column(db.String(64), primary_key=True)
+    # sha256 do corpo: a mesma chave com outro corpo é erro do cliente
+    hash_corpo = db.Column(db.String(64), nullable=False)
+
+    status_http = db.Column(db.SmallInteger, nullable=True)
+    corpo = db.Column(db.LargeBinary, nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+
+    @property
+    def concluida(self) -> bool:
+        return self.status_http is not None
+
+    def __repr__(self):
+        return f'<ChaveIdempotencia {self.chave[:12]} {self.status_http or "em andamento"}>'
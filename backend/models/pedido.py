@@ -1,6 +1,29 @@
 from config import db
 from datetime import datetime
 from decimal import Decimal
+from models.item_pedido import ItemPedido
+
+
+# ============================================================
+#                     MÁQUINA DE ESTADOS DO PEDIDO
+# ============================================================
+
+# Status de origem -> status para os quais o pedido pode ir
+TRANSICOES_STATUS = {
+    'Aguardando pagamento': ('Pago', 'Cancelado'),
+    'Pago': ('Em preparo', 'Cancelado', 'Reembolsado'),
+    'Em preparo': ('Pronto', 'Cancelado'),
+    'Pronto': ('Saiu para entrega', 'Entregue'),  # Entregue direto: retirada na loja
+    'Saiu para entrega': ('Entregue',),
+    'Entregue': ('Reembolsado',),
+    'Cancelado': (),
+    'Reembolsado': (),
+}
+
+
+def status_de_origem(novo_status: str) -> tuple:
+    """Status a partir dos quais é permitido ir para `novo_status`"""
+    return tuple(origem for origem, destinos in TRANSICOES_STATUS.items() if novo_status in destinos)
 
 
 # ============================================================
@@ -97,27 +120,14 @@ class Pedido(db.Model):
     
     @staticmethod
     def gerar_numero_pedido():
-        """Gera um número único de pedido no formato LCC-2025-000001"""
-        ano_atual = datetime.now().year
-        
-        # Busca o último pedido do ano
-        ultimo_pedido = Pedido.query.filter(
-            Pedido.numero_pedido.like(f'LCC-{ano_atual}-%')
-        ).order_by(Pedido.id_pedido.desc()).first()
-        
-        if ultimo_pedido:
-            # Extrai o número sequencial do último pedido
-            partes = ultimo_pedido.numero_pedido.split('-')
-            if len(partes) == 3:
-                ultimo_numero = int(partes[2])
-                proximo_numero = ultimo_numero + 1
-            else:
-                proximo_numero = 1
-        else:
-            proximo_numero = 1
-        
-        # Formata com zeros à esquerda (6 dígitos)
-        return f"LCC-{ano_atual}-{proximo_numero:06d}"
+        """
+        Gera um número único de pedido no formato LCC-2025-000001
+
+        Os números vêm de um bloco reservado pelo worker em
+        contadores_pedido: normalmente não há consulta nenhuma aqui.
+        """
+        from helpers.numero_pedido import alocar_numero_pedido
+        return alocar_numero_pedido()
     
     # ============================================================
     #                    PROPRIEDADES CALCULADAS
@@ -126,7 +136,11 @@ class Pedido(db.Model):
     @property
     def pode_ser_cancelado(self) -> bool:
         """Verifica se o pedido pode ser cancelado"""
-        return self.status in ['Aguardando pagamento', 'Pago', 'Em preparo']
+        return self.pode_ir_para('Cancelado')
+    
+    def pode_ir_para(self, novo_status: str) -> bool:
+        """Verifica se a transição para `novo_status` é permitida"""
+        return novo_status in TRANSICOES_STATUS.get(self.status, ())
     
     @property
     def pode_ser_avaliado(self) -> bool:
@@ -157,14 +171,18 @@ class Pedido(db.Model):
         total = subtotal + Decimal(self.taxa_entrega) - Decimal(self.desconto)
         return max(Decimal('0.00'), total)  # Garante que não seja negativo
     
-    def recalcular_valores(self):
-        """Recalcula todos os valores do pedido"""
-        self.subtotal = self.calcular_subtotal()
-        self.valor_total = self.calcular_total()
-        db.session.commit()
+    def definir_valores(self, itens):
+        """
+        Recalcula subtotal e total a partir de itens já em memória
+
+        Não consulta o banco nem faz commit (usado por edições em lote).
+        """
+        self.subtotal = sum((Decimal(item.subtotal) for item in itens), Decimal('0.00'))
+        total = self.subtotal + Decimal(self.taxa_entrega) - Decimal(self.desconto)
+        self.valor_total = max(Decimal('0.00'), total)
     
     def aplicar_desconto(self, valor_desconto: Decimal):
-        """Aplica um desconto ao pedido"""
+        """Aplica um desconto ao pedido (sem commit)"""
         if valor_desconto < 0:
             raise ValueError("Desconto não pode ser negativo")
         
@@ -172,84 +190,36 @@ class Pedido(db.Model):
             raise ValueError("Desconto não pode ser maior que o subtotal")
         
         self.desconto = valor_desconto
-        self.recalcular_valores()
+        self.definir_valores(self.itens.all())
     
     def definir_taxa_entrega(self, taxa: Decimal):
-        """Define a taxa de entrega"""
+        """Define a taxa de entrega (sem commit)"""
         if taxa < 0:
             raise ValueError("Taxa de entrega não pode ser negativa")
         
         self.taxa_entrega = taxa
-        self.recalcular_valores()
+        self.definir_valores(self.itens.all())
     
     # ============================================================
     #                    MÉTODOS DE NEGÓCIO
     # ============================================================
     
-    def adicionar_item(self, produto, quantidade: int, preco_unitario: Decimal = None, observacoes: str = None):
-        """Adiciona um item ao pedido"""
-        if quantidade <= 0:
-            raise ValueError("Quantidade deve ser positiva")
-        
-        # Verifica se o produto existe e está disponível
-        if not produto.verificar_estoque(quantidade):
-            raise ValueError(f"Estoque insuficiente para {produto.nome}")
-        
-        # Usa o preço atual do produto se não for fornecido
-        if preco_unitario is None:
-            preco_unitario = produto.preco_final
-        
-        # Verifica se já existe item deste produto no pedido
-        item_existente = self.itens.filter_by(id_produto=produto.id_produto).first()
-        
-        if item_existente:
-            # Atualiza quantidade do item existente
-            item_existente.quantidade += quantidade
-            item_existente.calcular_subtotal()
-        else:
-            # Cria novo item
-            item = ItemPedido(
-                id_pedido=self.id_pedido,
-                id_produto=produto.id_produto,
-                nome_produto=produto.nome,
-                quantidade=quantidade,
-                preco_unitario=preco_unitario,
-                observacoes=observacoes
-            )
-            item.calcular_subtotal()
-            db.session.add(item)
-        
-        # Recalcula valores do pedido
-        self.recalcular_valores()
-    
-    def remover_item(self, id_item: int):
-        """Remove um item do pedido"""
-        item = ItemPedido.query.filter_by(
-            id_item=id_item, 
-            id_pedido=self.id_pedido
-        ).first()
-        
-        if not item:
-            raise ValueError("Item não encontrado no pedido")
-        
-        db.session.delete(item)
-        self.recalcular_valores()
-    
-    def atualizar_status(self, novo_status: str, observacao: str = None):
-        """Atualiza o status do pedido"""
-        status_validos = [
-            'Aguardando pagamento', 'Pago', 'Em preparo', 'Pronto',
-            'Saiu para entrega', 'Entregue', 'Cancelado', 'Reembolsado'
-        ]
-        
-        if novo_status not in status_validos:
+    def atualizar_status(self, novo_status: str, observacao: str = None, alterado_por: int = None):
+        """Atualiza o status do pedido (só transições de TRANSICOES_STATUS)"""
+        if novo_status not in TRANSICOES_STATUS:
             raise ValueError(f"Status '{novo_status}' inválido")
         
-        self.status = novo_status
+        if not self.pode_ir_para(novo_status):
+            raise ValueError(f"Pedido com status '{self.status}' não pode ir para '{novo_status}'")
         
-        if observacao:
-            obs_atual = self.observacoes or ""
-            self.observacoes = f"{obs_atual}\n{novo_status}: {observacao}".strip()
+        db.session.add(HistoricoStatusPedido(
+            id_pedido=self.id_pedido,
+            status_anterior=self.status,
+            status_novo=novo_status,
+            observacao=observacao,
+            alterado_por=alterado_por
+        ))
+        self.status = novo_status
         
         db.session.commit()
     
@@ -261,17 +231,6 @@ class Pedido(db.Model):
         self.forma_pagamento = forma_pagamento
         self.atualizar_status('Pago', 'Pagamento confirmado')
     
-    def cancelar(self, motivo: str = None):
-        """Cancela o pedido"""
-        if not self.pode_ser_cancelado:
-            raise ValueError(f"Pedido com status '{self.status}' não pode ser cancelado")
-        
-        # Devolve estoque dos produtos
-        for item in self.itens:
-            item.produto.devolver_estoque(item.quantidade)
-        
-        self.atualizar_status('Cancelado', motivo or 'Pedido cancelado')
-    
     def adicionar_avaliacao(self, nota: int, comentario: str = None):
         """Adiciona avaliação ao pedido"""
         if not self.pode_ser_avaliado:
@@ -289,8 +248,20 @@ class Pedido(db.Model):
     #                     SERIALIZAÇÃO
     # ============================================================
     
-    def to_dict(self, include_itens=True, include_usuario=False):
-        """Converte o modelo para dicionário"""
+    def to_dict(self, include_itens=True, include_usuario=False, itens=None, quantidade_itens=None):
+        """
+        Converte o modelo para dicionário
+
+        `itens` e `quantidade_itens` recebem valores já carregados em lote
+        pelas listagens (ver carregar_dados_pedidos no controller); sem
+        eles, os itens são lidos em uma única consulta.
+        """
+        if itens is None and include_itens:
+            itens = self.itens.all()
+
+        if quantidade_itens is None:
+            quantidade_itens = sum(item.quantidade for item in itens) if itens is not None else self.quantidade_itens
+
         data = {
             'id_pedido': self.id_pedido,
             'numero_pedido': self.numero_pedido,
@@ -311,7 +282,7 @@ class Pedido(db.Model):
             'avaliacao': self.avaliacao,
             'comentario_avaliacao': self.comentario_avaliacao,
             'data_avaliacao': self.data_avaliacao.isoformat() if self.data_avaliacao else None,
-            'quantidade_itens': self.quantidade_itens,
+            'quantidade_itens': quantidade_itens,
             'pode_ser_cancelado': self.pode_ser_cancelado,
             'pode_ser_avaliado': self.pode_ser_avaliado,
             'esta_finalizado': self.esta_finalizado
@@ -319,7 +290,7 @@ class Pedido(db.Model):
         
         # Inclui itens se solicitado
         if include_itens:
-            data['itens'] = [item.to_dict() for item in self.itens]
+            data['itens'] = [item.to_dict() for item in itens]
         
         # Inclui dados do usuário se solicitado
         if include_usuario and self.usuario:
@@ -343,73 +314,44 @@ class Pedido(db.Model):
 
 
 # ============================================================
-#                     MODELO ITEM PEDIDO
+#                     CONTADOR DE NÚMEROS DE PEDIDO
 # ============================================================
 
-class ItemPedido(db.Model):
-    __tablename__ = 'itens_pedido'
-    
-    id_item = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    id_pedido = db.Column(db.Integer, db.ForeignKey('pedidos.id_pedido', ondelete='CASCADE'), nullable=False, index=True)
-    id_produto = db.Column(db.Integer, db.ForeignKey('produtos.id_produto', ondelete='RESTRICT'), nullable=False, index=True)
-    
-    # Snapshot do produto no momento da compra
-    nome_produto = db.Column(db.String(100), nullable=False)
-    quantidade = db.Column(db.SmallInteger, nullable=False)
-    preco_unitario = db.Column(db.Numeric(10, 2), nullable=False)
-    subtotal = db.Column(db.Numeric(10, 2), nullable=False)
-    
-    # Personalizações
-    observacoes = db.Column(db.String(255), nullable=True)
-    
-    # ============================================================
-    #                    PROPRIEDADES CALCULADAS
-    # ============================================================
-    
-    def calcular_subtotal(self) -> Decimal:
-        """Calcula o subtotal do item"""
-        self.subtotal = Decimal(self.preco_unitario) * self.quantidade
-        return self.subtotal
-    
-    # ============================================================
-    #                    MÉTODOS DE NEGÓCIO
-    # ============================================================
-    
-    def atualizar_quantidade(self, nova_quantidade: int):
-        """Atualiza a quantidade do item"""
-        if nova_quantidade <= 0:
-            raise ValueError("Quantidade deve ser positiva")
-        
-        # Verifica estoque disponível
-        if not self.produto.verificar_estoque(nova_quantidade):
-            raise ValueError(f"Estoque insuficiente para {self.nome_produto}")
-        
-        self.quantidade = nova_quantidade
-        self.calcular_subtotal()
-        db.session.commit()
-    
-    # ============================================================
-    #                     SERIALIZAÇÃO
-    # ============================================================
-    
-    def to_dict(self, include_produto=False):
-        """Converte o modelo para dicionário"""
-        data = {
-            'id_item': self.id_item,
+class ContadorPedido(db.Model):
+    __tablename__ = 'contadores_pedido'
+
+    ano = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    proximo = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<ContadorPedido {self.ano}: {self.proximo}>'
+
+
+# ============================================================
+#                     HISTÓRICO DE STATUS
+# ============================================================
+
+class HistoricoStatusPedido(db.Model):
+    __tablename__ = 'historico_status_pedido'
+
+    id_historico = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    id_pedido = db.Column(db.Integer, db.ForeignKey('pedidos.id_pedido', ondelete='CASCADE'), nullable=False)
+    status_anterior = db.Column(db.String(50), nullable=True)
+    status_novo = db.Column(db.String(50), nullable=False)
+    observacao = db.Column(db.Text, nullable=True)
+    alterado_por = db.Column(db.Integer, nullable=True)
+    data_alteracao = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id_historico': self.id_historico,
             'id_pedido': self.id_pedido,
-            'id_produto': self.id_produto,
-            'nome_produto': self.nome_produto,
-            'quantidade': self.quantidade,
-            'preco_unitario': float(self.preco_unitario),
-            'subtotal': float(self.subtotal),
-            'observacoes': self.observacoes
+            'status_anterior': self.status_anterior,
+            'status_novo': self.status_novo,
+            'observacao': self.observacao,
+            'alterado_por': self.alterado_por,
+            'data_alteracao': self.data_alteracao.isoformat() if self.data_alteracao else None
         }
-        
-        # Inclui dados completos do produto se solicitado
-        if include_produto and self.produto:
-            data['produto'] = self.produto.to_dict_resumido()
-        
-        return data
-    
+
     def __repr__(self):
-        return f'<ItemPedido {self.nome_produto} x{self.quantidade}>'
\ No newline at end of file
+        return f'<HistoricoStatusPedido {self.id_pedido}: {self.status_anterior} -> {self.status_novo}>'
@@ -0,0 +1,26 @@
+from config import db
+from datetime import datetime
+
+
+# ============================================================
+#                     MODELO TOKEN REVOGADO
+# ============================================================
+
+class TokenRevogado(db.Model):
+    """
+    JWT invalidado antes de expirar (logout), identificado pelo jti
+
+    Depois de expira_em o token já seria recusado pela assinatura: a linha
+    só serve até lá e é apagada por `python manutencao.py tokens`.
+    """
+    __tablename__ = 'tokens_revogados'
+
+    jti = db.Column(db.String(36), primary_key=True)
+    id_usuario = db.Column(db.Integer, nullable=True)
+
+    # Leitura incremental dos workers: "revogados desde a última leitura"
+    revogado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<TokenRevogado {self.jti} usuario={self.id_usuario}>'
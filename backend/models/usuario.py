@@ -1,6 +1,6 @@
 from config import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from helpers.security import hash_password, verify_password, precisa_rehash
 import re
 
 
@@ -21,6 +21,12 @@ class Usuario(db.Model):
     cpf = db.Column(db.String(11), unique=True, nullable=False, index=True)
     telefone = db.Column(db.String(15), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False, index=True)
+    # Coluna gerada pelo MySQL (LOWER(TRIM(email))): busca de login pelo índice
+    email_normalizado = db.Column(
+        db.String(100),
+        db.Computed("LOWER(TRIM(email))", persisted=True),
+        unique=True
+    )
     senha_hash = db.Column(db.String(255), nullable=False)
     
     data_nascimento = db.Column(db.Date, nullable=True)
@@ -107,6 +113,11 @@ class Usuario(db.Model):
         pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         return bool(re.match(pattern, email))
 
+    @staticmethod
+    def normalizar_email(email: str) -> str:
+        """Mesma regra da coluna email_normalizado (usar nas buscas por email)"""
+        return (email or '').strip().lower()
+
     @staticmethod
     def validar_telefone(telefone: str) -> bool:
         """Valida telefone brasileiro (com DDD)"""
@@ -155,49 +166,49 @@ class Usuario(db.Model):
         if len(senha) < 6:
             raise ValueError("Senha deve ter pelo menos 6 caracteres")
         
-        # Gera hash com PBKDF2-SHA256 (padrão do Werkzeug)
-        self.senha_hash = generate_password_hash(senha, method='pbkdf2:sha256')
+        # PBKDF2-SHA256 com o custo de SENHAS_ITERACOES, no pool de senhas
+        self.senha_hash = hash_password(senha)
 
     def check_senha(self, senha: str) -> bool:
         """Verifica se a senha fornecida está correta"""
         if not senha or not self.senha_hash:
             return False
         
-        return check_password_hash(self.senha_hash, senha)
+        return verify_password(self.senha_hash, senha)
+
+    def senha_precisa_rehash(self) -> bool:
+        """True se o hash gravado usa parâmetros mais fracos que os atuais"""
+        return precisa_rehash(self.senha_hash)
 
     # ============================================================
     #                    CONTROLE DE LOGIN
     # ============================================================
 
-    def incrementar_tentativas_login(self):
-        """Incrementa contador de tentativas de login falhadas"""
-        self.tentativas_login += 1
-        
-        # Bloqueia após 5 tentativas
-        if self.tentativas_login >= 5:
-            self.bloqueado_ate = datetime.utcnow() + timedelta(minutes=30)
-        
-        db.session.commit()
+    # Contagem de falhas fica na memória (helpers/limite_login.py); o banco
+    # só recebe o bloqueio, quando o limite é cruzado. Sem commit aqui.
+
+    def bloquear_login(self, tentativas: int, minutos: float):
+        """Marca o bloqueio temporário (persistir com db.session.commit())"""
+        self.tentativas_login = min(tentativas, 255)
+        self.bloqueado_ate = datetime.utcnow() + timedelta(minutes=minutos)
 
-    def resetar_tentativas_login(self):
-        """Reseta contador de tentativas após login bem-sucedido"""
+    def resetar_tentativas_login(self) -> bool:
+        """Limpa um bloqueio anterior; True se algo mudou (e precisa de commit)"""
+        if not self.tentativas_login and not self.bloqueado_ate:
+            return False
         self.tentativas_login = 0
         self.bloqueado_ate = None
-        db.session.commit()
+        return True
+
+    def segundos_bloqueado(self) -> float:
+        """Tempo restante do bloqueio (0 = liberado)"""
+        if not self.bloqueado_ate:
+            return 0.0
+        return max(0.0, (self.bloqueado_ate - datetime.utcnow()).total_seconds())
 
     def esta_bloqueado(self) -> bool:
         """Verifica se o usuário está temporariamente bloqueado"""
-        if not self.bloqueado_ate:
-            return False
-        
-        if datetime.utcnow() > self.bloqueado_ate:
-            # Desbloqueio automático
-            self.bloqueado_ate = None
-            self.tentativas_login = 0
-            db.session.commit()
-            return False
-        
-        return True
+        return self.segundos_bloqueado() > 0
 
     def atualizar_ultimo_acesso(self):
         """Atualiza timestamp do último acesso"""
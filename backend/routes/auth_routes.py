@@ -1,10 +1,24 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
-from controllers.auth_controller import registrar_usuario, autenticar, obter_usuario_por_id
+from controllers.auth_controller import registrar_usuario, autenticar
+from helpers.principal import obter_principal
+from helpers.security import SenhasOcupado
+from helpers.limite_login import LoginBloqueado
+from helpers.revogacao import revogar_token
 from datetime import timedelta
 
 auth_bp = Blueprint("auth_bp", __name__)
 
+
+def _resposta_espera(erro, status: int, codigo: str):
+    """Resposta rápida com Retry-After (pool de senhas cheio ou login bloqueado)"""
+    print(f"⚠️ {erro}")
+    print("="*60 + "\n")
+    resposta = jsonify({"erro": str(erro), "codigo": codigo})
+    resposta.headers["Retry-After"] = str(erro.retry_after)
+    return resposta, status
+
+
 @auth_bp.post("/register")
 def register():
     """
@@ -23,6 +37,7 @@ def register():
         201: Usuário criado com sucesso
         400: Erro de validação
         500: Erro interno
+        503: Servidor ocupado (pool de senhas cheio), com Retry-After
     """
     try:
         print("\n" + "="*60)
@@ -120,6 +135,9 @@ def register():
             "usuario": user.to_dict()
         }), 201
         
+    except SenhasOcupado as e:
+        return _resposta_espera(e, 503, "SERVIDOR_OCUPADO")
+    
     except ValueError as e:
         # Erros de validação do controller
         print(f"❌ Erro de validação: {str(e)}")
@@ -159,7 +177,9 @@ def login():
         400: Dados inválidos
         401: Credenciais incorretas
         403: Usuário inativo
+        429: Tentativas demais (IP ou email), com Retry-After
         500: Erro interno
+        503: Servidor ocupado (pool de senhas cheio), com Retry-After
     """
     try:
         print("\n" + "="*60)
@@ -187,7 +207,7 @@ def login():
         
         # Tentar autenticar
         print(f"🔍 Autenticando usuário...")
-        user = autenticar(email, senha)
+        user = autenticar(email, senha, ip=request.remote_addr)
         
         if not user:
             print(f"❌ Credenciais inválidas para: {email}")
@@ -235,6 +255,12 @@ def login():
         print("="*60 + "\n")
         
         return jsonify(response_data), 200
+    
+    except LoginBloqueado as e:
+        return _resposta_espera(e, 429, "LOGIN_BLOQUEADO")
+    
+    except SenhasOcupado as e:
+        return _resposta_espera(e, 503, "SERVIDOR_OCUPADO")
         
     except Exception as e:
         print(f"\n❌❌❌ ERRO NO LOGIN ❌❌❌")
@@ -276,28 +302,28 @@ def get_current_user():
         user_id = get_jwt_identity()
         print(f"🆔 User ID do token: {user_id}")
         
-        # Buscar usuário no banco
-        print("🔍 Buscando usuário no banco...")
-        user = obter_usuario_por_id(user_id)
+        # Buscar usuário (cache de principais, com TTL curto)
+        principal = obter_principal(user_id)
         
-        if not user:
+        if not principal:
             print(f"❌ Usuário ID {user_id} não encontrado no banco")
             print("="*60 + "\n")
             return jsonify({"erro": "Usuário não encontrado"}), 404
         
-        if not user.ativo:
+        if not principal["ativo"]:
             print(f"⚠️ Usuário ID {user_id} está inativo")
             print("="*60 + "\n")
             return jsonify({"erro": "Usuário inativo"}), 403
         
+        perfil = principal["perfil"]
         print(f"✅ Usuário encontrado:")
-        print(f"   - ID: {user.id_usuario}")
-        print(f"   - Nome: {user.nome}")
-        print(f"   - Email: {user.email}")
-        print(f"   - Tipo: {user.tipo_usuario}")
+        print(f"   - ID: {perfil['id_usuario']}")
+        print(f"   - Nome: {perfil['nome']}")
+        print(f"   - Email: {perfil['email']}")
+        print(f"   - Tipo: {perfil['tipo_usuario']}")
         print("="*60 + "\n")
         
-        return jsonify(user.to_dict()), 200
+        return jsonify(perfil), 200
         
     except Exception as e:
         print(f"\n❌ Erro em /me: {str(e)}")
@@ -369,24 +395,28 @@ def refresh_token():
 @jwt_required()
 def logout():
     """
-    Endpoint para logout (lado servidor apenas registra)
-    O frontend deve limpar o token do localStorage
+    Endpoint para logout: revoga o token usado na requisição (pelo jti)
+    O frontend também deve limpar o token do localStorage
     
     Headers:
         Authorization: Bearer <token>
     
     Returns:
-        200: Logout registrado
+        200: Logout realizado (token revogado)
+        500: Erro ao revogar o token
     """
     try:
         user_id = get_jwt_identity()
-        print(f"\n👋 Logout do usuário ID: {user_id}\n")
+        claims = get_jwt()
+        
+        revogar_token(claims["jti"], claims["exp"], id_usuario=user_id)
+        print(f"\n👋 Logout do usuário ID: {user_id} (token revogado)\n")
         
         return jsonify({"mensagem": "Logout realizado com sucesso"}), 200
     
     except Exception as e:
         print(f"❌ Erro no logout: {str(e)}")
-        return jsonify({"mensagem": "Logout realizado"}), 200
+        return jsonify({"erro": "Erro ao realizar logout", "detalhes": str(e)}), 500
 
 
 @auth_bp.get("/verify")
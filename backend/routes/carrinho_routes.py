@@ -0,0 +1,87 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from helpers.idempotencia import idempotente
+from controllers.pedido_controller import EstoqueInsuficiente
+from controllers.carrinho_controller import (
+    obter_carrinho,
+    definir_itens_carrinho,
+    adicionar_item_carrinho,
+    alterar_quantidade_carrinho,
+    limpar_carrinho,
+    finalizar_carrinho
+)
+
+carrinho_bp = Blueprint("carrinho_bp", __name__)
+
+def _usuario_atual() -> int:
+    return int(get_jwt_identity())
+
+@carrinho_bp.get("/")
+@jwt_required()
+def get_carrinho():
+    """Carrinho do usuário logado, com a cotação (preços e problemas de estoque)"""
+    return jsonify(obter_carrinho(_usuario_atual())), 200
+
+@carrinho_bp.put("/")
+@jwt_required()
+def put_carrinho():
+    """
+    Substitui o carrinho inteiro
+
+    Body: {"itens": [{"id_produto": 3, "quantidade": 2}, ...]}
+    """
+    data = request.get_json() or {}
+    try:
+        return jsonify(definir_itens_carrinho(_usuario_atual(), data.get("itens"))), 200
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+@carrinho_bp.post("/itens")
+@jwt_required()
+def post_item_carrinho():
+    """Body: {"id_produto": 3, "quantidade": 1}"""
+    data = request.get_json() or {}
+    try:
+        carrinho = adicionar_item_carrinho(_usuario_atual(), data.get("id_produto"), data.get("quantidade", 1))
+        return jsonify(carrinho), 200
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+@carrinho_bp.put("/itens/<int:id_produto>")
+@jwt_required()
+def put_item_carrinho(id_produto):
+    """Body: {"quantidade": 2} (0 remove o produto)"""
+    data = request.get_json() or {}
+    try:
+        return jsonify(alterar_quantidade_carrinho(_usuario_atual(), id_produto, data.get("quantidade"))), 200
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+@carrinho_bp.delete("/itens/<int:id_produto>")
+@jwt_required()
+def delete_item_carrinho(id_produto):
+    return jsonify(alterar_quantidade_carrinho(_usuario_atual(), id_produto, 0)), 200
+
+@carrinho_bp.delete("/")
+@jwt_required()
+def delete_carrinho():
+    limpar_carrinho(_usuario_atual())
+    return jsonify({"mensagem": "Carrinho esvaziado"}), 200
+
+@carrinho_bp.post("/checkout")
+@jwt_required()
+@idempotente
+def post_checkout():
+    """Cria o pedido com os itens e preços cotados do carrinho"""
+    try:
+        pedido = finalizar_carrinho(_usuario_atual())
+        return jsonify(pedido.to_dict()), 201
+    except EstoqueInsuficiente as e:
+        return jsonify({
+            "erro": str(e),
+            "codigo": "ESTOQUE_INSUFICIENTE",
+            "id_produto": e.id_produto,
+            "disponivel": e.disponivel
+        }), 409
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
@@ -1,24 +1,52 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from middlewares.auth_middleware import admin_required
-from models.produto import Categoria
+from sqlalchemy import and_, func
+from models.produto import Categoria, Produto
 from config import db
+from helpers.cache_catalogo import cache_catalogo, incrementar_versao_catalogo
+from helpers.busca import obter_motor_busca
 
 categoria_bp = Blueprint("categoria_bp", __name__)
 
 
 @categoria_bp.get("/")
+@cache_catalogo
 def get_categorias():
-    """Lista todas as categorias ativas"""
+    """
+    Lista todas as categorias ativas, na ordem de exibição
+
+    Query string:
+        com_contagem=1 - inclui total_produtos (produtos ativos de cada categoria)
+    """
     try:
-        categorias = Categoria.query.filter_by(ativo=True).all()
-        return jsonify([c.to_dict() for c in categorias]), 200
+        ordem = (Categoria.ordem_exibicao, Categoria.nome)  # idx_ativo_ordem
+
+        if request.args.get("com_contagem") not in ("1", "true", "sim"):
+            categorias = Categoria.query.filter_by(ativo=True).order_by(*ordem).all()
+            return jsonify([c.to_dict() for c in categorias]), 200
+
+        # Uma única consulta agrupada; a junção percorre idx_categoria_ativo
+        total = func.count(Produto.id_produto)
+        linhas = (
+            db.session.query(Categoria, total)
+            .outerjoin(Produto, and_(
+                Produto.id_categoria == Categoria.id_categoria,
+                Produto.ativo.is_(True)
+            ))
+            .filter(Categoria.ativo.is_(True))
+            .group_by(Categoria.id_categoria)
+            .order_by(*ordem)
+            .all()
+        )
+        return jsonify([dict(c.to_dict(), total_produtos=n) for c, n in linhas]), 200
     except Exception as e:
         print(f"Erro ao listar categorias: {str(e)}")
         return jsonify({"erro": "Erro ao listar categorias"}), 500
 
 
 @categoria_bp.get("/<int:id_categoria>")
+@cache_catalogo
 def get_categoria(id_categoria):
     """Busca uma categoria por ID"""
     try:
@@ -60,6 +88,8 @@ def criar_categoria():
         
         db.session.add(categoria)
         db.session.commit()
+        # Categoria não entra no índice de busca: só acompanha a versão
+        obter_motor_busca().avancar(incrementar_versao_catalogo())
         
         return jsonify({
             "mensagem": "Categoria criada com sucesso",
@@ -106,6 +136,8 @@ def atualizar_categoria(id_categoria):
             categoria.ativo = data["ativo"]
         
         db.session.commit()
+        # Categoria não entra no índice de busca: só acompanha a versão
+        obter_motor_busca().avancar(incrementar_versao_catalogo())
         
         return jsonify({
             "mensagem": "Categoria atualizada com sucesso",
@@ -127,8 +159,8 @@ def deletar_categoria(id_categoria):
         if not categoria:
             return jsonify({"erro": "Categoria não encontrada"}), 404
         
-        # Verifica se tem produtos associados
-        if categoria.produtos.count() > 0:
+        # Verifica se tem produtos associados (EXISTS para no primeiro encontrado)
+        if db.session.query(categoria.produtos.exists()).scalar():
             return jsonify({
                 "erro": "Não é possível deletar categoria com produtos associados",
                 "mensagem": "Remova os produtos desta categoria primeiro"
@@ -136,6 +168,8 @@ def deletar_categoria(id_categoria):
         
         db.session.delete(categoria)
         db.session.commit()
+        # Categoria não entra no índice de busca: só acompanha a versão
+        obter_motor_busca().avancar(incrementar_versao_catalogo())
         
         return jsonify({"mensagem": "Categoria removida com sucesso"}), 200
     except Exception as e:
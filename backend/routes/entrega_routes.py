@@ -1,11 +1,12 @@
 from flask import Blueprint, request, jsonify
+from helpers.streaming import resposta_json_em_lotes
 from controllers.entrega_controller import listar_entregas, criar_entrega, atualizar_entrega
 
 entrega_bp = Blueprint("entrega_bp", __name__)
 
 @entrega_bp.get("/")
 def get_entregas():
-    return jsonify(listar_entregas()), 200
+    return resposta_json_em_lotes(listar_entregas())
 
 @entrega_bp.post("/")
 def post_entrega():
@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify, send_file
+from helpers.imagens import caminho_derivado
+
+imagem_bp = Blueprint("imagem_bp", __name__)
+
+# URL endereçada pelo conteúdo: o arquivo nunca muda, pode ficar um ano em cache
+CACHE_IMUTAVEL = 365 * 24 * 3600
+
+
+@imagem_bp.get("/<hash_imagem>/<arquivo>")
+def get_imagem(hash_imagem, arquivo):
+    """
+    Serve um derivado gerado pelo pipeline de imagens
+
+    Em produção, prefira servir UPLOAD_FOLDER/imagens direto pelo nginx
+    com o mesmo Cache-Control.
+    """
+    caminho = caminho_derivado(hash_imagem, arquivo)
+    if not caminho:
+        return jsonify({"erro": "Imagem não encontrada"}), 404
+
+    resposta = send_file(caminho, max_age=CACHE_IMUTAVEL, conditional=True, etag=hash_imagem + arquivo)
+    resposta.headers["Cache-Control"] = f"public, max-age={CACHE_IMUTAVEL}, immutable"
+    return resposta
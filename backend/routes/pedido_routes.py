@@ -1,24 +1,175 @@
 from flask import Blueprint, request, jsonify
-from controllers.pedido_controller import criar_pedido, listar_pedidos, buscar_pedido
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from middlewares.auth_middleware import admin_required
+from config import db
+from helpers.idempotencia import idempotente
+from controllers.pedido_controller import (
+    criar_pedido,
+    listar_pedidos,
+    buscar_pedido,
+    detalhar_pedido,
+    editar_itens_pedido,
+    atualizar_status_pedidos,
+    EstoqueInsuficiente
+)
 
 pedido_bp = Blueprint("pedido_bp", __name__)
 
 @pedido_bp.post("/")
+@jwt_required(optional=True)
+@idempotente
 def post_pedido():
+    """
+    Cria um pedido (body: id_usuario, itens)
+
+    O token é opcional; quando vem, a Idempotency-Key passa a ser por usuário.
+    """
     data = request.get_json() or {}
     try:
         p = criar_pedido(data)
         return jsonify(p.to_dict()), 201
-    except Exception as e:
+    except EstoqueInsuficiente as e:
+        return jsonify({
+            "erro": str(e),
+            "codigo": "ESTOQUE_INSUFICIENTE",
+            "id_produto": e.id_produto,
+            "disponivel": e.disponivel
+        }), 409
+    except ValueError as e:
         return jsonify({"erro": str(e)}), 400
+    except Exception as e:
+        # Falha do servidor (banco fora, deadlock...), não do pedido: 5xx
+        # também libera a Idempotency-Key para a repetição executar de novo
+        db.session.rollback()
+        print(f"❌ Erro ao criar pedido: {type(e).__name__}: {e}")
+        return jsonify({
+            "erro": "Erro interno ao criar o pedido",
+            "mensagem": "Tente novamente em instantes",
+            "codigo": "INTERNAL_ERROR"
+        }), 500
+
+def _pagina_pedidos(pedidos, proximo_cursor):
+    response = jsonify(pedidos)
+    if proximo_cursor:
+        response.headers["X-Proximo-Cursor"] = proximo_cursor
+    return response, 200
 
 @pedido_bp.get("/")
+@admin_required()
 def get_pedidos():
-    return jsonify(listar_pedidos()), 200
+    """
+    Lista todos os pedidos em páginas - APENAS ADMIN
+
+    Query string:
+        status, id_usuario, itens (0 para omitir os itens),
+        limite (padrão 20, máx. 100), cursor
+
+    O corpo é uma lista; o cursor da próxima página vem no header
+    X-Proximo-Cursor (ausente na última página).
+    """
+    try:
+        pedidos, proximo_cursor = listar_pedidos(request.args, include_usuario=True)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    return _pagina_pedidos(pedidos, proximo_cursor)
+
+@pedido_bp.get("/meus-pedidos")
+@jwt_required()
+def get_meus_pedidos():
+    """
+    Histórico de pedidos do usuário logado, em páginas
+
+    Query string: status, itens, limite, cursor (como em GET /api/pedidos)
+    """
+    try:
+        pedidos, proximo_cursor = listar_pedidos(request.args, id_usuario=int(get_jwt_identity()))
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    return _pagina_pedidos(pedidos, proximo_cursor)
 
 @pedido_bp.get("/<int:id_pedido>")
 def get_pedido(id_pedido):
-    pedido = buscar_pedido(id_pedido)
+    pedido = detalhar_pedido(id_pedido)
+    if not pedido:
+        return jsonify({"erro": "Pedido não encontrado"}), 404
+    return jsonify(pedido), 200
+
+@pedido_bp.patch("/<int:id_pedido>/itens")
+@jwt_required()
+def patch_itens_pedido(id_pedido):
+    """
+    Edita vários itens do pedido de uma vez (um único commit)
+
+    Body:
+        {"operacoes": [
+            {"op": "adicionar", "id_produto": 3, "quantidade": 2},
+            {"op": "quantidade", "id_item": 10, "quantidade": 1},
+            {"op": "remover", "id_item": 11}
+        ]}
+
+    O cliente só edita os próprios pedidos; o admin edita qualquer um.
+    """
+    data = request.get_json() or {}
+    dono = None if get_jwt().get("tipo_usuario") == "admin" else int(get_jwt_identity())
+
+    try:
+        pedido = editar_itens_pedido(id_pedido, data.get("operacoes"), id_usuario=dono)
+    except EstoqueInsuficiente as e:
+        return jsonify({
+            "erro": str(e),
+            "codigo": "ESTOQUE_INSUFICIENTE",
+            "id_produto": e.id_produto,
+            "disponivel": e.disponivel
+        }), 409
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
     if not pedido:
         return jsonify({"erro": "Pedido não encontrado"}), 404
-    return jsonify(pedido.to_dict()), 200
\ No newline at end of file
+    return jsonify(pedido.to_dict()), 200
+
+@pedido_bp.put("/<int:id_pedido>/status")
+@admin_required()
+def put_status_pedido(id_pedido):
+    """
+    Muda o status de um pedido - APENAS ADMIN
+
+    Body: {"status": "Em preparo", "observacao": "..."}
+
+    Transições fora de TRANSICOES_STATUS (models/pedido.py) retornam 409.
+    """
+    data = request.get_json() or {}
+    try:
+        resultado = atualizar_status_pedidos(
+            [id_pedido], data.get("status"), data.get("observacao"), int(get_jwt_identity())
+        )
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    if resultado["rejeitados"]:
+        rejeitado = resultado["rejeitados"][0]
+        if rejeitado["status"] is None:
+            return jsonify({"erro": rejeitado["erro"]}), 404
+        return jsonify({"erro": rejeitado["erro"], "codigo": "TRANSICAO_INVALIDA"}), 409
+
+    return jsonify(buscar_pedido(id_pedido).to_dict()), 200
+
+@pedido_bp.put("/status")
+@admin_required()
+def put_status_pedidos():
+    """
+    Muda o status de vários pedidos em uma única operação - APENAS ADMIN
+
+    Body: {"ids": [10, 11, 12], "status": "Pronto", "observacao": "..."}
+
+    Retorna {"atualizados": [...], "rejeitados": [{id_pedido, status, erro}]};
+    os pedidos com transição inválida não impedem os demais.
+    """
+    data = request.get_json() or {}
+    try:
+        resultado = atualizar_status_pedidos(
+            data.get("ids"), data.get("status"), data.get("observacao"), int(get_jwt_identity())
+        )
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    return jsonify(resultado), 200
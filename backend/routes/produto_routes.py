@@ -1,24 +1,139 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from middlewares.auth_middleware import admin_required
+from helpers.cache_catalogo import cache_catalogo
+from helpers.visualizacoes import registrar_visualizacao
+from helpers.imagens import ImagemRecusada, ImagensIndisponivel
 from controllers.produto_controller import (
     listar_produtos,
+    buscar_produtos,
+    listar_destaques,
+    listar_mais_vendidos,
     buscar_produto,
     criar_produto,
     atualizar_produto,
+    atualizar_produtos_em_lote,
+    definir_imagem_principal,
+    adicionar_imagem_galeria,
     remover_produto
 )
+from controllers.importacao_controller import importar_produtos, exportar_produtos, detectar_formato
 
 produto_bp = Blueprint("produto_bp", __name__)
 
 @produto_bp.get("/")
+@cache_catalogo
 def get_produtos():
-    return jsonify(listar_produtos()), 200
+    """
+    Lista produtos ativos em páginas
+
+    Query string:
+        categoria, preco_min, preco_max, destaque,
+        ordenacao (recentes | preco_asc | preco_desc | mais_vendidos | avaliacao),
+        limite (padrão 20, máx. 100), cursor
+
+    O corpo continua sendo uma lista; o cursor da próxima página vem no
+    header X-Proximo-Cursor (ausente na última página).
+    """
+    try:
+        produtos, proximo_cursor = listar_produtos(request.args)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    response = jsonify(produtos)
+    if proximo_cursor:
+        response.headers["X-Proximo-Cursor"] = proximo_cursor
+    return response, 200
+
+@produto_bp.get("/busca")
+@cache_catalogo
+def get_busca_produtos():
+    """
+    Busca produtos por relevância
+
+    Query string:
+        q (obrigatório), limite (padrão 20, máx. 100)
+    """
+    try:
+        produtos = buscar_produtos(request.args.get("q"), request.args.get("limite"))
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    return jsonify(produtos), 200
+
+@produto_bp.get("/destaques")
+def get_destaques():
+    """
+    Carrossel de destaques da home (query string: limite, máx. 20)
+
+    Sem @cache_catalogo: a ordem muda a cada venda, que nem sempre muda a
+    versão do catálogo. A leitura já vem da vitrine em memória (O(k)).
+    """
+    try:
+        return jsonify(listar_destaques(request.args.get("limite"))), 200
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+@produto_bp.get("/mais-vendidos")
+def get_mais_vendidos():
+    """Carrossel de mais vendidos da home (query string: limite, padrão 10, máx. 20; sem cache, como /destaques)"""
+    try:
+        return jsonify(listar_mais_vendidos(request.args.get("limite"))), 200
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+@produto_bp.post("/importar")
+@admin_required()
+def post_importar_produtos():
+    """
+    Importa produtos em lote (upsert pelo SKU)
+
+    Aceita o arquivo como multipart (campo "arquivo") ou no corpo da
+    requisição (Content-Type text/csv ou application/x-ndjson).
+    Query string: formato (csv | ndjson), quando não der para deduzir.
+    """
+    arquivo = request.files.get("arquivo")
+    try:
+        if arquivo:
+            formato = detectar_formato(request.args.get("formato"), arquivo.filename, arquivo.mimetype)
+            relatorio = importar_produtos(arquivo.stream, formato)
+        else:
+            formato = detectar_formato(request.args.get("formato"), mimetype=request.mimetype)
+            relatorio = importar_produtos(request.stream, formato)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    return jsonify(relatorio), 200
+
+@produto_bp.get("/exportar")
+@admin_required()
+def get_exportar_produtos():
+    """Exporta o catálogo completo em streaming (query string: formato=csv | ndjson)"""
+    try:
+        formato = detectar_formato(request.args.get("formato") or "csv")
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    mimetype = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(exportar_produtos(formato)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=produtos.{formato}"}
+    )
 
 @produto_bp.get("/<int:id_produto>")
 def get_produto(id_produto):
+    resposta = _detalhe_produto(id_produto)
+    # Respostas em cache e 304 também são visualizações; 404 não (o ID
+    # não existe e só ocuparia o buffer)
+    if resposta.status_code in (200, 304):
+        registrar_visualizacao(id_produto)
+    return resposta
+
+@cache_catalogo
+def _detalhe_produto(id_produto):
     produto = buscar_produto(id_produto)
     if not produto:
         return jsonify({"erro": "Produto não encontrado"}), 404
-    return jsonify(produto.to_dict()), 200
+    return jsonify(produto.to_dict(include_galeria=True)), 200
 
 @produto_bp.post("/")
 def post_produto():
@@ -29,6 +144,22 @@ def post_produto():
     except Exception as e:
         return jsonify({"erro": str(e)}), 400
 
+@produto_bp.patch("/lote")
+@admin_required()
+def patch_produtos_lote():
+    """
+    Atualiza preço, promoção, estoque e ativo de vários produtos de uma vez
+
+    Body: {"itens": [{"id_produto": 1, "preco": 9.9, "ajuste_estoque": 50}, ...]}
+    Tudo ou nada: se algum item for inválido, nenhum é alterado.
+    Resposta: só os campos que mudaram, como [antes, depois].
+    """
+    data = request.get_json() or {}
+    try:
+        return jsonify(atualizar_produtos_em_lote(data.get("itens"))), 200
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
 @produto_bp.put("/<int:id_produto>")
 def put_produto(id_produto):
     data = request.get_json() or {}
@@ -37,6 +168,53 @@ def put_produto(id_produto):
         return jsonify({"erro": "Produto não encontrado"}), 404
     return jsonify(produto.to_dict()), 200
 
+def _imagens_indisponivel(erro):
+    resposta = jsonify({"erro": str(erro), "codigo": "IMAGENS_INDISPONIVEL"})
+    resposta.headers["Retry-After"] = str(erro.retry_after)
+    return resposta, 503
+
+@produto_bp.post("/<int:id_produto>/imagem")
+@admin_required()
+def post_imagem_produto(id_produto):
+    """Envia a imagem principal (multipart, campo "imagem"); gera os derivados"""
+    arquivo = request.files.get("imagem")
+    if not arquivo:
+        return jsonify({"erro": "Envie o arquivo no campo 'imagem'"}), 400
+
+    try:
+        produto = definir_imagem_principal(id_produto, arquivo.read())
+    except ImagemRecusada as e:
+        return jsonify({"erro": str(e), "codigo": "IMAGEM_RECUSADA"}), 422
+    except ImagensIndisponivel as e:
+        return _imagens_indisponivel(e)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    if not produto:
+        return jsonify({"erro": "Produto não encontrado"}), 404
+    return jsonify(produto.to_dict()), 200
+
+@produto_bp.post("/<int:id_produto>/galeria")
+@admin_required()
+def post_galeria_produto(id_produto):
+    """Adiciona uma imagem à galeria (multipart, campos "imagem" e "descricao")"""
+    arquivo = request.files.get("imagem")
+    if not arquivo:
+        return jsonify({"erro": "Envie o arquivo no campo 'imagem'"}), 400
+
+    try:
+        imagem = adicionar_imagem_galeria(id_produto, arquivo.read(), request.form.get("descricao"))
+    except ImagemRecusada as e:
+        return jsonify({"erro": str(e), "codigo": "IMAGEM_RECUSADA"}), 422
+    except ImagensIndisponivel as e:
+        return _imagens_indisponivel(e)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    if not imagem:
+        return jsonify({"erro": "Produto não encontrado"}), 404
+    return jsonify(imagem.to_dict()), 201
+
 @produto_bp.delete("/<int:id_produto>")
 def delete_produto(id_produto):
     ok = remover_produto(id_produto)
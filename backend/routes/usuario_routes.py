@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
+from helpers.streaming import resposta_json_em_lotes
 from controllers.usuario_controller import *
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from middlewares.auth_middleware import admin_required
+from helpers.principal import obter_principal
 
 usuario_bp = Blueprint("usuario_bp", __name__)
 
@@ -9,17 +11,16 @@ usuario_bp = Blueprint("usuario_bp", __name__)
 @admin_required()
 def listar():
     """Lista todos os usuários - APENAS ADMIN"""
-    return jsonify(listar_usuarios())
+    return resposta_json_em_lotes(listar_usuarios())
 
 @usuario_bp.get("/me")
 @jwt_required()
 def meu_perfil():
     """Retorna o perfil do usuário logado"""
-    user_id = get_jwt_identity()
-    u = buscar_usuario(user_id)
-    if not u:
+    principal = obter_principal(get_jwt_identity())
+    if not principal:
         return jsonify({"erro": "Usuário não encontrado"}), 404
-    return jsonify(u.to_dict())
+    return jsonify(principal["perfil"])
 
 @usuario_bp.get("/<int:id_usuario>")
 @jwt_required()
@@ -0,0 +1,133 @@
+"""
+Teste de estresse da baixa de estoque
+Dispara centenas de pedidos simultâneos para o mesmo produto e confere
+que o estoque final bate (sem venda acima do estoque, sem baixa dupla)
+
+Roda contra o banco configurado no .env: cria um produto temporário,
+faz os pedidos e remove tudo no final.
+
+USO:
+    python stress_estoque.py                    # 300 pedidos, estoque 50
+    python stress_estoque.py 500 120            # 500 pedidos, estoque 120
+    python stress_estoque.py 500 120 2          # ... com 2 unidades por pedido
+"""
+import sys
+import threading
+import time
+from config import create_app, db
+from models.usuario import Usuario
+from models.produto import Produto
+from models.pedido import Pedido
+from controllers.pedido_controller import criar_pedido, EstoqueInsuficiente
+
+
+def executar(total_pedidos=300, estoque_inicial=50, quantidade=1):
+    app = create_app()
+
+    with app.app_context():
+        usuario = Usuario.query.filter_by(ativo=True).first()
+        if not usuario:
+            print("\n❌ Nenhum usuário ativo no banco para fazer os pedidos!\n")
+            return False
+
+        produto = Produto(
+            sku=f"STRESS-{int(time.time() * 1000)}",
+            nome="Produto de teste de estresse",
+            slug=f"stress-{int(time.time() * 1000)}",
+            preco=1,
+            quantidade_estoque=estoque_inicial,
+            ativo=True
+        )
+        db.session.add(produto)
+        db.session.commit()
+        id_usuario, id_produto = usuario.id_usuario, produto.id_produto
+
+    largada = threading.Barrier(total_pedidos)
+    lock = threading.Lock()
+    resultado = {"sucesso": 0, "sem_estoque": 0, "erro": 0}
+    pedidos = []
+    erros = []
+
+    def comprar():
+        with app.app_context():
+            largada.wait()
+            try:
+                pedido = criar_pedido({
+                    "id_usuario": id_usuario,
+                    "itens": [{"id_produto": id_produto, "quantidade": quantidade}]
+                })
+                # Lido fora do lock: depois do commit, acessar o atributo consulta o banco
+                id_pedido = pedido.id_pedido
+                with lock:
+                    resultado["sucesso"] += 1
+                    pedidos.append(id_pedido)
+            except EstoqueInsuficiente:
+                with lock:
+                    resultado["sem_estoque"] += 1
+            except Exception as e:
+                db.session.rollback()
+                with lock:
+                    resultado["erro"] += 1
+                    erros.append(f"{type(e).__name__}: {e}")
+            finally:
+                # Devolve a conexão ao pool (são mais threads que conexões)
+                db.session.remove()
+
+    print("\n" + "="*80)
+    print(f"🔥 {total_pedidos} PEDIDOS SIMULTÂNEOS | estoque {estoque_inicial} | {quantidade} un. por pedido")
+    print("="*80)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=comprar) for _ in range(total_pedidos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    with app.app_context():
+        try:
+            produto = db.session.get(Produto, id_produto)
+            esperados = min(total_pedidos, estoque_inicial // quantidade)
+
+            verificacoes = [
+                ("Pedidos aceitos", resultado["sucesso"], esperados),
+                ("Estoque final", produto.quantidade_estoque, estoque_inicial - resultado["sucesso"] * quantidade),
+                ("Quantidade vendida", produto.quantidade_vendida, resultado["sucesso"] * quantidade),
+                ("Erros inesperados", resultado["erro"], 0),
+            ]
+
+            print(f"\n⏱️  {duracao:.2f}s ({total_pedidos / duracao:.0f} pedidos/s)")
+            print(f"✅ Aceitos: {resultado['sucesso']}")
+            print(f"🚫 Sem estoque: {resultado['sem_estoque']}")
+            print(f"💥 Erros: {resultado['erro']}")
+            for erro in erros[:10]:
+                print(f"   {erro}")
+
+            ok = True
+            print()
+            for nome, obtido, esperado in verificacoes:
+                status = "✅" if obtido == esperado else "❌"
+                ok = ok and obtido == esperado
+                print(f"{status} {nome}: {obtido} (esperado {esperado})")
+
+            print("\n" + "="*80)
+            print("✨ ESTOQUE CONSISTENTE" if ok else "💥 ESTOQUE INCONSISTENTE")
+            print("="*80 + "\n")
+            return ok
+
+        finally:
+            # Remove os dados de teste (os itens vão junto com os pedidos)
+            if pedidos:
+                Pedido.query.filter(Pedido.id_pedido.in_(pedidos)).delete(synchronize_session=False)
+            Produto.query.filter_by(id_produto=id_produto).delete(synchronize_session=False)
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ["-h", "--help", "help"]:
+        print(__doc__)
+        sys.exit(0)
+
+    argumentos = [int(a) for a in sys.argv[1:4]]
+    sys.exit(0 if executar(*argumentos) else 1)
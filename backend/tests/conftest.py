@@ -0,0 +1,84 @@
+"""
+Fixtures dos testes - Leon's Cupcake
+
+Os testes rodam contra um SQLite temporário (DATABASE_URL), criado com
+db.create_all() a partir dos modelos. O que depende de recursos só do
+MySQL (FULLTEXT, procedures) fica de fora.
+"""
+import os
+import sys
+import tempfile
+
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PASTA_BACKEND)
+
+_pasta_temporaria = tempfile.mkdtemp(prefix="leons_cupcake_testes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_pasta_temporaria, 'testes.sqlite3')}"
+os.environ["CATALOGO_VERSAO_ARQUIVO"] = os.path.join(_pasta_temporaria, "versao_catalogo")
+
+import pytest
+
+from config import create_app, db
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+    yield app
+
+
+@pytest.fixture
+def sessao(app):
+    """App context com as tabelas vazias ao final de cada teste"""
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        for tabela in reversed(db.metadata.sorted_tables):
+            db.session.execute(tabela.delete())
+        db.session.commit()
+
+
+@pytest.fixture
+def usuario(sessao):
+    from models.usuario import Usuario
+
+    user = Usuario(
+        nome="Cliente Teste",
+        email="cliente@teste.com",
+        cpf="52998224725",
+        telefone="11987654321",
+        senha_hash="pbkdf2:sha256:600000$sal$hash"
+    )
+    sessao.add(user)
+    sessao.commit()
+    return user
+
+
+@pytest.fixture
+def criar_produto(sessao):
+    """Fábrica: criar_produto(preco, estoque=100, **campos) -> Produto"""
+    from decimal import Decimal
+    from models.produto import Produto
+
+    contador = iter(range(1, 10_000))
+
+    def criar(preco, estoque=100, **campos):
+        n = next(contador)
+        dados = dict(
+            sku=f"TESTE-{n}",
+            nome=f"Produto {n}",
+            slug=f"produto-{n}",
+            preco=Decimal(str(preco)),
+            quantidade_estoque=estoque,
+            ativo=True
+        )
+        dados.update(campos)
+        produto = Produto(**dados)
+        sessao.add(produto)
+        sessao.commit()
+        return produto
+
+    return criar
@@ -0,0 +1,42 @@
+from config import db
+from helpers.busca import MotorBuscaMemoria
+from helpers.cache_catalogo import incrementar_versao_catalogo
+from models.produto import Produto
+
+
+def test_indice_recarrega_quando_outro_worker_muda_o_catalogo(criar_produto):
+    bolo = criar_produto(10, nome="Bolo de cenoura")
+    motor = MotorBuscaMemoria()
+    assert motor.buscar("cenoura") == [bolo.id_produto]
+
+    # Alteração feita por outro worker: só o banco e a versão mudam
+    db.session.get(Produto, bolo.id_produto).nome = "Bolo de chocolate"
+    db.session.commit()
+    assert motor.buscar("chocolate") == []
+
+    incrementar_versao_catalogo()
+    assert motor.buscar("chocolate") == [bolo.id_produto]
+    assert motor.buscar("cenoura") == []
+
+
+def test_escritas_deste_worker_nao_recarregam_o_indice(sessao, monkeypatch):
+    from controllers import produto_controller
+    from helpers.busca import obter_motor_busca
+
+    motor = obter_motor_busca()
+    motor.recarregar()
+    cargas = []
+    carregar = motor._carregar
+    monkeypatch.setattr(motor, "_carregar", lambda: (cargas.append(1), carregar()))
+
+    assert motor.buscar("brigadeiro") == []
+    produto = produto_controller.criar_produto({"nome": "Brigadeiro gourmet", "sku": "BRG-1", "preco": 5})
+    produto_controller.atualizar_produto(produto.id_produto, {"nome": "Brigadeiro de pistache"})
+    assert motor.buscar("pistache") == [produto.id_produto]
+
+    produto_controller.atualizar_produtos_em_lote([{"id_produto": produto.id_produto, "ativo": False}])
+    assert motor.buscar("pistache") == []
+
+    produto_controller.remover_produto(produto.id_produto)
+    assert motor.buscar("brigadeiro") == []
+    assert len(cargas) == 1
@@ -0,0 +1,90 @@
+import os
+
+from helpers.cache_catalogo import VersaoCatalogo, versao_catalogo
+
+
+def _pedir(usuario, produto, quantidade):
+    from controllers.pedido_controller import criar_pedido
+    from helpers.tarefas import _executor
+
+    criar_pedido({
+        "id_usuario": usuario.id_usuario,
+        "itens": [{"id_produto": produto.id_produto, "quantidade": quantidade}]
+    })
+    _executor._fila.join()  # tarefas pós-commit rodam em outra thread
+
+
+def test_arquivo_recriado_ganha_outra_epoca(tmp_path):
+    caminho = str(tmp_path / "versao")
+    antes = VersaoCatalogo(caminho)
+    antes.incrementar()
+    epoca, versao = antes.ler()
+    assert versao == 1
+
+    os.remove(caminho)
+    depois = VersaoCatalogo(caminho)
+    depois.incrementar()
+
+    assert depois.ler()[1] == 1
+    assert depois.ler()[0] != epoca
+
+
+def test_venda_so_muda_a_versao_quando_o_produto_esgota(usuario, criar_produto):
+    bolo = criar_produto(10, estoque=3)
+    inicial = versao_catalogo()
+
+    _pedir(usuario, bolo, 2)
+    assert versao_catalogo() == inicial
+
+    _pedir(usuario, bolo, 1)
+    assert versao_catalogo() == inicial + 1
+
+
+def test_mais_vendidos_acompanha_vendas_sem_mudanca_de_versao(app, usuario, criar_produto):
+    bolo, torta = criar_produto(10, estoque=50), criar_produto(10, estoque=50)
+    client = app.test_client()
+
+    _pedir(usuario, torta, 1)
+    assert [p["id_produto"] for p in client.get("/api/produtos/mais-vendidos").get_json()][:2] == \
+        [torta.id_produto, bolo.id_produto]
+
+    _pedir(usuario, bolo, 3)
+    resposta = client.get("/api/produtos/mais-vendidos").get_json()
+    assert [p["id_produto"] for p in resposta][:2] == [bolo.id_produto, torta.id_produto]
+    assert resposta[0]["quantidade_vendida"] == 3
+
+
+def test_mais_vendidos_ve_vendas_de_outro_worker(app, usuario, criar_produto, monkeypatch):
+    from config import db
+    from helpers import vitrine
+    from helpers.cache_catalogo import incrementar_versao_catalogo, incrementar_versao_vendas
+    from models.produto import Produto
+
+    bolo, torta = criar_produto(10, estoque=50), criar_produto(10, estoque=50)
+    incrementar_versao_catalogo()  # criados direto no banco: descarta a vitrine do teste anterior
+    client = app.test_client()
+    _pedir(usuario, torta, 1)
+    client.get("/api/produtos/mais-vendidos")
+
+    recargas = []
+    original = vitrine.Vitrine._recarregar
+    monkeypatch.setattr(vitrine.Vitrine, "_recarregar", lambda self: recargas.append(1) or original(self))
+
+    # Venda feita aqui: aplicada na cópia, sem recarga
+    _pedir(usuario, torta, 1)
+    client.get("/api/produtos/mais-vendidos")
+    assert recargas == []
+
+    # Venda de outro worker: só o banco e o contador mudam
+    db.session.get(Produto, bolo.id_produto).quantidade_vendida = 5
+    db.session.commit()
+    incrementar_versao_vendas()
+
+    monkeypatch.setattr(vitrine, "RECARGA_VENDAS_SEGUNDOS", 3600)
+    assert client.get("/api/produtos/mais-vendidos").get_json()[0]["id_produto"] == torta.id_produto
+
+    monkeypatch.setattr(vitrine, "RECARGA_VENDAS_SEGUNDOS", 0)
+    resposta = client.get("/api/produtos/mais-vendidos").get_json()
+    assert resposta[0]["id_produto"] == bolo.id_produto
+    assert resposta[0]["quantidade_vendida"] == 5
+    assert recargas == [1]
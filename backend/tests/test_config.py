@@ -0,0 +1,21 @@
+from flask import request
+
+from config import create_app
+
+
+def _ip_visto(monkeypatch, saltos: str) -> str:
+    monkeypatch.setenv("PROXY_SALTOS", saltos)
+    app = create_app()
+    app.add_url_rule("/teste-ip", "teste_ip", lambda: request.remote_addr)
+
+    resposta = app.test_client().get(
+        "/teste-ip",
+        headers={"X-Forwarded-For": "203.0.113.7"},
+        environ_base={"REMOTE_ADDR": "10.0.0.2"}
+    )
+    return resposta.get_data(as_text=True)
+
+
+def test_x_forwarded_for_so_vale_com_proxy_configurado(monkeypatch):
+    assert _ip_visto(monkeypatch, "0") == "10.0.0.2"
+    assert _ip_visto(monkeypatch, "1") == "203.0.113.7"
@@ -0,0 +1,95 @@
+from config import db
+from models.pedido import Pedido
+from models.produto import Produto
+
+
+def _post(client, corpo, chave):
+    return client.post("/api/pedidos/", json=corpo, headers={"Idempotency-Key": chave})
+
+
+def test_repeticao_devolve_a_resposta_guardada(app, usuario, criar_produto):
+    bolo = criar_produto(10, estoque=5)
+    corpo = {"id_usuario": usuario.id_usuario, "itens": [{"id_produto": bolo.id_produto, "quantidade": 1}]}
+    client = app.test_client()
+
+    primeira = _post(client, corpo, "chave-1")
+    repetida = _post(client, corpo, "chave-1")
+
+    assert primeira.status_code == 201
+    assert repetida.status_code == 201
+    assert repetida.headers.get("Idempotent-Replayed") == "true"
+    assert repetida.get_json()["id_pedido"] == primeira.get_json()["id_pedido"]
+    assert Pedido.query.count() == 1
+    db.session.expire_all()
+    assert db.session.get(Produto, bolo.id_produto).quantidade_estoque == 4
+
+
+def test_mesma_chave_com_outro_corpo_e_recusada(app, usuario, criar_produto):
+    bolo = criar_produto(10, estoque=5)
+    client = app.test_client()
+    item = {"id_produto": bolo.id_produto, "quantidade": 1}
+
+    assert _post(client, {"id_usuario": usuario.id_usuario, "itens": [item]}, "chave-2").status_code == 201
+    outra = _post(client, {"id_usuario": usuario.id_usuario, "itens": [dict(item, quantidade=2)]}, "chave-2")
+
+    assert outra.status_code == 422
+    assert outra.get_json()["codigo"] == "IDEMPOTENCY_KEY_REUTILIZADA"
+    assert Pedido.query.count() == 1
+
+
+def test_erro_do_servidor_e_500_e_libera_a_chave(app, usuario, criar_produto, monkeypatch):
+    import routes.pedido_routes as pedido_routes
+
+    bolo = criar_produto(10, estoque=5)
+    corpo = {"id_usuario": usuario.id_usuario, "itens": [{"id_produto": bolo.id_produto, "quantidade": 1}]}
+    client = app.test_client()
+
+    def banco_fora(payload):
+        raise RuntimeError("conexão perdida")
+
+    monkeypatch.setattr(pedido_routes, "criar_pedido", banco_fora)
+    assert _post(client, corpo, "chave-3").status_code == 500
+
+    monkeypatch.undo()
+    repetida = _post(client, corpo, "chave-3")
+    assert repetida.status_code == 201
+    assert "Idempotent-Replayed" not in repetida.headers
+
+
+def test_resposta_gravada_no_commit_do_pedido(app, usuario, criar_produto, monkeypatch):
+    import helpers.idempotencia as idempotencia
+
+    bolo = criar_produto(10, estoque=5)
+    corpo = {"id_usuario": usuario.id_usuario, "itens": [{"id_produto": bolo.id_produto, "quantidade": 1}]}
+    client = app.test_client()
+
+    # Worker morto entre o commit do pedido e o _concluir
+    monkeypatch.setattr(idempotencia, "_concluir", lambda chave, resposta: None)
+    primeira = _post(client, corpo, "chave-4")
+    monkeypatch.undo()
+
+    repetida = _post(client, corpo, "chave-4")
+    assert repetida.headers.get("Idempotent-Replayed") == "true"
+    assert repetida.status_code == 201
+    assert repetida.get_json()["id_pedido"] == primeira.get_json()["id_pedido"]
+    assert Pedido.query.count() == 1
+
+
+def test_chave_e_por_usuario_do_token(app, usuario, criar_produto):
+    from flask_jwt_extended import create_access_token
+
+    bolo = criar_produto(10, estoque=5)
+    corpo = {"id_usuario": usuario.id_usuario, "itens": [{"id_produto": bolo.id_produto, "quantidade": 1}]}
+    client = app.test_client()
+
+    respostas = []
+    for identidade in (str(usuario.id_usuario), "outro"):
+        with app.app_context():
+            token = create_access_token(identity=identidade)
+        respostas.append(client.post("/api/pedidos/", json=corpo, headers={
+            "Idempotency-Key": "chave-5", "Authorization": f"Bearer {token}"
+        }))
+
+    assert [r.status_code for r in respostas] == [201, 201]
+    assert "Idempotent-Replayed" not in respostas[1].headers
+    assert Pedido.query.count() == 2
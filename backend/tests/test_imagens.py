@@ -0,0 +1,70 @@
+import io
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+
+from helpers import imagens
+from helpers.imagens import ImagemRecusada, ImagensIndisponivel
+
+
+def _png(largura: int, altura: int, modo: str = "RGB") -> bytes:
+    saida = io.BytesIO()
+    Image.new(modo, (largura, altura)).save(saida, format="PNG")
+    return saida.getvalue()
+
+
+class _PoolFalso:
+    """Devolve sempre o mesmo futuro (pronto com erro ou nunca concluído)"""
+
+    def __init__(self, erro=None):
+        self.erro = erro
+        self.desligado = False
+
+    def submit(self, fn, *args):
+        futuro = Future()
+        if self.erro is not None:
+            futuro.set_exception(self.erro)
+        return futuro
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.desligado = True
+
+
+@pytest.fixture
+def pasta_imagens(tmp_path, monkeypatch):
+    monkeypatch.setattr(imagens, "PASTA_IMAGENS", str(tmp_path))
+    return tmp_path
+
+
+def test_imagem_entre_o_limite_e_o_dobro_e_recusada(tmp_path):
+    # 7000 x 7000 = 49 MP: acima de MAX_PIXELS, abaixo do erro do Pillow
+    caminho = tmp_path / "original"
+    caminho.write_bytes(_png(7000, 7000, modo="1"))
+
+    with pytest.raises(ImagemRecusada):
+        imagens.gerar_derivados(str(caminho), str(tmp_path))
+    assert not (tmp_path / "1080.jpg").exists()
+
+
+def test_pool_quebrado_vira_indisponivel_e_apaga_a_pasta(pasta_imagens, monkeypatch):
+    pool = _PoolFalso(BrokenProcessPool())
+    monkeypatch.setattr(imagens, "_pool", pool)
+    dados = _png(10, 10)
+
+    with pytest.raises(ImagensIndisponivel):
+        imagens.processar_imagem(dados)
+
+    assert pool.desligado and imagens._pool is None
+    assert list(pasta_imagens.rglob("original")) == []
+
+
+def test_tempo_esgotado_vira_recusada_e_apaga_a_pasta(pasta_imagens, monkeypatch):
+    monkeypatch.setattr(imagens, "_pool", _PoolFalso())
+    monkeypatch.setattr(imagens, "TIMEOUT_SEGUNDOS", 0.01)
+
+    with pytest.raises(ImagemRecusada):
+        imagens.processar_imagem(_png(10, 10))
+
+    assert list(pasta_imagens.rglob("original")) == []
@@ -0,0 +1,48 @@
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from config import db
+from helpers.numero_pedido import reservar_bloco, formatar_numero
+from models.pedido import ContadorPedido
+
+
+def test_primeira_reserva_do_ano_continua_dos_pedidos_existentes(usuario, criar_produto):
+    from controllers.pedido_controller import criar_pedido
+
+    bolo = criar_produto(10)
+    pedido = criar_pedido({"id_usuario": usuario.id_usuario, "itens": [{"id_produto": bolo.id_produto, "quantidade": 1}]})
+    ano = datetime.now().year
+    sequencia = int(pedido.numero_pedido.rsplit('-', 1)[1])
+
+    # Contador perdido (banco restaurado sem a tabela, por exemplo)
+    db.session.query(ContadorPedido).delete()
+    db.session.commit()
+
+    assert reservar_bloco(ano, 10) == sequencia + 1
+    assert reservar_bloco(ano, 10) == sequencia + 11
+
+
+def test_blocos_concorrentes_nao_se_sobrepoem(app, sessao):
+    def reservar(_):
+        with app.app_context():
+            return reservar_bloco(1999, 5)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        inicios = list(executor.map(reservar, range(16)))
+
+    assert sorted(inicios) == list(range(1, 80, 5))
+    assert formatar_numero(1999, inicios[0]).startswith("LCC-1999-")
+
+
+def test_primeira_reserva_do_ano_considera_pedidos_arquivados(sessao):
+    from sqlalchemy import insert
+    from models.arquivo import pedidos_arquivo
+
+    db.session.execute(insert(pedidos_arquivo).values(
+        id_pedido=1, numero_pedido=formatar_numero(1998, 57), id_usuario=1,
+        subtotal=10, valor_total=10, taxa_entrega=0, desconto=0, status="Entregue", tipo_entrega="retirada",
+        data_pedido=datetime(1998, 1, 2)
+    ))
+    db.session.commit()
+
+    assert reservar_bloco(1998, 10) == 58
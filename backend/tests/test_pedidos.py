@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from config import db
+from controllers.pedido_controller import criar_pedido, editar_itens_pedido, EstoqueInsuficiente
+from models.pedido import Pedido
+from models.produto import Produto
+
+
+def _pedido(usuario, *itens):
+    return criar_pedido({
+        "id_usuario": usuario.id_usuario,
+        "itens": [{"id_produto": p.id_produto, "quantidade": q} for p, q in itens]
+    })
+
+
+def test_criar_pedido_baixa_estoque_e_soma_total(usuario, criar_produto):
+    bolo, torta = criar_produto(10, estoque=5), criar_produto(20, estoque=5)
+
+    pedido = _pedido(usuario, (bolo, 2), (torta, 1))
+
+    db.session.expire_all()
+    assert Decimal(pedido.valor_total) == Decimal("40.00")
+    assert db.session.get(Produto, bolo.id_produto).quantidade_estoque == 3
+    assert db.session.get(Produto, bolo.id_produto).quantidade_vendida == 2
+
+
+def test_criar_pedido_sem_estoque_nao_baixa_nada(usuario, criar_produto):
+    bolo, torta = criar_produto(10, estoque=5), criar_produto(20, estoque=1)
+
+    try:
+        _pedido(usuario, (bolo, 2), (torta, 2))
+        assert False, "deveria faltar estoque"
+    except EstoqueInsuficiente as e:
+        assert e.id_produto == torta.id_produto
+
+    db.session.expire_all()
+    assert db.session.get(Produto, bolo.id_produto).quantidade_estoque == 5
+    assert Pedido.query.count() == 0
+
+
+def test_editar_itens_remover_e_adicionar_no_mesmo_lote(usuario, criar_produto):
+    p1, p2, p3 = criar_produto(10), criar_produto(20), criar_produto(30)
+    pedido = _pedido(usuario, (p1, 1), (p2, 1))
+    item_p2 = next(i for i in pedido.itens if i.id_produto == p2.id_produto)
+
+    # Mesmo efeito do trigger antigo, que ainda pode existir em bancos criados antes
+    db.session.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS trg_teste_total AFTER INSERT ON itens_pedido "
+        "BEGIN UPDATE pedidos SET "
+        "subtotal = (SELECT COALESCE(SUM(subtotal), 0) FROM itens_pedido WHERE id_pedido = NEW.id_pedido), "
+        "valor_total = (SELECT COALESCE(SUM(subtotal), 0) FROM itens_pedido WHERE id_pedido = NEW.id_pedido) "
+        "+ taxa_entrega - desconto WHERE id_pedido = NEW.id_pedido; END"
+    ))
+    db.session.commit()
+    try:
+        editar_itens_pedido(pedido.id_pedido, [
+            {"op": "remover", "id_item": item_p2.id_item},
+            {"op": "adicionar", "id_produto": p3.id_produto, "quantidade": 1},
+        ])
+    finally:
+        db.session.execute(text("DROP TRIGGER IF EXISTS trg_teste_total"))
+        db.session.commit()
+
+    db.session.expire_all()
+    salvo = db.session.get(Pedido, pedido.id_pedido)
+    assert sorted(i.id_produto for i in salvo.itens) == [p1.id_produto, p3.id_produto]
+    assert Decimal(salvo.subtotal) == Decimal("40.00")
+    assert Decimal(salvo.valor_total) == Decimal("40.00")
+    assert db.session.get(Produto, p2.id_produto).quantidade_estoque == 100
+    assert db.session.get(Produto, p3.id_produto).quantidade_estoque == 99
+
+
+def test_criar_pedido_usa_preco_promocional(usuario, criar_produto):
+    bolo = criar_produto(10, preco_promocional=Decimal("7.50"))
+
+    pedido = _pedido(usuario, (bolo, 2))
+
+    db.session.expire_all()
+    salvo = db.session.get(Pedido, pedido.id_pedido)
+    assert Decimal(salvo.valor_total) == Decimal("15.00")
+    assert Decimal(salvo.itens[0].preco_unitario) == Decimal("7.50")
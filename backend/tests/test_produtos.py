@@ -0,0 +1,16 @@
+import pytest
+
+from controllers.produto_controller import listar_produtos
+from helpers.paginacao import codificar_cursor
+
+
+@pytest.mark.parametrize("cursor", [
+    {"o": "preco_asc", "v": "abc", "id": 1},
+    {"o": "preco_asc", "v": [], "id": 1},
+    {"o": "preco_asc", "v": "NaN", "id": 1},
+    {"o": "preco_asc", "v": "10.00", "id": None},
+    {"o": "mais_vendidos", "v": "x", "id": 1},
+])
+def test_cursor_adulterado_e_erro_de_validacao(sessao, cursor):
+    with pytest.raises(ValueError, match="Cursor inválido"):
+        listar_produtos({"ordenacao": cursor["o"], "cursor": codificar_cursor(cursor)})
@@ -0,0 +1,40 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from helpers import revogacao
+from helpers.revogacao import ListaRevogacao, RevogacaoIndisponivel
+
+
+class _BancoFora:
+    def __init__(self):
+        self.consultas = 0
+
+    def __call__(self, desde):
+        self.consultas += 1
+        raise RuntimeError("banco fora do ar")
+
+
+def test_falha_na_primeira_carga_recusa_sem_consultar_de_novo():
+    lista = ListaRevogacao()
+    lista._ler = banco = _BancoFora()
+
+    for _ in range(3):
+        with pytest.raises(RevogacaoIndisponivel):
+            lista.contem("jti-qualquer")
+
+    assert banco.consultas == 1
+
+
+def test_token_sem_lista_carregada_recebe_503(app, sessao, usuario, monkeypatch):
+    lista = ListaRevogacao()
+    lista._ler = _BancoFora()
+    monkeypatch.setattr(revogacao, "_lista", lista)
+    token = create_access_token(identity=str(usuario.id_usuario))
+
+    resposta = app.test_client().get(
+        "/api/pedidos/meus-pedidos", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert resposta.status_code == 503
+    assert resposta.get_json()["codigo"] == "SERVICO_INDISPONIVEL"
+    assert int(resposta.headers["Retry-After"]) >= 1
@@ -0,0 +1,29 @@
+import os
+import time
+
+import pytest
+
+from helpers import security
+from helpers.security import SenhasOcupado, hash_password, verify_password
+
+
+def test_tempo_esgotado_vira_ocupado_e_segura_a_vaga(monkeypatch):
+    hash_password("aquece-o-pool")  # sobe os processos antes de medir
+    monkeypatch.setattr(security, "TIMEOUT_SEGUNDOS", 0.2)
+
+    with pytest.raises(SenhasOcupado):
+        security._executar(time.sleep, 1.5)
+    assert security.metricas_senhas()["em_andamento"] == 1
+
+    limite = time.monotonic() + 10
+    while security.metricas_senhas()["em_andamento"] and time.monotonic() < limite:
+        time.sleep(0.05)
+    assert security.metricas_senhas()["em_andamento"] == 0
+
+
+def test_processo_morto_recria_o_pool():
+    with pytest.raises(SenhasOcupado):
+        security._executar(os._exit, 1)
+
+    assert security.metricas_senhas()["pools_recriados"] >= 1
+    assert verify_password(hash_password("segredo"), "segredo")
@@ -0,0 +1,24 @@
+from helpers.visualizacoes import BufferVisualizacoes, _buffer
+
+
+def test_buffer_cheio_descarta_e_conta(app):
+    buffer = BufferVisualizacoes(intervalo=3600, max_pendentes=3)
+    for id_produto in (1, 1, 2, 3, 4):
+        buffer.registrar(id_produto, app)
+
+    metricas = buffer.metricas()
+    assert metricas["pendentes"] == 3
+    assert metricas["descartadas"] == 2
+    assert buffer._contagens == {1: 2, 2: 1}
+
+
+def test_produto_inexistente_nao_conta(app, criar_produto):
+    bolo = criar_produto(10)
+    client = app.test_client()
+    antes = _buffer.metricas()["pendentes"]
+
+    assert client.get("/api/produtos/999999").status_code == 404
+    assert _buffer.metricas()["pendentes"] == antes
+
+    assert client.get(f"/api/produtos/{bolo.id_produto}").status_code == 200
+    assert _buffer.metricas()["pendentes"] == antes + 1
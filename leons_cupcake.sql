@@ -41,6 +41,8 @@ CREATE TABLE usuarios (
   cpf CHAR(11) UNIQUE NOT NULL COMMENT 'Apenas números, sem formatação',
   telefone VARCHAR(15) NOT NULL COMMENT 'Com DDD, formato: (11)98765-4321',
   email VARCHAR(100) UNIQUE NOT NULL,
+  email_normalizado VARCHAR(100) GENERATED ALWAYS AS (LOWER(TRIM(email))) STORED
+    COMMENT 'Chave das buscas de login (case-insensitive pelo índice)',
   senha_hash VARCHAR(255) NOT NULL,
   data_nascimento DATE NULL,
   sexo ENUM('M', 'F', 'Outro', 'Prefiro não informar') NULL,
@@ -57,6 +59,7 @@ CREATE TABLE usuarios (
     FOREIGN KEY (id_endereco) REFERENCES enderecos(id_endereco)
     ON DELETE SET NULL,
   INDEX idx_email (email),
+  UNIQUE INDEX uk_email_normalizado (email_normalizado),
   INDEX idx_cpf (cpf),
   INDEX idx_tipo_ativo (tipo_usuario, ativo),
   INDEX idx_ultimo_acesso (ultimo_acesso)
@@ -143,6 +146,7 @@ CREATE TABLE produtos (
   INDEX idx_destaque (destaque, ativo),
   INDEX idx_preco (preco),
   INDEX idx_avaliacao (avaliacao_media DESC),
+  INDEX idx_vendidos (ativo, quantidade_vendida DESC),
   FULLTEXT INDEX idx_busca (nome, descricao),
   CHECK (preco > 0),
   CHECK (preco_promocional IS NULL OR preco_promocional < preco),
@@ -371,6 +375,40 @@ CREATE TABLE entregas (
   CHECK (avaliacao_entregador IS NULL OR (avaliacao_entregador >= 1 AND avaliacao_entregador <= 5))
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Controle de entregas';
 
+-- ==========================================
+-- TABELA: contadores_pedido
+-- ==========================================
+CREATE TABLE contadores_pedido (
+  ano SMALLINT UNSIGNED PRIMARY KEY,
+  proximo INT UNSIGNED NOT NULL COMMENT 'Próximo número ainda não reservado por nenhum worker'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Sequência anual de numero_pedido (reservada em blocos)';
+
+-- ==========================================
+-- TABELA: chaves_idempotencia
+-- ==========================================
+CREATE TABLE chaves_idempotencia (
+  chave CHAR(64) PRIMARY KEY COMMENT 'sha256 de método + rota + usuário do token (vazio sem token) + Idempotency-Key',
+  hash_corpo CHAR(64) NOT NULL COMMENT 'sha256 do corpo da requisição original',
+  status_http SMALLINT UNSIGNED NULL COMMENT 'NULL = em andamento',
+  corpo MEDIUMBLOB NULL,
+  mimetype VARCHAR(100) NULL,
+  criado_em DATETIME NOT NULL,
+  expira_em DATETIME NOT NULL,
+  INDEX idx_expira (expira_em)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Respostas de POSTs com Idempotency-Key (limpas por manutencao.py)';
+
+-- ==========================================
+-- TABELA: tokens_revogados
+-- ==========================================
+CREATE TABLE tokens_revogados (
+  jti VARCHAR(36) PRIMARY KEY COMMENT 'Claim jti do JWT revogado (logout)',
+  id_usuario INT UNSIGNED NULL,
+  revogado_em DATETIME NOT NULL COMMENT 'Leitura incremental dos workers',
+  expira_em DATETIME NOT NULL COMMENT 'Expiração do próprio token',
+  INDEX idx_revogado_em (revogado_em),
+  INDEX idx_expira (expira_em)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='JWTs revogados até expirarem (limpos por manutencao.py)';
+
 -- ==========================================
 -- TABELA: historico_status_pedido
 -- ==========================================
@@ -388,6 +426,19 @@ CREATE TABLE historico_status_pedido (
   INDEX idx_pedido_data (id_pedido, data_alteracao DESC)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Histórico de mudanças de status dos pedidos';
 
+-- ==========================================
+-- ARQUIVO DE PEDIDOS
+-- ==========================================
+-- Pedidos finalizados antigos e tudo que depende deles são movidos para
+-- estas cópias (python manutencao.py arquivar). LIKE copia colunas e
+-- índices, mas não as chaves estrangeiras nem os triggers.
+CREATE TABLE pedidos_arquivo LIKE pedidos;
+CREATE TABLE itens_pedido_arquivo LIKE itens_pedido;
+CREATE TABLE historico_status_pedido_arquivo LIKE historico_status_pedido;
+CREATE TABLE pagamentos_arquivo LIKE pagamentos;
+CREATE TABLE entregas_arquivo LIKE entregas;
+CREATE TABLE uso_cupons_arquivo LIKE uso_cupons;
+
 -- ==========================================
 -- TABELA: notificacoes
 -- ==========================================
@@ -455,17 +506,12 @@ BEGIN
 END$$
 DELIMITER ;
 
--- Trigger: Atualizar estoque após pedido
-DELIMITER $$
-CREATE TRIGGER trg_after_insert_item_pedido
-AFTER INSERT ON itens_pedido
-FOR EACH ROW
-BEGIN
-  UPDATE produtos 
-  SET quantidade_estoque = quantidade_estoque - NEW.quantidade
-  WHERE id_produto = NEW.id_produto;
-END$$
-DELIMITER ;
+-- Estoque: baixado pela aplicação (pedido_controller._baixar_estoque), em
+-- um único UPDATE condicional (quantidade_estoque >= pedida), atômico por
+-- linha, sem SELECT ... FOR UPDATE prévio.
+-- O antigo trg_after_insert_item_pedido baixava o estoque de novo a cada
+-- item inserido. Em bancos já criados, remova-o:
+--   DROP TRIGGER IF EXISTS trg_after_insert_item_pedido;
 
 -- Trigger: Calcular subtotal do item
 DELIMITER $$
@@ -477,35 +523,18 @@ BEGIN
 END$$
 DELIMITER ;
 
--- Trigger: Atualizar valor total do pedido
-DELIMITER $$
-CREATE TRIGGER trg_after_insert_item_update_total
-AFTER INSERT ON itens_pedido
-FOR EACH ROW
-BEGIN
-  UPDATE pedidos 
-  SET subtotal = (
-    SELECT COALESCE(SUM(subtotal), 0)
-    FROM itens_pedido 
-    WHERE id_pedido = NEW.id_pedido
-  ),
-  valor_total = subtotal + taxa_entrega - desconto
-  WHERE id_pedido = NEW.id_pedido;
-END$$
-DELIMITER ;
+-- Subtotal e valor_total do pedido: calculados pela aplicação
+-- (gravar_pedido e editar_itens_pedido, via Pedido.definir_valores). O
+-- antigo trg_after_insert_item_update_total re-somava os itens a cada
+-- INSERT e sobrescrevia o total de uma edição que também remove itens.
+-- Em bancos já criados, remova-o:
+--   DROP TRIGGER IF EXISTS trg_after_insert_item_update_total;
 
--- Trigger: Registrar mudança de status no histórico
-DELIMITER $$
-CREATE TRIGGER trg_after_update_pedido_status
-AFTER UPDATE ON pedidos
-FOR EACH ROW
-BEGIN
-  IF OLD.status != NEW.status THEN
-    INSERT INTO historico_status_pedido (id_pedido, status_anterior, status_novo, observacao)
-    VALUES (NEW.id_pedido, OLD.status, NEW.status, 'Status alterado automaticamente');
-  END IF;
-END$$
-DELIMITER ;
+-- Histórico de status: gravado pela aplicação (pedido_controller.
+-- atualizar_status_pedidos), com observação e autor, em um INSERT
+-- multi-linha por lote de pedidos. O antigo trg_after_update_pedido_status
+-- duplicaria cada linha. Em bancos já criados, remova-o:
+--   DROP TRIGGER IF EXISTS trg_after_update_pedido_status;
 
 -- Trigger: Atualizar quantidade usada do cupom
 DELIMITER $$
@@ -752,6 +781,12 @@ WHERE p.ativo = TRUE
 ORDER BY p.quantidade_vendida DESC
 LIMIT 10;
 
+-- View: Pedidos quentes + arquivados (relatórios de períodos longos)
+CREATE OR REPLACE VIEW v_pedidos_historico AS
+SELECT id_pedido, id_usuario, data_pedido, valor_total, status FROM pedidos
+UNION ALL
+SELECT id_pedido, id_usuario, data_pedido, valor_total, status FROM pedidos_arquivo;
+
 -- View: Estatísticas de Usuários
 CREATE OR REPLACE VIEW v_estatisticas_usuarios AS
 SELECT 
@@ -853,9 +888,13 @@ BEGIN
   ELSEIF v_qtd_disponivel IS NOT NULL AND v_qtd_disponivel <= 0 THEN
     SET p_mensagem = 'Cupom esgotado';
   ELSE
-    SELECT COUNT(*) INTO v_uso_usuario
-    FROM uso_cupons
-    WHERE id_cupom = v_id_cupom AND id_usuario = p_id_usuario;
+    -- Usos de pedidos arquivados continuam contando para o limite
+    SELECT
+      (SELECT COUNT(*) FROM uso_cupons
+        WHERE id_cupom = v_id_cupom AND id_usuario = p_id_usuario)
+      + (SELECT COUNT(*) FROM uso_cupons_arquivo
+        WHERE id_cupom = v_id_cupom AND id_usuario = p_id_usuario)
+    INTO v_uso_usuario;
     
     IF v_limite_usuario IS NOT NULL AND v_uso_usuario >= v_limite_usuario THEN
       SET p_mensagem = 'Você já atingiu o limite de uso deste cupom';
@@ -889,7 +928,7 @@ BEGIN
     SUM(p.valor_total) AS faturamento,
     AVG(p.valor_total) AS ticket_medio,
     COUNT(DISTINCT p.id_usuario) AS clientes_unicos
-  FROM pedidos p
+  FROM v_pedidos_historico p
   WHERE DATE(p.data_pedido) BETWEEN p_data_inicio AND p_data_fim
     AND p.status NOT IN ('Cancelado', 'Reembolsado')
   GROUP BY DATE(p.data_pedido)
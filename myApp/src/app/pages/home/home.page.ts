@@ -186,6 +186,7 @@ export class HomePage implements OnInit {
             });
             await loader.present();
             
+            this.api.logout().subscribe({ error: () => {} });
             this.auth.logout();
             this.carrinhoService.limparCarrinho();
             
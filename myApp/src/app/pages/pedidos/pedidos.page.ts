@@ -34,7 +34,7 @@ export class PedidosPage implements OnInit {
     });
     loader.present();
 
-    this.api.listarPedidos().subscribe({
+    this.api.listarMeusPedidos().subscribe({
       next: async (res) => {
         this.pedidos = res;
         this.carregando = false;
@@ -48,6 +48,7 @@ export class PerfilPage implements OnInit {
     });
     loader.present();
 
+    this.api.logout().subscribe({ error: () => {} });
     this.auth.logout();
     this.router.navigate(['/login']);
   }
@@ -1,8 +1,8 @@
 import { Injectable } from '@angular/core';
 import { HttpClient, HttpHeaders, HttpErrorResponse } from '@angular/common/http';
 import { environment } from 'src/environments/environment';
-import { Observable, throwError } from 'rxjs';
-import { catchError, tap } from 'rxjs/operators';
+import { Observable, throwError, timer } from 'rxjs';
+import { catchError, retry, tap } from 'rxjs/operators';
 
 @Injectable({
   providedIn: 'root'
@@ -55,6 +55,12 @@ export class ApiService {
     );
   }
 
+  // Revoga o token no servidor; chamar antes de apagá-lo do localStorage
+  logout(): Observable<any> {
+    return this.http.post(`${this.api}/auth/logout`, {}, this.getHeaders())
+      .pipe(catchError(this.handleError));
+  }
+
   registrar(data: any): Observable<any> {
     return this.http.post(`${this.api}/auth/register`, data)
       .pipe(catchError(this.handleError));
@@ -95,8 +101,9 @@ export class ApiService {
       .pipe(catchError(this.handleError));
   }
 
-  listarCategorias(): Observable<any[]> {
-    return this.http.get<any[]>(`${this.api}/categorias`)
+  listarCategorias(comContagem = false): Observable<any[]> {
+    const params = comContagem ? '?com_contagem=1' : '';
+    return this.http.get<any[]>(`${this.api}/categorias${params}`)
       .pipe(catchError(this.handleError));
   }
 
@@ -105,11 +112,37 @@ export class ApiService {
       .pipe(catchError(this.handleError));
   }
 
-  criarPedido(data: any): Observable<any> {
-    return this.http.post(`${this.api}/pedidos`, data, this.getHeaders())
+  criarPedido(data: any, idempotencyKey: string = crypto.randomUUID()): Observable<any> {
+    // A mesma chave em todas as tentativas: se a resposta se perder na rede,
+    // a nova tentativa recebe o pedido já criado em vez de criar outro
+    const { headers } = this.getHeaders();
+    return this.http.post(`${this.api}/pedidos`, data, { headers: headers.set('Idempotency-Key', idempotencyKey) })
+      .pipe(
+        retry({ count: 2, delay: (error: HttpErrorResponse) => error.status === 0 ? timer(1000) : throwError(() => error) }),
+        catchError(this.handleError)
+      );
+  }
+
+  // Carrinho no servidor (compartilhado entre aparelhos do mesmo usuário)
+  obterCarrinho(): Observable<any> {
+    return this.http.get(`${this.api}/carrinho`, this.getHeaders())
+      .pipe(catchError(this.handleError));
+  }
+
+  sincronizarCarrinho(itens: { id_produto: number; quantidade: number }[]): Observable<any> {
+    return this.http.put(`${this.api}/carrinho`, { itens }, this.getHeaders())
       .pipe(catchError(this.handleError));
   }
 
+  finalizarCarrinho(idempotencyKey: string = crypto.randomUUID()): Observable<any> {
+    const { headers } = this.getHeaders();
+    return this.http.post(`${this.api}/carrinho/checkout`, {}, { headers: headers.set('Idempotency-Key', idempotencyKey) })
+      .pipe(
+        retry({ count: 2, delay: (error: HttpErrorResponse) => error.status === 0 ? timer(1000) : throwError(() => error) }),
+        catchError(this.handleError)
+      );
+  }
+
   listarPedidos(): Observable<any[]> {
     return this.http.get<any[]>(`${this.api}/pedidos`, this.getHeaders())
       .pipe(catchError(this.handleError));
@@ -125,11 +158,21 @@ export class ApiService {
       .pipe(catchError(this.handleError));
   }
 
+  editarItensPedido(id: number, operacoes: any[]): Observable<any> {
+    return this.http.patch(`${this.api}/pedidos/${id}/itens`, { operacoes }, this.getHeaders())
+      .pipe(catchError(this.handleError));
+  }
+
   atualizarStatusPedido(id: number, status: string): Observable<any> {
     return this.http.put(`${this.api}/pedidos/${id}/status`, { status }, this.getHeaders())
       .pipe(catchError(this.handleError));
   }
 
+  atualizarStatusPedidos(ids: number[], status: string, observacao?: string): Observable<any> {
+    return this.http.put(`${this.api}/pedidos/status`, { ids, status, observacao }, this.getHeaders())
+      .pipe(catchError(this.handleError));
+  }
+
   cancelarPedido(id: number): Observable<any> {
     return this.http.delete(`${this.api}/pedidos/${id}`, this.getHeaders())
       .pipe(catchError(this.handleError));